@@ -0,0 +1,47 @@
+"""add user reputation counters
+
+Revision ID: a7b8c9d0e1f2
+Revises: f6a7b8c9d0e1
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a7b8c9d0e1f2"
+down_revision: Union[str, None] = "f6a7b8c9d0e1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "users",
+        sa.Column("thumbs_up_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "users",
+        sa.Column("thumbs_down_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+    # Backfill from existing feedback
+    op.execute(
+        """
+        UPDATE users SET
+            thumbs_up_count = (
+                SELECT count(*) FROM feedbacks
+                WHERE feedbacks.to_user_id = users.id AND feedbacks.rating = 'thumbs_up'
+            ),
+            thumbs_down_count = (
+                SELECT count(*) FROM feedbacks
+                WHERE feedbacks.to_user_id = users.id AND feedbacks.rating = 'thumbs_down'
+            )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "thumbs_down_count")
+    op.drop_column("users", "thumbs_up_count")
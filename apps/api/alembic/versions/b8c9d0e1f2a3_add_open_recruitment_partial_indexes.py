@@ -0,0 +1,48 @@
+"""add partial indexes on open recruitments
+
+Revision ID: b8c9d0e1f2a3
+Revises: a7b8c9d0e1f2
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b8c9d0e1f2a3"
+down_revision: Union[str, None] = "a7b8c9d0e1f2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+OPEN = sa.text("status = 'open'")
+
+
+def upgrade() -> None:
+    # Filtered lobby listing: game + region, oldest first
+    op.create_index(
+        "ix_recruitments_open_game_region_created",
+        "recruitments",
+        ["game", "region", "created_at"],
+        postgresql_where=OPEN,
+    )
+    # Unfiltered listing / lobby snapshot load, keyset on (created_at, id)
+    op.create_index(
+        "ix_recruitments_open_created",
+        "recruitments",
+        ["created_at", "id"],
+        postgresql_where=OPEN,
+    )
+    # expire_recruitments
+    op.create_index(
+        "ix_recruitments_open_expires",
+        "recruitments",
+        ["expires_at"],
+        postgresql_where=OPEN,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_recruitments_open_expires", table_name="recruitments")
+    op.drop_index("ix_recruitments_open_created", table_name="recruitments")
+    op.drop_index("ix_recruitments_open_game_region_created", table_name="recruitments")
@@ -0,0 +1,43 @@
+"""add user ratings
+
+Revision ID: c9d0e1f2a3b4
+Revises: b8c9d0e1f2a3
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c9d0e1f2a3b4"
+down_revision: Union[str, None] = "b8c9d0e1f2a3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_ratings",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("user_id", sa.Uuid(), nullable=False),
+        sa.Column("game", sa.String(length=50), nullable=False),
+        sa.Column("rating", sa.Integer(), nullable=False, server_default="1500"),
+        sa.Column("rated_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "game", name="uq_user_rating_game"),
+    )
+    op.create_index("ix_user_ratings_game_rating", "user_ratings", ["game", "rating"])
+    # Existing feedback is replayed with: uv run python -m app.services.rating
+
+
+def downgrade() -> None:
+    op.drop_index("ix_user_ratings_game_rating", table_name="user_ratings")
+    op.drop_table("user_ratings")
@@ -0,0 +1,179 @@
+"""Cross-worker delivery of WebSocket events.
+
+Each API worker process owns its own ``ConnectionManager`` and only knows the
+sockets connected to it. A backplane carries every event to the other workers
+so a match created in one worker reaches lobby sockets and room members
+connected to another.
+
+Messages are opaque strings. The publishing worker delivers to its own sockets
+directly; the backplane only has to reach the others. A backplane may also hand
+a message back to its publisher (PostgreSQL NOTIFY reaches every listening
+session, the sender's own included), so ``ConnectionManager`` tags envelopes
+with its ``epoch`` and drops the ones it published itself.
+"""
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+
+from sqlalchemy.engine import make_url
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+DeliverCallback = Callable[[str], Awaitable[None]]
+
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+PG_NOTIFY_MAX_PAYLOAD = 7999
+
+
+class Backplane:
+    """Interface for publishing events to every worker."""
+
+    async def start(self, deliver: DeliverCallback) -> None:
+        raise NotImplementedError
+
+    async def publish(self, message: str) -> None:
+        raise NotImplementedError
+
+    async def stop(self) -> None:
+        raise NotImplementedError
+
+
+class InProcessHub:
+    """Shared bus for ``InProcessBackplane`` instances living in the same process."""
+
+    def __init__(self) -> None:
+        self.members: list["InProcessBackplane"] = []
+
+
+class InProcessBackplane(Backplane):
+    """Backplane for a single process.
+
+    With the default private hub this is a no-op (there are no other workers).
+    Several instances sharing one ``InProcessHub`` behave like separate workers,
+    which is how the tests exercise cross-worker delivery.
+    """
+
+    def __init__(self, hub: InProcessHub | None = None) -> None:
+        self._hub = hub or InProcessHub()
+        self._deliver: DeliverCallback | None = None
+
+    async def start(self, deliver: DeliverCallback) -> None:
+        self._deliver = deliver
+        if self not in self._hub.members:
+            self._hub.members.append(self)
+
+    async def publish(self, message: str) -> None:
+        for member in list(self._hub.members):
+            if member is not self and member._deliver is not None:
+                await member._deliver(message)
+
+    async def stop(self) -> None:
+        if self in self._hub.members:
+            self._hub.members.remove(self)
+        self._deliver = None
+
+
+class PostgresBackplane(Backplane):
+    """Backplane over PostgreSQL LISTEN/NOTIFY.
+
+    One dedicated connection LISTENs on ``channel``; another sends NOTIFYs from
+    a publisher task, so ``publish`` only enqueues and never waits on the
+    database. Both connections are re-established after a failure.
+    """
+
+    def __init__(self, dsn: str, channel: str = "ws_events", reconnect_delay: float = 1.0) -> None:
+        self._dsn = dsn
+        self._channel = channel
+        self._reconnect_delay = reconnect_delay
+        self._deliver: DeliverCallback | None = None
+        self._outgoing: asyncio.Queue[str] = asyncio.Queue()
+        self._tasks: list[asyncio.Task[None]] = []
+        # Notifications being delivered; the loop itself only keeps weak references
+        self._deliveries: set[asyncio.Task[None]] = set()
+
+    async def start(self, deliver: DeliverCallback) -> None:
+        self._deliver = deliver
+        self._tasks = [
+            asyncio.create_task(self._listen_loop()),
+            asyncio.create_task(self._publish_loop()),
+        ]
+
+    async def publish(self, message: str) -> None:
+        if len(message.encode()) > PG_NOTIFY_MAX_PAYLOAD:
+            logger.warning("Backplane message too large for NOTIFY (%d chars)", len(message))
+            return
+        self._outgoing.put_nowait(message)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # No new notifications arrive once the listener is gone; finish the ones in flight
+        await asyncio.gather(*self._deliveries, return_exceptions=True)
+        self._deliver = None
+
+    def _on_notify(self, conn, pid: int, channel: str, payload: str) -> None:
+        if self._deliver is not None:
+            task = asyncio.get_running_loop().create_task(self._deliver(payload))
+            self._deliveries.add(task)
+            task.add_done_callback(self._delivered)
+
+    def _delivered(self, task: asyncio.Task[None]) -> None:
+        self._deliveries.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Backplane delivery failed", exc_info=task.exception())
+
+    async def _listen_loop(self) -> None:
+        import asyncpg
+
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self._dsn)
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _conn: lost.set())
+                await conn.add_listener(self._channel, self._on_notify)
+                logger.info("Backplane listening on channel %s", self._channel)
+                await lost.wait()
+                logger.warning("Backplane listener connection lost")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Backplane listener failed")
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(self._reconnect_delay)
+
+    async def _publish_loop(self) -> None:
+        import asyncpg
+
+        conn = None
+        try:
+            while True:
+                message = await self._outgoing.get()
+                try:
+                    if conn is None or conn.is_closed():
+                        conn = await asyncpg.connect(self._dsn)
+                    await conn.execute("SELECT pg_notify($1, $2)", self._channel, message)
+                except Exception:
+                    logger.exception("Backplane publish failed; event not sent to other workers")
+                    conn = None
+                    await asyncio.sleep(self._reconnect_delay)
+        finally:
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+
+
+def _asyncpg_dsn(database_url: str) -> str:
+    return make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def create_backplane() -> Backplane:
+    if settings.ws_backplane == "postgres":
+        return PostgresBackplane(_asyncpg_dsn(settings.database_url), settings.ws_backplane_channel)
+    return InProcessBackplane()
@@ -1,4 +1,14 @@
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import time
+from collections import deque
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 
 from app.config import settings
 
@@ -7,5 +17,60 @@ async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit
 
 
 async def get_db() -> AsyncSession:  # type: ignore[misc]
+    """Request-scoped session.
+
+    Routes depend on it with ``Depends(get_db, scope="function")`` so the
+    session is closed, and its connection returned to the pool, as soon as the
+    handler returns instead of after the response has been sent. Every route
+    and dependency must use the same scope to share one session per request.
+    """
     async with async_session() as session:
         yield session
+
+
+class PoolMetrics:
+    """How long connections stay checked out of ``engine``'s pool.
+
+    Durations of the last ``window`` checkouts are kept for the percentiles.
+    """
+
+    def __init__(self, target: AsyncEngine, window: int = 1000) -> None:
+        self._pool = target.sync_engine.pool
+        self._durations: deque[float] = deque(maxlen=window)
+        self.checkouts = 0
+        self.max_ms = 0.0
+        event.listen(target.sync_engine, "checkout", self._on_checkout)
+        event.listen(target.sync_engine, "checkin", self._on_checkin)
+
+    def _on_checkout(self, dbapi_connection: Any, record: Any, proxy: Any) -> None:
+        record.info["checked_out_at"] = time.perf_counter()
+        self.checkouts += 1
+
+    def _on_checkin(self, dbapi_connection: Any, record: Any) -> None:
+        started = record.info.pop("checked_out_at", None)
+        if started is None:
+            return
+        ms = (time.perf_counter() - started) * 1000
+        self._durations.append(ms)
+        self.max_ms = max(self.max_ms, ms)
+
+    def stats(self) -> dict[str, int | float]:
+        durations = sorted(self._durations)
+        # Static and singleton pools used with SQLite have no size or overflow
+        size = getattr(self._pool, "size", None)
+        overflow = getattr(self._pool, "overflow", None)
+        checked_out = getattr(self._pool, "checkedout", None)
+        return {
+            "pool_size": size() if size else 0,
+            "checked_out": checked_out() if checked_out else 0,
+            "overflow": max(overflow(), 0) if overflow else 0,
+            "checkouts": self.checkouts,
+            "checkout_p50_ms": round(durations[len(durations) // 2], 3) if durations else 0.0,
+            "checkout_p95_ms": (
+                round(durations[int(len(durations) * 0.95)], 3) if durations else 0.0
+            ),
+            "checkout_max_ms": round(self.max_ms, 3),
+        }
+
+
+pool_metrics = PoolMetrics(engine)
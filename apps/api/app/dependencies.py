@@ -11,7 +11,7 @@ from app.models.user import User
 
 async def get_current_user(
     session_token: str | None = Cookie(default=None),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> User:
     if not session_token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
@@ -38,7 +38,7 @@ async def get_current_user(
 
 async def get_optional_user(
     session_token: str | None = Cookie(default=None),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> User | None:
     if not session_token:
         return None
@@ -15,18 +15,36 @@ from app.config import settings
 from app.database import get_db
 from app.rate_limit import limiter
 from app.routers import admin, auth, blocks, games, recruitments, reports, rooms, ws
+from app.services.automatch import auto_matcher
+from app.services.blocks import block_graph, peers_of
 from app.services.chat_cleanup import run_periodic_cleanup
+from app.services.lobby import lobby_snapshot, lobby_updates
+from app.services.outbox import outbox_publisher
+from app.websocket import manager
 
 logging.basicConfig(level=logging.INFO)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await manager.start()
+    manager.add_remote_listener(block_graph.apply_event)
+    manager.set_peer_resolver(peers_of)
+    await lobby_snapshot.start()
+    await outbox_publisher.start()
+    await auto_matcher.start()
     stop_event = asyncio.Event()
     task = asyncio.create_task(run_periodic_cleanup(stop_event))
     yield
     stop_event.set()
     task.cancel()
+    await auto_matcher.stop()
+    await outbox_publisher.stop()
+    # Publish what was committed before shutdown; other workers would otherwise pick it up
+    await outbox_publisher.flush()
+    await lobby_snapshot.stop()
+    await lobby_updates.flush()
+    await manager.shutdown()
 
 
 app = FastAPI(title="Game Instant Matching API", version="0.1.0", lifespan=lifespan)
@@ -53,7 +71,7 @@ app.include_router(ws.router)
 
 
 @app.get("/api/health")
-async def health(db: AsyncSession = Depends(get_db)):
+async def health(db: AsyncSession = Depends(get_db, scope="function")):
     try:
         await db.execute(text("SELECT 1"))
         return {"status": "ok"}
@@ -2,6 +2,8 @@ from app.models.base import Base
 from app.models.block import Block
 from app.models.feedback import Feedback
 from app.models.message import Message
+from app.models.outbox import OutboxEvent
+from app.models.rating import UserRating
 from app.models.recruitment import Recruitment
 from app.models.report import Report
 from app.models.room import Room, RoomMember
@@ -12,9 +14,11 @@ __all__ = [
     "Block",
     "Feedback",
     "Message",
+    "OutboxEvent",
     "Recruitment",
     "Report",
     "Room",
     "RoomMember",
     "User",
+    "UserRating",
 ]
@@ -0,0 +1,25 @@
+import uuid
+
+from sqlalchemy import ForeignKey, Index, Integer, String, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base, TimestampMixin, new_uuid
+
+DEFAULT_RATING = 1500
+
+
+class UserRating(Base, TimestampMixin):
+    __tablename__ = "user_ratings"
+    __table_args__ = (
+        UniqueConstraint("user_id", "game", name="uq_user_rating_game"),
+        # Nearest-rated lookups within a game
+        Index("ix_user_ratings_game_rating", "game", "rating"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=new_uuid)
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id"), nullable=False)
+    game: Mapped[str] = mapped_column(String(50), nullable=False)
+    rating: Mapped[int] = mapped_column(
+        Integer, default=DEFAULT_RATING, server_default=str(DEFAULT_RATING), nullable=False
+    )
+    rated_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Boolean, DateTime, String
+from sqlalchemy import Boolean, DateTime, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.base import Base, TimestampMixin, new_uuid
@@ -18,3 +18,10 @@ class User(Base, TimestampMixin):
     suspended_until: Mapped[datetime | None] = mapped_column(
         DateTime(timezone=True), nullable=True
     )
+    # Denormalized from feedbacks; kept in step by app.services.reputation
+    thumbs_up_count: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0", nullable=False
+    )
+    thumbs_down_count: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0", nullable=False
+    )
@@ -1,23 +1,31 @@
 import uuid
 from datetime import timedelta
 
-from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
-from app.database import get_db
+from app.database import get_db, pool_metrics
 from app.models.base import utcnow
 from app.models.recruitment import Recruitment, RecruitmentStatus
 from app.models.report import Report, ReportStatus
 from app.models.room import Room, RoomStatus
 from app.models.user import User
+from app.responses import json_list
 from app.schemas.admin import (
     AdminReportResponse,
     AdminStatsResponse,
     AdminUserResponse,
+    DatabasePoolStatsResponse,
+    MatchmakingStatsResponse,
     SuspendRequest,
+    WebSocketStatsResponse,
 )
+from app.services.automatch import auto_matcher
+from app.services.lobby import lobby_updates
+from app.services.outbox import outbox_publisher
+from app.websocket import manager
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -38,13 +46,21 @@ async def list_reports(
     report_status: ReportStatus | None = Query(None),
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
-    db: AsyncSession = Depends(get_db),
-) -> list[AdminReportResponse]:
-    stmt = select(Report).order_by(Report.created_at.desc()).offset(offset).limit(limit)
+    db: AsyncSession = Depends(get_db, scope="function"),
+) -> Response:
+    stmt = select(
+        Report.id,
+        Report.reporter_id,
+        Report.reported_id,
+        Report.room_id,
+        Report.reason,
+        Report.status,
+        Report.created_at,
+    ).order_by(Report.created_at.desc()).offset(offset).limit(limit)
     if report_status:
         stmt = stmt.where(Report.status == report_status)
     result = await db.execute(stmt)
-    return [AdminReportResponse.model_validate(r) for r in result.scalars().all()]
+    return json_list(AdminReportResponse, result.all(), from_attributes=True)
 
 
 @router.patch("/reports/{report_id}")
@@ -52,7 +68,7 @@ async def update_report_status(
     report_id: uuid.UUID,
     new_status: ReportStatus,
     _: None = Depends(verify_admin),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> dict[str, str]:
     report = await db.get(Report, report_id)
     if not report:
@@ -69,7 +85,7 @@ async def update_report_status(
 async def get_user(
     user_id: uuid.UUID,
     _: None = Depends(verify_admin),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> AdminUserResponse:
     user = await db.get(User, user_id)
     if not user:
@@ -96,7 +112,7 @@ async def suspend_user(
     user_id: uuid.UUID,
     body: SuspendRequest,
     _: None = Depends(verify_admin),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> dict[str, str]:
     user = await db.get(User, user_id)
     if not user:
@@ -110,7 +126,7 @@ async def suspend_user(
 async def ban_user(
     user_id: uuid.UUID,
     _: None = Depends(verify_admin),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> dict[str, str]:
     user = await db.get(User, user_id)
     if not user:
@@ -125,7 +141,7 @@ async def ban_user(
 async def unban_user(
     user_id: uuid.UUID,
     _: None = Depends(verify_admin),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> dict[str, str]:
     user = await db.get(User, user_id)
     if not user:
@@ -142,7 +158,7 @@ async def unban_user(
 @router.get("/stats", response_model=AdminStatsResponse)
 async def get_stats(
     _: None = Depends(verify_admin),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> AdminStatsResponse:
     now = utcnow()
 
@@ -171,3 +187,23 @@ async def get_stats(
         total_users=total_users.scalar() or 0,
         banned_users=banned_users.scalar() or 0,
     )
+
+
+@router.get("/websockets", response_model=WebSocketStatsResponse)
+async def get_websocket_stats(_: None = Depends(verify_admin)) -> WebSocketStatsResponse:
+    """Per-process WebSocket queue depth, drop, lobby coalescing and outbox counters."""
+    return WebSocketStatsResponse(
+        **manager.stats(), **lobby_updates.stats(), **outbox_publisher.stats()
+    )
+
+
+@router.get("/matchmaking", response_model=MatchmakingStatsResponse)
+async def get_matchmaking_stats(_: None = Depends(verify_admin)) -> MatchmakingStatsResponse:
+    """Per-process automatic matching throughput, queue depth and wait times."""
+    return MatchmakingStatsResponse(**auto_matcher.stats())
+
+
+@router.get("/database", response_model=DatabasePoolStatsResponse)
+async def get_database_stats(_: None = Depends(verify_admin)) -> DatabasePoolStatsResponse:
+    """Per-process connection pool usage and how long requests hold a connection."""
+    return DatabasePoolStatsResponse(**pool_metrics.stats())
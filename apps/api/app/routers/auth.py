@@ -27,12 +27,13 @@ async def login(
     request: Request,
     body: LoginRequest,
     response: Response,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> User:
     nickname = sanitize_text(body.nickname)
     check_content(nickname, "nickname")
 
-    # Verify Turnstile CAPTCHA when configured
+    # Verify Turnstile CAPTCHA when configured; before any query, so no connection is held
+    # during the HTTP call
     if settings.turnstile_secret_key and settings.app_env != "test":
         if not body.turnstile_token:
             raise HTTPException(status_code=400, detail="CAPTCHA verification required")
@@ -62,7 +63,7 @@ async def login(
 async def logout(
     response: Response,
     user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> dict[str, str]:
     user.is_active = False
     await db.commit()
@@ -9,6 +9,9 @@ from app.dependencies import get_current_user
 from app.models.block import Block
 from app.models.user import User
 from app.schemas.block import BlockCreate, BlockResponse
+from app.services.blocks import block_graph
+from app.services.lobby import lobby_snapshot
+from app.services.outbox import enqueue_blocks_changed, outbox_publisher
 
 router = APIRouter(prefix="/api/blocks", tags=["blocks"])
 
@@ -16,7 +19,7 @@ router = APIRouter(prefix="/api/blocks", tags=["blocks"])
 @router.get("", response_model=list[BlockResponse])
 async def list_blocks(
     user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> list[Block]:
     result = await db.execute(select(Block).where(Block.blocker_id == user.id))
     return list(result.scalars().all())
@@ -26,7 +29,7 @@ async def list_blocks(
 async def create_block(
     body: BlockCreate,
     user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> Block:
     if body.blocked_id == user.id:
         raise HTTPException(status_code=400, detail="Cannot block yourself")
@@ -43,8 +46,12 @@ async def create_block(
 
     block = Block(blocker_id=user.id, blocked_id=body.blocked_id)
     db.add(block)
+    enqueue_blocks_changed(db, user.id, body.blocked_id)
     await db.commit()
     await db.refresh(block)
+    block_graph.add(user.id, body.blocked_id)
+    lobby_snapshot.blocks_changed()
+    outbox_publisher.notify()
     return block
 
 
@@ -52,7 +59,7 @@ async def create_block(
 async def delete_block(
     blocked_id: uuid.UUID,
     user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> dict[str, str]:
     result = await db.execute(
         select(Block).where(Block.blocker_id == user.id, Block.blocked_id == blocked_id)
@@ -61,5 +68,9 @@ async def delete_block(
     if not block:
         raise HTTPException(status_code=404, detail="Block not found")
     await db.delete(block)
+    enqueue_blocks_changed(db, user.id, blocked_id)
     await db.commit()
+    block_graph.discard(user.id, blocked_id)
+    lobby_snapshot.blocks_changed()
+    outbox_publisher.notify()
     return {"detail": "Unblocked"}
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.models.game import Game
+from app.responses import json_list
 from app.schemas.game import GameResponse
 
 router = APIRouter(prefix="/api/games", tags=["games"])
@@ -14,9 +15,13 @@ async def list_games(
     category: str | None = Query(None, max_length=30),
     platform: str | None = Query(None, max_length=20),
     q: str | None = Query(None, max_length=50),
-    db: AsyncSession = Depends(get_db),
-) -> list[GameResponse]:
-    stmt = select(Game).where(Game.is_active.is_(True)).order_by(Game.name)
+    db: AsyncSession = Depends(get_db, scope="function"),
+) -> Response:
+    stmt = (
+        select(Game.id, Game.slug, Game.name, Game.name_ja, Game.category, Game.platform_tags)
+        .where(Game.is_active.is_(True))
+        .order_by(Game.name)
+    )
 
     if category:
         stmt = stmt.where(Game.category == category)
@@ -27,10 +32,10 @@ async def list_games(
         )
 
     result = await db.execute(stmt)
-    games = [GameResponse.model_validate(g) for g in result.scalars().all()]
+    games = result.all()
 
     # Filter by platform in Python (JSON column, cross-DB compatible)
     if platform:
         games = [g for g in games if g.platform_tags and platform in g.platform_tags]
 
-    return games
+    return json_list(GameResponse, games, from_attributes=True)
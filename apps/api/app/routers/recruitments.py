@@ -1,25 +1,42 @@
 import hashlib
 import uuid
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
+from typing import Literal
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from sqlalchemy import func, select
+from fastapi import APIRouter, Cookie, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.database import get_db
 from app.dependencies import get_current_user, get_optional_user
 from app.models.base import utcnow
-from app.models.block import Block
-from app.models.feedback import Feedback, Rating
-from app.models.recruitment import Recruitment, RecruitmentStatus
+from app.models.recruitment import PlayStyle, Recruitment, RecruitmentStatus
 from app.models.room import Room, RoomMember, RoomStatus
 from app.models.user import User
 from app.rate_limit import limiter
-from app.schemas.recruitment import RecruitmentCreate, RecruitmentResponse
+from app.responses import json_list
+from app.schemas.recruitment import (
+    RecruitmentChangesResponse,
+    RecruitmentCreate,
+    RecruitmentResponse,
+)
 from app.models.game import Game
-from app.services.matching import find_match_and_create_room
+from app.services.automatch import auto_matcher
+from app.services.blocks import block_graph
+from app.services.lobby import lobby_snapshot
+from app.services.matching import (
+    MatchRejected,
+    find_match_and_create_room,
+    has_active_room,
+    quick_join,
+)
 from app.services.moderation import check_content
+from app.services.outbox import (
+    enqueue_recruitment_created,
+    enqueue_recruitment_removed,
+    outbox_publisher,
+)
 from app.utils.validators import sanitize_text, validate_region
 from app.websocket import manager
 
@@ -32,53 +49,137 @@ def _compute_ip_hash(request: Request) -> str | None:
 router = APIRouter(prefix="/api/recruitments", tags=["recruitments"])
 
 
+def _utc(dt: datetime) -> datetime:
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _lobby_etag(version: int, query: str, session_token: str | None) -> str:
+    """Tag for one lobby page as seen by one viewer.
+
+    Covers the lobby version, the query string and the session; the
+    process epoch keeps tags issued by another worker from ever matching.
+    """
+    viewer = hashlib.blake2b(
+        f"{query}|{session_token or ''}".encode(), digest_size=8
+    ).hexdigest()
+    return f'W/"{manager.epoch}.{version}.{viewer}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
 @router.get("", response_model=list[RecruitmentResponse])
 async def list_recruitments(
-    user: User | None = Depends(get_optional_user),
-    db: AsyncSession = Depends(get_db),
-) -> list[RecruitmentResponse]:
-    now = utcnow()
+    request: Request,
+    game: str | None = None,
+    region: str | None = None,
+    play_style: PlayStyle | None = None,
+    has_microphone: bool | None = None,
+    start_from: datetime | None = Query(None, description="Earliest start_time"),
+    start_to: datetime | None = Query(None, description="Latest start_time"),
+    after: uuid.UUID | None = Query(
+        None, description="Only return recruitments listed after this one"
+    ),
+    limit: int = Query(50, ge=1, le=200),
+    session_token: str | None = Cookie(default=None),
+    db: AsyncSession = Depends(get_db, scope="function"),
+) -> Response:
+    # Served from the in-memory snapshot; it is loaded at startup
+    if not lobby_snapshot.loaded:
+        await lobby_snapshot.load(db)
 
-    # Subquery: thumbs_up count per user
-    thumbs_up_sub = (
-        select(
-            Feedback.to_user_id,
-            func.count().label("thumbs_up_count"),
-        )
-        .where(Feedback.rating == Rating.thumbs_up)
-        .group_by(Feedback.to_user_id)
-        .subquery()
+    # Unchanged since the client's copy: answer before touching the database
+    etag = _lobby_etag(
+        lobby_snapshot.current_version(utcnow()), request.url.query, session_token
     )
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
 
-    stmt = (
-        select(
-            Recruitment,
-            User.nickname,
-            func.coalesce(thumbs_up_sub.c.thumbs_up_count, 0).label("thumbs_up_count"),
-        )
-        .join(User, User.id == Recruitment.user_id)
-        .outerjoin(thumbs_up_sub, thumbs_up_sub.c.to_user_id == Recruitment.user_id)
-        .where(Recruitment.status == RecruitmentStatus.open, Recruitment.expires_at > now)
-        .order_by(Recruitment.created_at.asc())
-    )
+    user = await get_optional_user(session_token, db)
+
+    # Keyset on (created_at, id) past the last recruitment of the previous page.
+    # The cursor may have left the lobby since; its row still has the position.
+    # An unknown cursor falls back to the first page.
+    cursor = None
+    if after:
+        last = lobby_snapshot.get(after) or await db.get(Recruitment, after)
+        if last:
+            cursor = (_utc(last.created_at), last.id)
 
     # Filter out recruitments from blocked/blocking users
-    if user:
-        blocked_ids = select(Block.blocked_id).where(Block.blocker_id == user.id)
-        blocker_ids = select(Block.blocker_id).where(Block.blocked_id == user.id)
-        stmt = stmt.where(
-            Recruitment.user_id.not_in(blocked_ids),
-            Recruitment.user_id.not_in(blocker_ids),
+    peers = await block_graph.peers(db, user.id) if user else frozenset()
+    start_from = _utc(start_from) if start_from else None
+    start_to = _utc(start_to) if start_to else None
+
+    def matches(r: RecruitmentResponse) -> bool:
+        return (
+            (game is None or r.game == game)
+            and (region is None or r.region == region)
+            and (play_style is None or r.play_style == play_style)
+            and (has_microphone is None or r.has_microphone == has_microphone)
+            and (start_from is None or _utc(r.start_time) >= start_from)
+            and (start_to is None or _utc(r.start_time) <= start_to)
+            and r.user_id not in peers
         )
 
-    result = await db.execute(stmt)
-    rows = result.all()
-    return [
-        RecruitmentResponse.model_validate(
-            {**r.__dict__, "nickname": nickname, "thumbs_up_count": thumbs_up_count}
+    # Snapshot entries are validated already; encode them without a second pass
+    return json_list(
+        RecruitmentResponse,
+        lobby_snapshot.open_recruitments(utcnow(), after=cursor, limit=limit, where=matches),
+        headers=headers,
+    )
+
+
+@router.get("/changes", response_model=RecruitmentChangesResponse)
+async def recruitment_changes(
+    since_version: int | None = Query(None, description="Lobby version the client has"),
+    epoch: str | None = Query(None, description="Epoch that version was issued under"),
+    user: User | None = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_db, scope="function"),
+) -> RecruitmentChangesResponse:
+    """Recruitments added, updated or removed since ``since_version``.
+
+    Falls back to the full lobby when the version was issued by another worker
+    or is older than the changelog.
+    """
+    if not lobby_snapshot.loaded:
+        await lobby_snapshot.load(db)
+    now = utcnow()
+    version = lobby_snapshot.current_version(now)
+
+    changed = None
+    if since_version is not None and epoch in (None, manager.epoch):
+        changed = lobby_snapshot.changed_since(since_version)
+
+    peers = await block_graph.peers(db, user.id) if user else frozenset()
+    if changed is None:
+        return RecruitmentChangesResponse(
+            epoch=manager.epoch,
+            version=version,
+            full=True,
+            recruitments=lobby_snapshot.open_recruitments(
+                now, where=lambda r: r.user_id not in peers
+            ),
+            removed=[],
         )
-        for r, nickname, thumbs_up_count in rows
-    ]
+
+    upserted: list[RecruitmentResponse] = []
+    removed: list[uuid.UUID] = []
+    for recruitment_id in changed:
+        r = lobby_snapshot.get(recruitment_id)
+        if r is not None and _utc(r.expires_at) > now and r.user_id not in peers:
+            upserted.append(r)
+        else:
+            removed.append(recruitment_id)
+    upserted.sort(key=lambda r: (_utc(r.created_at), r.id))
+    return RecruitmentChangesResponse(
+        epoch=manager.epoch, version=version, full=False, recruitments=upserted, removed=removed
+    )
 
 
 @router.post("", response_model=RecruitmentResponse, status_code=status.HTTP_201_CREATED)
@@ -87,7 +188,7 @@ async def create_recruitment(
     request: Request,
     body: RecruitmentCreate,
     user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> RecruitmentResponse:
     # Validate game slug against DB
     game_exists = await db.execute(
@@ -156,28 +257,69 @@ async def create_recruitment(
         expires_at=now + timedelta(minutes=settings.recruitment_expiry_minutes),
     )
     db.add(recruitment)
-    await db.commit()
+    await db.flush()
     await db.refresh(recruitment)
 
     response = RecruitmentResponse.model_validate(
-        {**recruitment.__dict__, "nickname": user.nickname}
+        {
+            **recruitment.__dict__,
+            "nickname": user.nickname,
+            "thumbs_up_count": user.thumbs_up_count,
+        }
     )
 
-    await manager.broadcast_to_lobby({
-        "type": "recruitment_update",
-        "data": {"action": "created", "recruitment_id": str(recruitment.id)},
-    })
+    enqueue_recruitment_created(db, response)
+    await db.commit()
+    lobby_snapshot.add(response)
+    outbox_publisher.notify()
 
     return response
 
 
+@router.post("/quick-join")
+@limiter.limit("10/hour")
+async def quick_join_recruitment(
+    request: Request,
+    game: str = Query(max_length=50),
+    region: str = Query(max_length=20),
+    mode: Literal["oldest", "rating"] = Query(
+        "oldest", description="Longest waiting recruitment, or the nearest-rated owner"
+    ),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db, scope="function"),
+) -> dict:
+    """Join the best open recruitment for a game and region.
+
+    The server picks and locks the recruitment, so concurrent joiners each get
+    a different one instead of racing for the same row.
+    """
+    if not validate_region(region):
+        raise HTTPException(status_code=400, detail="Invalid region")
+    # Checked up front: otherwise no recruitment would match and it would look like a 404
+    if await has_active_room(db, user.id):
+        raise HTTPException(status_code=409, detail="You already have an active room")
+
+    try:
+        if mode == "rating":
+            room = await auto_matcher.match_nearest(db, user.id, game, region)
+        else:
+            room = await quick_join(db, user.id, game, region)
+    except MatchRejected as e:
+        # Only joiner_busy gets here: the joiner entered a room since the check above
+        raise HTTPException(status_code=409, detail="You already have an active room") from e
+    if not room:
+        raise HTTPException(status_code=404, detail="No recruitment available to join")
+
+    return {"detail": "Matched", "room_id": str(room.id)}
+
+
 @router.post("/{recruitment_id}/join")
 @limiter.limit("10/hour")
 async def join_recruitment(
     request: Request,
     recruitment_id: uuid.UUID,
     user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> dict:
     recruitment = await db.get(Recruitment, recruitment_id)
     if not recruitment:
@@ -187,9 +329,13 @@ async def join_recruitment(
     if recruitment.user_id == user.id:
         raise HTTPException(status_code=400, detail="Cannot join your own recruitment")
 
-    room = await find_match_and_create_room(db, recruitment, user.id)
-    if not room:
-        raise HTTPException(status_code=409, detail="Match could not be created")
+    try:
+        room = await find_match_and_create_room(db, recruitment, user.id)
+    except MatchRejected as e:
+        # The reasons stay in the logs: they would tell the joiner they were blocked
+        if e.joiner_busy:
+            raise HTTPException(status_code=409, detail="You already have an active room") from e
+        raise HTTPException(status_code=409, detail="Match could not be created") from e
 
     return {"detail": "Matched", "room_id": str(room.id)}
 
@@ -198,7 +344,7 @@ async def join_recruitment(
 async def cancel_recruitment(
     recruitment_id: uuid.UUID,
     user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> dict[str, str]:
     recruitment = await db.get(Recruitment, recruitment_id)
     if not recruitment:
@@ -209,11 +355,11 @@ async def cancel_recruitment(
         raise HTTPException(status_code=400, detail="Recruitment is not open")
 
     recruitment.status = RecruitmentStatus.cancelled
+    enqueue_recruitment_removed(
+        db, recruitment.id, recruitment.game, recruitment.region, "cancelled"
+    )
     await db.commit()
-
-    await manager.broadcast_to_lobby({
-        "type": "recruitment_update",
-        "data": {"action": "cancelled", "recruitment_id": str(recruitment.id)},
-    })
+    lobby_snapshot.remove(recruitment.id)
+    outbox_publisher.notify()
 
     return {"detail": "Cancelled"}
@@ -25,7 +25,7 @@ async def create_report(
     request: Request,
     body: ReportCreate,
     user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> Report:
     if body.reported_id == user.id:
         raise HTTPException(status_code=400, detail="Cannot report yourself")
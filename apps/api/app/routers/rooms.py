@@ -1,17 +1,19 @@
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.dependencies import get_current_user
+from app.models.base import utcnow
 from app.models.feedback import Feedback
 from app.models.message import Message
 from app.models.recruitment import Recruitment
 from app.models.room import Room, RoomMember, RoomStatus
 from app.models.user import User
 from app.rate_limit import limiter
+from app.responses import json_list
 from app.schemas.room import (
     FeedbackCreate,
     MessageCreate,
@@ -19,9 +21,12 @@ from app.schemas.room import (
     RoomMemberResponse,
     RoomResponse,
 )
+from app.services.lobby import lobby_snapshot
 from app.services.moderation import check_content
+from app.services.outbox import enqueue_to_users, outbox_publisher
+from app.services.rating import rating_book, record_rating
+from app.services.reputation import record_feedback
 from app.utils.validators import sanitize_text
-from app.websocket import manager
 
 router = APIRouter(prefix="/api/rooms", tags=["rooms"])
 
@@ -41,11 +46,22 @@ async def _check_membership(room_id: uuid.UUID, user_id: uuid.UUID, db: AsyncSes
         raise HTTPException(status_code=403, detail="Not a member of this room")
 
 
+def _message_response(msg: Message, nickname: str | None) -> MessageResponse:
+    return MessageResponse(
+        id=msg.id,
+        room_id=msg.room_id,
+        user_id=msg.user_id,
+        content=msg.content,
+        created_at=msg.created_at,
+        nickname=nickname,
+    )
+
+
 @router.get("/{room_id}", response_model=RoomResponse)
 async def get_room(
     room_id: uuid.UUID,
     user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> RoomResponse:
     room = await _get_room_or_404(room_id, db)
     await _check_membership(room_id, user.id, db)
@@ -81,29 +97,38 @@ async def get_room(
 @router.get("/{room_id}/messages", response_model=list[MessageResponse])
 async def get_messages(
     room_id: uuid.UUID,
+    after: uuid.UUID | None = Query(None, description="Only return messages newer than this one"),
     user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
-) -> list[MessageResponse]:
+    db: AsyncSession = Depends(get_db, scope="function"),
+) -> Response:
     await _get_room_or_404(room_id, db)
     await _check_membership(room_id, user.id, db)
 
-    result = await db.execute(
-        select(Message, User.nickname)
+    stmt = (
+        select(
+            Message.id,
+            Message.room_id,
+            Message.user_id,
+            Message.content,
+            Message.created_at,
+            User.nickname,
+        )
         .join(User, User.id == Message.user_id)
         .where(Message.room_id == room_id)
-        .order_by(Message.created_at.asc())
+        .order_by(Message.created_at.asc(), Message.id.asc())
     )
-    return [
-        MessageResponse(
-            id=m.id,
-            room_id=m.room_id,
-            user_id=m.user_id,
-            content=m.content,
-            created_at=m.created_at,
-            nickname=nickname,
-        )
-        for m, nickname in result.all()
-    ]
+
+    # Catch-up after a reconnect: keyset on (created_at, id) past the last seen message.
+    # An unknown/expired cursor falls back to the full history.
+    if after:
+        cursor = await db.get(Message, after)
+        if cursor and cursor.room_id == room_id:
+            stmt = stmt.where(
+                tuple_(Message.created_at, Message.id) > (cursor.created_at, cursor.id)
+            )
+
+    result = await db.execute(stmt)
+    return json_list(MessageResponse, result.all(), from_attributes=True)
 
 
 @router.post(
@@ -115,7 +140,7 @@ async def send_message(
     room_id: uuid.UUID,
     body: MessageCreate,
     user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> MessageResponse:
     room = await _get_room_or_404(room_id, db)
     if room.status != RoomStatus.active:
@@ -125,29 +150,28 @@ async def send_message(
     content = sanitize_text(body.content)
     check_content(content, "message")
 
-    msg = Message(room_id=room_id, user_id=user.id, content=content)
+    # Microsecond timestamp from the app keeps the (created_at, id) catch-up cursor ordered
+    msg = Message(room_id=room_id, user_id=user.id, content=content, created_at=utcnow())
     db.add(msg)
-    await db.commit()
+    await db.flush()
     await db.refresh(msg)
+    response = _message_response(msg, user.nickname)
 
-    response = MessageResponse(
-        id=msg.id,
-        room_id=msg.room_id,
-        user_id=msg.user_id,
-        content=msg.content,
-        created_at=msg.created_at,
-        nickname=user.nickname,
-    )
-
-    # Notify room members via WebSocket
+    # Push the message itself so members append it without refetching the history
     members_result = await db.execute(
         select(RoomMember.user_id).where(RoomMember.room_id == room_id)
     )
     member_ids = [row[0] for row in members_result.all()]
-    await manager.send_to_users(
+    enqueue_to_users(
+        db,
         member_ids,
-        {"type": "new_message", "data": {"room_id": str(room_id)}},
+        {
+            "type": "new_message",
+            "data": {"room_id": str(room_id), "message": response.model_dump(mode="json")},
+        },
     )
+    await db.commit()
+    outbox_publisher.notify()
 
     return response
 
@@ -158,7 +182,7 @@ async def close_room(
     request: Request,
     room_id: uuid.UUID,
     user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> dict[str, str]:
     room = await _get_room_or_404(room_id, db)
     if room.status != RoomStatus.active:
@@ -188,18 +212,22 @@ async def close_room(
 
     if all_ready:
         room.status = RoomStatus.closed
-        await db.commit()
-        await manager.send_to_users(
+        enqueue_to_users(
+            db,
             member_ids,
             {"type": "room_closed", "data": {"room_id": str(room_id)}},
         )
+        await db.commit()
+        outbox_publisher.notify()
         return {"detail": "Room closed", "status": "closed"}
 
-    await db.commit()
-    await manager.send_to_users(
+    enqueue_to_users(
+        db,
         member_ids,
         {"type": "close_requested", "data": {"room_id": str(room_id), "user_id": str(user.id)}},
     )
+    await db.commit()
+    outbox_publisher.notify()
     return {"detail": "Waiting for other member to close", "status": "pending_close"}
 
 
@@ -208,7 +236,7 @@ async def submit_feedback(
     room_id: uuid.UUID,
     body: FeedbackCreate,
     user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> dict[str, str]:
     room = await _get_room_or_404(room_id, db)
     if room.status not in (RoomStatus.closed, RoomStatus.expired):
@@ -230,21 +258,28 @@ async def submit_feedback(
     if existing.scalar_one_or_none():
         raise HTTPException(status_code=409, detail="Feedback already submitted")
 
+    # Microsecond timestamp from the app keeps rebuild_ratings' replay in submission order
     feedback = Feedback(
         room_id=room_id,
         from_user_id=user.id,
         to_user_id=body.to_user_id,
         rating=body.rating,
+        created_at=utcnow(),
     )
     db.add(feedback)
+    thumbs_up_count = await record_feedback(db, body.to_user_id, body.rating)
+    game = await db.scalar(select(Recruitment.game).where(Recruitment.id == room.recruitment_id))
+    rating = await record_rating(db, game, user.id, body.to_user_id, body.rating)
     await db.commit()
+    lobby_snapshot.set_thumbs_up(body.to_user_id, thumbs_up_count)
+    rating_book.set(body.to_user_id, game, rating)
     return {"detail": "Feedback submitted"}
 
 
 @router.get("/pending-feedback", response_model=list[dict])
 async def get_pending_feedback_rooms(
     user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db, scope="function"),
 ) -> list[dict]:
     """Return closed/expired rooms where the user has not yet submitted feedback."""
     # Find rooms user is a member of that are closed/expired
@@ -1,51 +1,163 @@
-import asyncio
+import base64
+import hashlib
+import heapq
+import hmac
+import json
 import secrets
 import time
 import uuid
 
 from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
 
+from app.config import settings
 from app.dependencies import get_current_user
 from app.models.user import User
-from app.websocket import manager
+from app.services.games import game_catalog
+from app.utils.validators import validate_region
+from app.websocket import Topic, manager
 
 router = APIRouter(prefix="/api/ws", tags=["websocket"])
 
-# In-memory ticket store: ticket -> (user_id, expires_at)
-_ws_tickets: dict[str, tuple[uuid.UUID, float]] = {}
 _TICKET_TTL = 30  # seconds
 
 
-def _cleanup_expired_tickets() -> None:
-    now = time.time()
-    expired = [k for k, (_, exp) in _ws_tickets.items() if exp < now]
-    for k in expired:
-        del _ws_tickets[k]
+class _ReplaySet:
+    """Nonces of consumed tickets, kept until the ticket would have expired anyway.
+
+    A min-heap ordered by expiry lets each call drop only what has actually
+    expired, so lookups and inserts stay O(log n) instead of scanning.
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[float, str]] = []
+        self._seen: set[str] = set()
+
+    def _prune(self, now: float) -> None:
+        while self._heap and self._heap[0][0] < now:
+            _, nonce = heapq.heappop(self._heap)
+            self._seen.discard(nonce)
+
+    def add(self, nonce: str, expires_at: float) -> bool:
+        """Record ``nonce``; False if it was already used."""
+        self._prune(time.time())
+        if nonce in self._seen:
+            return False
+        self._seen.add(nonce)
+        heapq.heappush(self._heap, (expires_at, nonce))
+        return True
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+
+_used_tickets = _ReplaySet()
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(
+        settings.session_secret.encode(), b"ws-ticket:" + payload.encode(), hashlib.sha256
+    ).digest()
+    return _b64(digest)
+
+
+def _issue_ticket(user_id: uuid.UUID) -> str:
+    """Ticket format: ``<user_id hex>.<expires_at>.<nonce>.<signature>``."""
+    expires_at = int(time.time()) + _TICKET_TTL
+    payload = f"{user_id.hex}.{expires_at}.{secrets.token_urlsafe(12)}"
+    return f"{payload}.{_sign(payload)}"
 
 
 @router.post("/ticket")
 async def create_ws_ticket(
     user: User = Depends(get_current_user),
 ) -> dict[str, str]:
-    """Issue a short-lived, single-use ticket for WebSocket authentication."""
-    _cleanup_expired_tickets()
-    ticket = secrets.token_urlsafe(32)
-    _ws_tickets[ticket] = (user.id, time.time() + _TICKET_TTL)
-    return {"ticket": ticket}
+    """Issue a short-lived, single-use ticket for WebSocket authentication.
+
+    Tickets are signed with the session secret, so any worker can verify them.
+    Single use is only enforced per worker: with several workers a leaked
+    ticket can be redeemed once on each of them within its 30 second lifetime.
+    """
+    return {"ticket": _issue_ticket(user.id)}
 
 
 def _consume_ticket(ticket: str) -> uuid.UUID | None:
-    """Validate and consume a WS ticket. Returns user_id or None."""
-    _cleanup_expired_tickets()
-    entry = _ws_tickets.pop(ticket, None)
-    if entry is None:
+    """Validate and consume a WS ticket. Returns user_id or None.
+
+    Single use is enforced per worker; a ticket lives for only 30 seconds.
+    """
+    payload, _, signature = ticket.rpartition(".")
+    # Compared as bytes: compare_digest rejects non-ASCII str with TypeError
+    if not payload or not hmac.compare_digest(signature.encode(), _sign(payload).encode()):
+        return None
+    try:
+        user_hex, expires_str, nonce = payload.split(".")
+        user_id = uuid.UUID(hex=user_hex)
+        expires_at = int(expires_str)
+    except ValueError:
         return None
-    user_id, expires_at = entry
     if time.time() > expires_at:
         return None
+    if not _used_tickets.add(nonce, expires_at):
+        return None
     return user_id
 
 
+def _valid_topic(game: object, region: object, games: frozenset[str]) -> bool:
+    return (
+        isinstance(game, str)
+        and isinstance(region, str)
+        and game in games
+        and validate_region(region)
+    )
+
+
+def _parse_topics(data: object, games: frozenset[str]) -> set[Topic]:
+    """Extract valid (game, region) pairs from a subscribe payload; unknown ones are dropped.
+
+    ``games`` is the active game catalog, the one recruitments are validated against.
+    """
+    topics: set[Topic] = set()
+    if not isinstance(data, dict) or not isinstance(data.get("topics"), list):
+        return topics
+    for item in data["topics"]:
+        if isinstance(item, dict) and _valid_topic(item.get("game"), item.get("region"), games):
+            topics.add((item["game"], item["region"]))
+    return topics
+
+
+def _parse_topics_param(value: str, games: frozenset[str]) -> set[Topic]:
+    """Parse ``game:region,game:region`` from the connect URL."""
+    topics: set[Topic] = set()
+    for pair in value.split(","):
+        game, _, region = pair.partition(":")
+        if _valid_topic(game, region, games):
+            topics.add((game, region))
+    return topics
+
+
+async def _handle_client_message(ws: WebSocket, text: str) -> None:
+    try:
+        msg = json.loads(text)
+    except ValueError:
+        return
+    if not isinstance(msg, dict):
+        return
+    if msg.get("type") == "subscribe":
+        games = await game_catalog.active_slugs()
+        topics = await manager.subscribe(ws, _parse_topics(msg.get("data"), games))
+        await manager.send_to_socket(
+            ws,
+            {
+                "type": "subscribed",
+                "data": {"topics": [{"game": g, "region": r} for g, r in sorted(topics)]},
+            },
+        )
+
+
 @router.websocket("")
 async def websocket_endpoint(ws: WebSocket):
     ticket = ws.query_params.get("ticket", "")
@@ -54,14 +166,36 @@ async def websocket_endpoint(ws: WebSocket):
         await ws.close(code=4001, reason="Authentication failed")
         return
 
+    # Resume support: ?since=<seq>&epoch=<epoch> replays missed events.
+    # ?topics=game:region,... subscribes before the replay so it is filtered too.
+    since_param = ws.query_params.get("since")
+    since = int(since_param) if since_param and since_param.isdigit() else None
+    topics_param = ws.query_params.get("topics", "")
+    topics = (
+        _parse_topics_param(topics_param, await game_catalog.active_slugs())
+        if topics_param
+        else set()
+    )
+
     await ws.accept()
-    await manager.connect(user_id, ws)
+    await manager.connect(
+        user_id,
+        ws,
+        topics=topics,
+        since=since,
+        epoch=ws.query_params.get("epoch"),
+        hello=True,
+    )
     try:
+        # Idle sockets are closed by the manager's heartbeat, so no per-socket timeout here
         while True:
-            data = await asyncio.wait_for(ws.receive_text(), timeout=60)
+            data = await ws.receive_text()
+            manager.touch(ws)
             if data == "ping":
-                await ws.send_text("pong")
-    except (WebSocketDisconnect, asyncio.TimeoutError, Exception):
+                await manager.send_to_socket(ws, "pong")
+            elif data != "pong":
+                await _handle_client_message(ws, data)
+    except (WebSocketDisconnect, Exception):
         pass
     finally:
         await manager.disconnect(user_id, ws)
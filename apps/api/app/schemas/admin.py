@@ -38,3 +38,53 @@ class AdminStatsResponse(BaseModel):
     pending_reports: int
     total_users: int
     banned_users: int
+
+
+class WebSocketStatsResponse(BaseModel):
+    users: int
+    connections: int
+    lobby_connections: int
+    topics: int
+    seq: int
+    replay_users: int
+    queued_events: int
+    max_queue_depth: int
+    dropped_events: int
+    resyncs: int
+    evictions: int
+    pings_sent: int
+    idle_closes: int
+    lobby_updates_submitted: int
+    lobby_updates_coalesced: int
+    lobby_frames_sent: int
+    lobby_flushes: int
+    lobby_updates_pending: int
+    outbox_published: int
+    outbox_failures: int
+    outbox_batches: int
+    outbox_last_batch_ms: float
+    outbox_last_lag_ms: float
+
+
+class MatchmakingStatsResponse(BaseModel):
+    runs: int
+    attempts: int
+    matches: int
+    failures: int
+    matches_last_minute: int
+    last_run_ms: float
+    queues: int
+    queued: int
+    oldest_wait_seconds: float
+    wait_p50_seconds: float
+    wait_p95_seconds: float
+
+
+class DatabasePoolStatsResponse(BaseModel):
+    pool_size: int
+    checked_out: int
+    overflow: int
+    checkouts: int
+    checkout_p50_ms: float
+    checkout_p95_ms: float
+    checkout_max_ms: float
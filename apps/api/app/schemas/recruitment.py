@@ -43,3 +43,13 @@ class RecruitmentResponse(BaseModel):
     thumbs_up_count: int = 0
 
     model_config = {"from_attributes": True}
+
+
+class RecruitmentChangesResponse(BaseModel):
+    """Lobby delta since a version; ``full`` means ``recruitments`` is the whole lobby."""
+
+    epoch: str
+    version: int
+    full: bool
+    recruitments: list[RecruitmentResponse]
+    removed: list[uuid.UUID]
@@ -0,0 +1,355 @@
+import asyncio
+import bisect
+import itertools
+import logging
+import time
+import uuid
+from collections import deque
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.base import utcnow
+from app.models.rating import DEFAULT_RATING
+from app.models.room import Room
+from app.schemas.recruitment import RecruitmentResponse
+from app.services.blocks import block_graph
+from app.services.lobby import lobby_snapshot
+from app.services.matching import MatchRejected, find_match_and_create_room
+from app.services.rating import rating_book
+
+logger = logging.getLogger(__name__)
+
+# Matches counted for matches_last_minute
+_THROUGHPUT_WINDOW_SECONDS = 60.0
+
+
+def _aware(dt: datetime) -> datetime:
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _discard(keys: list[Any], key: Any) -> None:
+    i = bisect.bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key:
+        del keys[i]
+
+
+class MatchQueue:
+    """Open recruitments for one (game, region).
+
+    ``entries`` keeps arrival order, so iterating it visits the longest
+    waiting recruitment first. ``_starts`` and ``_by_rating`` are the same set
+    sorted by ``start_time`` and by the owner's rating, for the window and
+    nearest-rating lookups.
+    """
+
+    def __init__(self) -> None:
+        self.entries: dict[uuid.UUID, RecruitmentResponse] = {}
+        self.ratings: dict[uuid.UUID, int] = {}
+        self._starts: list[tuple[datetime, uuid.UUID]] = []
+        self._by_rating: list[tuple[int, uuid.UUID]] = []
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, r: RecruitmentResponse, rating: int = DEFAULT_RATING) -> None:
+        if r.id in self.entries:
+            _discard(self._by_rating, (self.ratings[r.id], r.id))
+        else:
+            bisect.insort(self._starts, (_aware(r.start_time), r.id))
+        bisect.insort(self._by_rating, (rating, r.id))
+        # Replacing an entry keeps its place in line
+        self.entries[r.id] = r
+        self.ratings[r.id] = rating
+
+    def remove(self, recruitment_id: uuid.UUID) -> None:
+        r = self.entries.pop(recruitment_id, None)
+        if r is not None:
+            _discard(self._starts, (_aware(r.start_time), r.id))
+            _discard(self._by_rating, (self.ratings.pop(r.id), r.id))
+
+    def starting_between(self, lo: datetime, hi: datetime) -> list[RecruitmentResponse]:
+        i = bisect.bisect_left(self._starts, lo, key=lambda k: k[0])
+        j = bisect.bisect_right(self._starts, hi, key=lambda k: k[0])
+        return [self.entries[rid] for _, rid in self._starts[i:j]]
+
+    def nearest(self, rating: int) -> Iterator[RecruitmentResponse]:
+        """Entries in order of rating distance from ``rating``, from a bisect of the index."""
+        keys = self._by_rating
+        hi = bisect.bisect_left(keys, rating, key=lambda k: k[0])
+        lo = hi - 1
+        while lo >= 0 or hi < len(keys):
+            if hi >= len(keys) or (lo >= 0 and rating - keys[lo][0] <= keys[hi][0] - rating):
+                yield self.entries[keys[lo][1]]
+                lo -= 1
+            else:
+                yield self.entries[keys[hi][1]]
+                hi += 1
+
+
+class AutoMatcher:
+    """Pairs open recruitments for the same game and region automatically.
+
+    Two recruitments are compatible when their start times are at most
+    ``window_minutes`` apart, they belong to different users and neither user
+    blocked the other. Every ``interval_seconds`` the queues are brought up to
+    date from the lobby snapshot's changelog and up to ``batch_size`` pairs are
+    planned, longest waiting first. Each partner is the longest waiting
+    compatible recruitment, or in ``"rating"`` mode the one whose owner's
+    rating in that game is nearest. Rooms are created through
+    ``find_match_and_create_room``, which locks both recruitments, so a pair
+    that a human join or another worker got to first simply fails.
+    """
+
+    def __init__(
+        self,
+        window_minutes: int | None = None,
+        interval_seconds: float | None = None,
+        batch_size: int | None = None,
+        mode: str | None = None,
+    ) -> None:
+        if window_minutes is None:
+            window_minutes = settings.start_time_window_minutes
+        if interval_seconds is None:
+            interval_seconds = settings.automatch_interval_seconds
+        self._window = timedelta(minutes=window_minutes)
+        self._interval = interval_seconds
+        self._batch_size = batch_size if batch_size is not None else settings.automatch_batch_size
+        self._mode = mode or settings.automatch_mode
+        self._queues: dict[tuple[str, str], MatchQueue] = {}
+        self._queue_of: dict[uuid.UUID, MatchQueue] = {}
+        self._version: int | None = None
+        # Pairs that already failed once; not retried while both stay queued
+        self._failed: set[frozenset[uuid.UUID]] = set()
+        self._task: asyncio.Task[None] | None = None
+
+        self.runs = 0
+        self.attempts = 0
+        self.matches = 0
+        self.failures = 0
+        self.last_run_ms = 0.0
+        self._waits: deque[float] = deque(maxlen=1000)
+        self._matched_at: deque[float] = deque()
+
+    async def _add_all(self, db: AsyncSession, recruitments: list[RecruitmentResponse]) -> None:
+        by_game: dict[str, list[RecruitmentResponse]] = {}
+        for r in recruitments:
+            by_game.setdefault(r.game, []).append(r)
+        for game, group in by_game.items():
+            ratings = await rating_book.get_many(db, game, (r.user_id for r in group))
+            for r in group:
+                queue = self._queues.setdefault((r.game, r.region), MatchQueue())
+                queue.add(r, ratings[r.user_id])
+                self._queue_of[r.id] = queue
+
+    def _remove(self, recruitment_id: uuid.UUID) -> None:
+        queue = self._queue_of.pop(recruitment_id, None)
+        if queue is None:
+            return
+        queue.remove(recruitment_id)
+        if self._failed:
+            self._failed = {pair for pair in self._failed if recruitment_id not in pair}
+
+    async def sync(self, db: AsyncSession, now: datetime) -> None:
+        """Bring the queues up to date with the lobby snapshot."""
+        if not lobby_snapshot.loaded:
+            await lobby_snapshot.load(db)
+        version = lobby_snapshot.current_version(now)
+        changed = lobby_snapshot.changed_since(self._version) if self._version is not None else None
+        if changed is None:
+            self.reset()
+            await self._add_all(db, lobby_snapshot.open_recruitments(now))
+        else:
+            added = []
+            for recruitment_id in changed:
+                r = lobby_snapshot.get(recruitment_id)
+                if r is None:
+                    self._remove(recruitment_id)
+                else:
+                    added.append(r)
+            added.sort(key=lambda r: (_aware(r.created_at), r.id))
+            await self._add_all(db, added)
+        self._version = version
+
+    async def plan(
+        self, db: AsyncSession, now: datetime
+    ) -> list[tuple[RecruitmentResponse, RecruitmentResponse]]:
+        """Pick up to ``batch_size`` disjoint pairs, longest waiting first."""
+        pairs: list[tuple[RecruitmentResponse, RecruitmentResponse]] = []
+        taken: set[uuid.UUID] = set()
+        queues = [q for q in self._queues.values() if q]
+        queues.sort(key=lambda q: _aware(next(iter(q.entries.values())).created_at))
+        for queue in queues:
+            for r in queue.entries.values():
+                if len(pairs) >= self._batch_size:
+                    return pairs
+                if r.user_id in taken or _aware(r.expires_at) <= now:
+                    continue
+                start = _aware(r.start_time)
+                peers = await block_graph.peers(db, r.user_id)
+
+                def compatible(c: RecruitmentResponse) -> bool:
+                    return (
+                        c.user_id != r.user_id
+                        and c.user_id not in taken
+                        and c.user_id not in peers
+                        and _aware(c.expires_at) > now
+                        and frozenset((r.id, c.id)) not in self._failed
+                    )
+
+                if self._mode == "rating":
+                    partner = next(
+                        (
+                            c
+                            for c in queue.nearest(queue.ratings[r.id])
+                            if abs(_aware(c.start_time) - start) <= self._window and compatible(c)
+                        ),
+                        None,
+                    )
+                else:
+                    candidates = [
+                        c
+                        for c in queue.starting_between(start - self._window, start + self._window)
+                        if compatible(c)
+                    ]
+                    partner = min(
+                        candidates, key=lambda c: (_aware(c.created_at), c.id), default=None
+                    )
+                if partner is not None:
+                    pairs.append((r, partner))
+                    taken.update((r.user_id, partner.user_id))
+        return pairs
+
+    async def match_nearest(
+        self,
+        db: AsyncSession,
+        joiner_id: uuid.UUID,
+        game: str,
+        region: str,
+        max_attempts: int = 5,
+    ) -> Room | None:
+        """Match the joiner with the open recruitment whose owner's rating is nearest theirs.
+
+        Candidates come from the queue's rating index, nearest first; each is
+        tried through ``find_match_and_create_room`` and one that another joiner
+        locked or took is skipped, up to ``max_attempts`` tries.
+        """
+        now = utcnow()
+        await self.sync(db, now)
+        queue = self._queues.get((game, region))
+        if not queue:
+            return None
+        rating = await rating_book.get(db, joiner_id, game)
+        peers = await block_graph.peers(db, joiner_id)
+        candidates = list(
+            itertools.islice(
+                (
+                    c
+                    for c in queue.nearest(rating)
+                    if c.user_id != joiner_id
+                    and c.user_id not in peers
+                    and _aware(c.expires_at) > now
+                ),
+                max_attempts,
+            )
+        )
+        for candidate in candidates:
+            try:
+                room = await find_match_and_create_room(db, candidate, joiner_id)
+            except MatchRejected as e:
+                if e.joiner_busy:
+                    raise
+                continue
+            self._remove(candidate.id)
+            return room
+        return None
+
+    async def run_once(self) -> int:
+        """Sync, plan one batch and try every pair. Returns the matches made."""
+        started = time.perf_counter()
+        now = utcnow()
+        async with async_session() as db:
+            await self.sync(db, now)
+            pairs = await self.plan(db, now)
+
+        made = 0
+        for first, second in pairs:
+            self.attempts += 1
+            try:
+                async with async_session() as db:
+                    await find_match_and_create_room(db, first, second.user_id, second.id)
+            except MatchRejected:
+                self.failures += 1
+                self._failed.add(frozenset((first.id, second.id)))
+                continue
+            made += 1
+            self._record_match(now, first, second)
+            self._remove(first.id)
+            self._remove(second.id)
+
+        self.runs += 1
+        self.last_run_ms = (time.perf_counter() - started) * 1000
+        if made:
+            logger.info("Auto-matched %d pairs", made)
+        return made
+
+    def _record_match(self, now: datetime, *matched: RecruitmentResponse) -> None:
+        self.matches += 1
+        self._matched_at.append(time.monotonic())
+        for r in matched:
+            self._waits.append((now - _aware(r.created_at)).total_seconds())
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Auto-matching run failed")
+
+    async def start(self) -> None:
+        if self._interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def reset(self) -> None:
+        self._queues.clear()
+        self._queue_of.clear()
+        self._version = None
+        self._failed.clear()
+
+    def stats(self) -> dict[str, Any]:
+        now = utcnow()
+        cutoff = time.monotonic() - _THROUGHPUT_WINDOW_SECONDS
+        while self._matched_at and self._matched_at[0] < cutoff:
+            self._matched_at.popleft()
+        waits = sorted(self._waits)
+        oldest = min(
+            (_aware(next(iter(q.entries.values())).created_at) for q in self._queues.values() if q),
+            default=None,
+        )
+        return {
+            "runs": self.runs,
+            "attempts": self.attempts,
+            "matches": self.matches,
+            "failures": self.failures,
+            "matches_last_minute": len(self._matched_at),
+            "last_run_ms": round(self.last_run_ms, 3),
+            "queues": sum(1 for q in self._queues.values() if q),
+            "queued": sum(len(q) for q in self._queues.values()),
+            "oldest_wait_seconds": (now - oldest).total_seconds() if oldest else 0.0,
+            "wait_p50_seconds": waits[len(waits) // 2] if waits else 0.0,
+            "wait_p95_seconds": waits[int(len(waits) * 0.95)] if waits else 0.0,
+        }
+
+
+auto_matcher = AutoMatcher()
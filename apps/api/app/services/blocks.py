@@ -0,0 +1,93 @@
+import json
+import time
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.block import Block
+
+
+class BlockGraph:
+    """In-memory copy of the ``blocks`` table, keyed by user in both directions.
+
+    ``peers(user)`` is every user that ``user`` blocked or was blocked by, which
+    is all lobby filtering and matching need. The whole table is read on first
+    use. Blocks created or removed on this worker are applied in place; a
+    ``blocks_changed`` event from another worker drops the graph so the next
+    lookup reloads it. Since that event can be lost, the graph is also reloaded
+    once it is ``max_age`` seconds old; matching never relies on it alone.
+    """
+
+    def __init__(self, max_age: float | None = None) -> None:
+        self._max_age = max_age if max_age is not None else settings.block_graph_max_age_seconds
+        self._loaded_at = 0.0
+        self._edges: set[tuple[uuid.UUID, uuid.UUID]] | None = None
+        self._peers: dict[uuid.UUID, set[uuid.UUID]] = {}
+        # Bumped on every change so a load that raced with one is not cached
+        self._generation = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._edges is not None
+
+    async def _load(self, db: AsyncSession) -> None:
+        generation = self._generation
+        loaded_at = time.monotonic()
+        result = await db.execute(select(Block.blocker_id, Block.blocked_id))
+        edges = {(blocker, blocked) for blocker, blocked in result.all()}
+        peers: dict[uuid.UUID, set[uuid.UUID]] = {}
+        for blocker, blocked in edges:
+            peers.setdefault(blocker, set()).add(blocked)
+            peers.setdefault(blocked, set()).add(blocker)
+        if generation == self._generation:
+            self._edges, self._peers = edges, peers
+            self._loaded_at = loaded_at
+
+    async def peers(self, db: AsyncSession, user_id: uuid.UUID) -> frozenset[uuid.UUID]:
+        """Users that ``user_id`` blocked or was blocked by."""
+        if self._edges is None or time.monotonic() - self._loaded_at > self._max_age:
+            await self._load(db)
+        return frozenset(self._peers.get(user_id, ()))
+
+    async def blocked_between(self, db: AsyncSession, a: uuid.UUID, b: uuid.UUID) -> bool:
+        return b in await self.peers(db, a)
+
+    def add(self, blocker_id: uuid.UUID, blocked_id: uuid.UUID) -> None:
+        self._generation += 1
+        if self._edges is None:
+            return
+        self._edges.add((blocker_id, blocked_id))
+        self._peers.setdefault(blocker_id, set()).add(blocked_id)
+        self._peers.setdefault(blocked_id, set()).add(blocker_id)
+
+    def discard(self, blocker_id: uuid.UUID, blocked_id: uuid.UUID) -> None:
+        self._generation += 1
+        if self._edges is None:
+            return
+        self._edges.discard((blocker_id, blocked_id))
+        # Still peers if the block in the other direction remains
+        if (blocked_id, blocker_id) not in self._edges:
+            self._peers.get(blocker_id, set()).discard(blocked_id)
+            self._peers.get(blocked_id, set()).discard(blocker_id)
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._edges = None
+        self._peers = {}
+
+    def apply_event(self, body: str, user_ids: list[uuid.UUID] | None = None) -> None:
+        """Drop the graph when another worker reports a block change."""
+        if json.loads(body).get("type") == "blocks_changed":
+            self.invalidate()
+
+
+block_graph = BlockGraph()
+
+
+async def peers_of(user_id: uuid.UUID) -> frozenset[uuid.UUID]:
+    """``block_graph.peers`` in its own session, for lobby events from other workers."""
+    async with async_session() as db:
+        return await block_graph.peers(db, user_id)
@@ -10,6 +10,8 @@ from app.models.base import utcnow
 from app.models.message import Message
 from app.models.recruitment import Recruitment, RecruitmentStatus
 from app.models.room import Room, RoomStatus
+from app.services.lobby import lobby_snapshot
+from app.services.outbox import enqueue_recruitment_removed, outbox_publisher
 
 logger = logging.getLogger(__name__)
 
@@ -35,12 +37,20 @@ async def expire_recruitments() -> int:
                 Recruitment.expires_at <= now,
             )
             .values(status=RecruitmentStatus.expired)
+            .returning(Recruitment.id, Recruitment.game, Recruitment.region)
         )
+        expired = result.all()
+        for recruitment_id, game, region in expired:
+            enqueue_recruitment_removed(db, recruitment_id, game, region, "expired")
         await db.commit()
-        count = result.rowcount
-        if count:
-            logger.info("Expired %d recruitments", count)
-        return count
+    for recruitment_id, _, _ in expired:
+        lobby_snapshot.remove(recruitment_id)
+    if expired:
+        outbox_publisher.notify()
+    count = len(expired)
+    if count:
+        logger.info("Expired %d recruitments", count)
+    return count
 
 
 async def expire_rooms() -> int:
@@ -0,0 +1,36 @@
+import time
+
+from sqlalchemy import select
+
+from app.database import async_session
+from app.models.game import Game
+
+# Games are added or deactivated rarely; re-read the catalog this often
+_CACHE_SECONDS = 60.0
+
+
+class GameCatalog:
+    """Slugs of the active games in the ``games`` table, cached in memory.
+
+    The same catalog ``create_recruitment`` validates against, for callers
+    that have no database session at hand, such as WebSocket topic parsing.
+    """
+
+    def __init__(self, max_age: float = _CACHE_SECONDS) -> None:
+        self._max_age = max_age
+        self._slugs: frozenset[str] | None = None
+        self._loaded_at = 0.0
+
+    async def active_slugs(self) -> frozenset[str]:
+        if self._slugs is None or time.monotonic() - self._loaded_at > self._max_age:
+            async with async_session() as db:
+                result = await db.scalars(select(Game.slug).where(Game.is_active.is_(True)))
+                self._slugs = frozenset(result.all())
+            self._loaded_at = time.monotonic()
+        return self._slugs
+
+    def clear(self) -> None:
+        self._slugs = None
+
+
+game_catalog = GameCatalog()
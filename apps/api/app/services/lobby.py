@@ -0,0 +1,442 @@
+import asyncio
+import bisect
+import itertools
+import json
+import logging
+import uuid
+from collections import OrderedDict, deque
+from collections.abc import Callable, Iterator
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.base import utcnow
+from app.models.recruitment import Recruitment, RecruitmentStatus
+from app.models.user import User
+from app.schemas.recruitment import RecruitmentResponse
+from app.services.blocks import block_graph
+from app.websocket import ConnectionManager, Topic, encode_event, manager
+
+logger = logging.getLogger(__name__)
+
+# Topic, excluded users and, when those are someone's block peers, whose
+_GroupKey = tuple[Topic, frozenset[uuid.UUID], uuid.UUID | None]
+
+
+def _escaped_size(text: str) -> int:
+    """Bytes ``text`` takes once embedded as a JSON string, as in a backplane envelope."""
+    return len(text.encode()) + text.count('"') + text.count("\\")
+
+
+_BATCH_FRAME_SIZE = _escaped_size('{"type":"recruitment_batch","data":{"updates":[]}}')
+
+
+class LobbyCoalescer:
+    """Micro-batches recruitment_update broadcasts.
+
+    Updates are collected for ``window_ms`` and only the latest state of each
+    recruitment is kept, so a recruitment created and matched inside one window
+    produces a single tombstone. Each flush sends one frame per (topic, excluded
+    users) group: a plain ``recruitment_update`` when it holds one update, a
+    ``recruitment_batch`` with ``data.updates`` otherwise. Groups too large
+    for one backplane message are split into frames of at most
+    ``max_frame_bytes``. A window of 0 broadcasts every update immediately.
+    """
+
+    def __init__(
+        self,
+        connections: ConnectionManager,
+        window_ms: int | None = None,
+        max_batch: int | None = None,
+        max_frame_bytes: int | None = None,
+    ) -> None:
+        self._manager = connections
+        self._window = (
+            window_ms if window_ms is not None else settings.lobby_coalesce_window_ms
+        ) / 1000
+        self._max_batch = max_batch if max_batch is not None else settings.lobby_coalesce_max_batch
+        if max_frame_bytes is None:
+            max_frame_bytes = settings.lobby_coalesce_max_frame_bytes
+        self._max_frame_bytes = max_frame_bytes
+        # recruitment_id -> (group, update); dict order is arrival order of the latest state
+        self._pending: dict[str, tuple[_GroupKey, dict[str, Any]]] = {}
+        self._timer: asyncio.Task[None] | None = None
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.frames_sent = 0
+        self.flushes = 0
+
+    async def submit(
+        self,
+        update: dict[str, Any],
+        topic: Topic,
+        exclude_users: frozenset[uuid.UUID] = frozenset(),
+        exclude_peers_of: uuid.UUID | None = None,
+    ) -> None:
+        self.submitted += 1
+        group: _GroupKey = (topic, exclude_users, exclude_peers_of)
+        if self._window <= 0:
+            await self._send(group, [update])
+            return
+
+        if self._pending.pop(update["recruitment_id"], None) is not None:
+            self.coalesced += 1
+        self._pending[update["recruitment_id"]] = (group, update)
+
+        if len(self._pending) >= self._max_batch:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self._window)
+        self._timer = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Error flushing lobby updates")
+
+    async def flush(self) -> None:
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        self._timer = None
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        self.flushes += 1
+        groups: dict[_GroupKey, list[dict[str, Any]]] = {}
+        for group, update in pending.values():
+            groups.setdefault(group, []).append(update)
+        for group, updates in groups.items():
+            await self._send(group, updates)
+
+    async def _send(self, group: _GroupKey, updates: list[dict[str, Any]]) -> None:
+        topic, exclude_users, exclude_peers_of = group
+        # Each update is encoded once and frames are assembled from the pieces
+        for parts in self._frames([encode_event(u) for u in updates]):
+            if len(parts) == 1:
+                body = f'{{"type":"recruitment_update","data":{parts[0]}}}'
+            else:
+                body = f'{{"type":"recruitment_batch","data":{{"updates":[{",".join(parts)}]}}}}'
+            self.frames_sent += 1
+            await self._manager.broadcast_to_lobby(
+                body, topic=topic, exclude_users=exclude_users, exclude_peers_of=exclude_peers_of
+            )
+
+    def _frames(self, parts: list[str]) -> Iterator[list[str]]:
+        """Split encoded updates into frames of at most ``max_frame_bytes`` once escaped.
+
+        An update larger than that on its own still goes out, alone.
+        """
+        frame: list[str] = []
+        size = _BATCH_FRAME_SIZE
+        for part in parts:
+            part_size = _escaped_size(part) + 1
+            if frame and size + part_size > self._max_frame_bytes:
+                yield frame
+                frame, size = [], _BATCH_FRAME_SIZE
+            frame.append(part)
+            size += part_size
+        if frame:
+            yield frame
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "lobby_updates_submitted": self.submitted,
+            "lobby_updates_coalesced": self.coalesced,
+            "lobby_frames_sent": self.frames_sent,
+            "lobby_flushes": self.flushes,
+            "lobby_updates_pending": len(self._pending),
+        }
+
+
+lobby_updates = LobbyCoalescer(manager)
+
+
+def _aware(dt: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything is stored as UTC
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _sort_key(r: RecruitmentResponse) -> tuple[datetime, uuid.UUID]:
+    return _aware(r.created_at), r.id
+
+
+class LobbySnapshot:
+    """In-process index of open recruitments serving the lobby list.
+
+    Loaded from the database at startup and kept current by the same calls that
+    publish lobby events: ``publish_recruitment_created`` adds,
+    ``publish_recruitment_removed`` (cancel, match, expiry) removes, and events
+    published by other workers arrive through the backplane. A periodic reload
+    repairs anything missed, e.g. a dropped NOTIFY or a changed thumbs-up count.
+    Removed ids are remembered for a while so a late ``created`` or a reload
+    cannot bring a recruitment back, and changes applied while a reload's query
+    runs win over its rows.
+
+    ``version`` increases on every change to the list, including recruitments
+    passing their expiry and blocks or unblocks seen by this worker; it makes the
+    lobby ETag. The last ``changelog_size`` changes are kept so a client can
+    catch up from its version with just the recruitments that changed.
+    """
+
+    def __init__(
+        self,
+        refresh_seconds: float | None = None,
+        tombstones: int = 10000,
+        changelog_size: int | None = None,
+    ) -> None:
+        self._refresh = (
+            refresh_seconds
+            if refresh_seconds is not None
+            else settings.lobby_snapshot_refresh_seconds
+        )
+        self._open: dict[uuid.UUID, RecruitmentResponse] = {}
+        self._ordered: list[RecruitmentResponse] | None = None
+        self._keys: list[tuple[datetime, uuid.UUID]] = []
+        self._removed: OrderedDict[uuid.UUID, None] = OrderedDict()
+        self._max_tombstones = tombstones
+        self._next_expiry: datetime | None = None
+        self._task: asyncio.Task[None] | None = None
+        # Ids changed while each running load awaited its query
+        self._loading: list[set[uuid.UUID]] = []
+        self.loaded = False
+        self.version = 0
+        # (version, recruitment id) per change; None marks a block change
+        self._changelog: deque[tuple[int, uuid.UUID | None]] = deque(
+            maxlen=changelog_size if changelog_size is not None else settings.lobby_changelog_size
+        )
+
+    def _changed(self, recruitment_id: uuid.UUID | None) -> None:
+        self._ordered = None
+        self.version += 1
+        self._changelog.append((self.version, recruitment_id))
+        if recruitment_id is not None:
+            for touched in self._loading:
+                touched.add(recruitment_id)
+
+    def add(self, recruitment: RecruitmentResponse) -> None:
+        if recruitment.id in self._removed:
+            return
+        self._open[recruitment.id] = recruitment
+        self._changed(recruitment.id)
+
+    def remove(self, recruitment_id: uuid.UUID) -> None:
+        self._removed[recruitment_id] = None
+        self._removed.move_to_end(recruitment_id)
+        if len(self._removed) > self._max_tombstones:
+            self._removed.popitem(last=False)
+        if self._open.pop(recruitment_id, None) is not None:
+            self._changed(recruitment_id)
+
+    def set_thumbs_up(self, user_id: uuid.UUID, count: int) -> None:
+        for recruitment in self._open.values():
+            if recruitment.user_id == user_id and recruitment.thumbs_up_count != count:
+                recruitment.thumbs_up_count = count
+                self._changed(recruitment.id)
+
+    def blocks_changed(self) -> None:
+        # Who sees what changed; deltas across this point fall back to a full list
+        self._changed(None)
+
+    def changed_since(self, version: int) -> set[uuid.UUID] | None:
+        """Ids of recruitments added, updated or removed after ``version``.
+
+        None when the changelog no longer reaches back that far, or when a block
+        change in between means the whole list has to be sent again.
+        """
+        if version > self.version:
+            return None
+        if version == self.version:
+            return set()
+        if not self._changelog or self._changelog[0][0] > version + 1:
+            return None
+        changed: set[uuid.UUID] = set()
+        for entry_version, recruitment_id in reversed(self._changelog):
+            if entry_version <= version:
+                break
+            if recruitment_id is None:
+                return None
+            changed.add(recruitment_id)
+        return changed
+
+    def current_version(self, now: datetime) -> int:
+        """``version`` after dropping recruitments that expired by ``now``."""
+        self._sorted()
+        if self._next_expiry is not None and self._next_expiry <= now:
+            for r in [r for r in self._open.values() if _aware(r.expires_at) <= now]:
+                self.remove(r.id)
+        return self.version
+
+    def apply_update(self, update: dict[str, Any]) -> None:
+        if update.get("action") == "created":
+            self.add(RecruitmentResponse.model_validate(update["recruitment"]))
+        else:
+            self.remove(uuid.UUID(update["recruitment_id"]))
+
+    def apply_event(self, body: str, user_ids: list[uuid.UUID] | None = None) -> None:
+        """Apply an event published by another worker."""
+        event = json.loads(body)
+        if event.get("type") == "recruitment_update":
+            self.apply_update(event["data"])
+        elif event.get("type") == "recruitment_batch":
+            for update in event["data"]["updates"]:
+                self.apply_update(update)
+        elif event.get("type") == "blocks_changed":
+            self.blocks_changed()
+
+    def get(self, recruitment_id: uuid.UUID) -> RecruitmentResponse | None:
+        return self._open.get(recruitment_id)
+
+    def _sorted(self) -> list[RecruitmentResponse]:
+        if self._ordered is None:
+            self._ordered = sorted(self._open.values(), key=_sort_key)
+            self._keys = [_sort_key(r) for r in self._ordered]
+            self._next_expiry = min((_aware(r.expires_at) for r in self._ordered), default=None)
+        return self._ordered
+
+    def open_recruitments(
+        self,
+        now: datetime,
+        after: tuple[datetime, uuid.UUID] | None = None,
+        limit: int | None = None,
+        where: Callable[[RecruitmentResponse], bool] | None = None,
+    ) -> list[RecruitmentResponse]:
+        """Open, unexpired recruitments ordered by (created_at, id).
+
+        ``after`` is a keyset cursor; the scan stops once ``limit`` matches are found.
+        """
+        ordered = self._sorted()
+        start = bisect.bisect_right(self._keys, after) if after else 0
+        page: list[RecruitmentResponse] = []
+        for r in itertools.islice(ordered, start, None):
+            if _aware(r.expires_at) <= now or (where is not None and not where(r)):
+                continue
+            page.append(r)
+            if limit is not None and len(page) >= limit:
+                break
+        return page
+
+    async def load(self, db: AsyncSession) -> None:
+        touched: set[uuid.UUID] = set()
+        self._loading.append(touched)
+        try:
+            result = await db.execute(
+                select(Recruitment, User.nickname, User.thumbs_up_count)
+                .join(User, User.id == Recruitment.user_id)
+                .where(
+                    Recruitment.status == RecruitmentStatus.open,
+                    Recruitment.expires_at > utcnow(),
+                )
+            )
+        finally:
+            self._loading.remove(touched)
+        fresh = {
+            r.id: RecruitmentResponse.model_validate(
+                {**r.__dict__, "nickname": nickname, "thumbs_up_count": thumbs_up_count}
+            )
+            for r, nickname, thumbs_up_count in result.all()
+            if r.id not in self._removed
+        }
+        # Adds and removes applied during the query are newer than its rows
+        for rid in touched:
+            if rid in self._open:
+                fresh[rid] = self._open[rid]
+            else:
+                fresh.pop(rid, None)
+        if self.loaded:
+            # Log the difference so clients can still catch up across a reload
+            old = self._open
+            self._open = fresh
+            for rid in old.keys() - fresh.keys():
+                self._changed(rid)
+            for rid, recruitment in fresh.items():
+                if old.get(rid) != recruitment:
+                    self._changed(rid)
+        else:
+            self._open = fresh
+            self._changelog.clear()
+            self._changed(None)
+        self.loaded = True
+
+    def reset(self) -> None:
+        self._open.clear()
+        self._ordered = None
+        self._removed.clear()
+        self.loaded = False
+        self.version = 0
+        self._changelog.clear()
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._refresh)
+            try:
+                async with async_session() as db:
+                    await self.load(db)
+            except Exception:
+                logger.exception("Error reloading lobby snapshot")
+
+    async def start(self) -> None:
+        async with async_session() as db:
+            await self.load(db)
+        manager.add_remote_listener(self.apply_event)
+        if self._refresh > 0:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+lobby_snapshot = LobbySnapshot()
+
+
+async def publish_recruitment_created(db: AsyncSession, response: RecruitmentResponse) -> None:
+    """Broadcast a new open recruitment with its full payload.
+
+    Lobby clients insert it directly instead of refetching the list. Users in a
+    block relationship with the owner never see it, matching list_recruitments.
+    Handlers don't call the ``publish_*`` functions themselves: they update
+    ``lobby_snapshot`` on commit and leave the broadcast to the outbox publisher
+    (``app.services.outbox``), which calls these.
+    """
+    lobby_snapshot.add(response)
+    exclude = await block_graph.peers(db, response.user_id)
+    await lobby_updates.submit(
+        {
+            "action": "created",
+            "recruitment_id": str(response.id),
+            "recruitment": response.model_dump(mode="json"),
+        },
+        topic=(response.game, response.region),
+        exclude_users=exclude,
+        # Other workers look the peers up themselves; the list can outgrow a NOTIFY
+        exclude_peers_of=response.user_id,
+    )
+
+
+async def publish_recruitment_removed(
+    recruitment_id: uuid.UUID, game: str, region: str, action: str
+) -> None:
+    """Broadcast a tombstone for a recruitment that left the open list.
+
+    ``action`` is one of ``cancelled``, ``matched`` or ``expired``.
+    """
+    lobby_snapshot.remove(recruitment_id)
+    await lobby_updates.submit(
+        {"action": action, "recruitment_id": str(recruitment_id)},
+        topic=(game, region),
+    )
+
+
+async def publish_blocks_changed(blocker_id: uuid.UUID, blocked_id: uuid.UUID) -> None:
+    """Tell both users (and every worker's lobby ETag) that a block was added or removed."""
+    lobby_snapshot.blocks_changed()
+    await manager.send_to_users([blocker_id, blocked_id], {"type": "blocks_changed", "data": {}})
@@ -1,109 +1,241 @@
+import logging
 import uuid
-from datetime import timedelta
+from datetime import datetime, timedelta
+from typing import Any
 
-from sqlalchemy import select
+from sqlalchemy import Row, Select, and_, exists, insert, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
 
 from app.config import settings as app_settings
-from app.models.base import utcnow
+from app.models.base import new_uuid, utcnow
 from app.models.block import Block
 from app.models.recruitment import Recruitment, RecruitmentStatus
 from app.models.room import Room, RoomMember, RoomStatus
-from app.websocket import manager
+from app.schemas.recruitment import RecruitmentResponse
+from app.services.blocks import block_graph
+from app.services.lobby import lobby_snapshot
+from app.services.outbox import enqueue_recruitment_removed, enqueue_to_users, outbox_publisher
+
+logger = logging.getLogger(__name__)
+
+
+class MatchRejected(Exception):
+    """A match that cannot be made.
+
+    ``reasons`` are for logs and the auto-matcher only: they say whether the
+    other user blocked the joiner or is in another room, so the API shows
+    the joiner no more than ``joiner_busy``.
+    """
+
+    def __init__(self, *reasons: str, joiner_busy: bool = False) -> None:
+        super().__init__("; ".join(reasons))
+        self.reasons = reasons
+        self.joiner_busy = joiner_busy
+
+
+def _rejected(
+    recruitment_id: uuid.UUID, joiner_id: uuid.UUID, *reasons: str, joiner_busy: bool = False
+) -> MatchRejected:
+    logger.debug(
+        "Match of recruitment %s with user %s rejected: %s",
+        recruitment_id,
+        joiner_id,
+        "; ".join(reasons),
+    )
+    return MatchRejected(*reasons, joiner_busy=joiner_busy)
+
+
+def _in_active_room(user_id: uuid.UUID | ColumnElement[uuid.UUID]) -> ColumnElement[bool]:
+    return exists().where(
+        RoomMember.user_id == user_id,
+        Room.id == RoomMember.room_id,
+        Room.status == RoomStatus.active,
+    )
+
+
+async def has_active_room(db: AsyncSession, user_id: uuid.UUID) -> bool:
+    return bool(await db.scalar(select(_in_active_room(user_id))))
+
+
+def _blocked_between(
+    user_id: uuid.UUID | ColumnElement[uuid.UUID], other_id: uuid.UUID
+) -> ColumnElement[bool]:
+    return exists().where(
+        or_(
+            and_(Block.blocker_id == user_id, Block.blocked_id == other_id),
+            and_(Block.blocker_id == other_id, Block.blocked_id == user_id),
+        )
+    )
+
+
+def _locked_columns(joiner_id: uuid.UUID) -> tuple[Any, ...]:
+    return (
+        Recruitment.id,
+        Recruitment.user_id,
+        Recruitment.game,
+        Recruitment.region,
+        Recruitment.desired_role,
+        _in_active_room(Recruitment.user_id).label("owner_busy"),
+        _in_active_room(joiner_id).label("joiner_busy"),
+        _blocked_between(Recruitment.user_id, joiner_id).label("blocked"),
+    )
+
+
+def _for_update(db: AsyncSession, stmt: Select[Any]) -> Select[Any]:
+    # SQLite doesn't support FOR UPDATE
+    dialect = db.bind.dialect.name if db.bind else ""
+    if dialect != "sqlite":
+        stmt = stmt.with_for_update(of=Recruitment, skip_locked=True)
+    return stmt
 
 
 async def find_match_and_create_room(
     db: AsyncSession,
-    recruitment: Recruitment,
+    recruitment: Recruitment | RecruitmentResponse,
     joiner_id: uuid.UUID,
-) -> Room | None:
+    joiner_recruitment_id: uuid.UUID | None = None,
+) -> Room:
     """
     Try to match a joiner to an open recruitment.
     Uses SELECT ... FOR UPDATE SKIP LOCKED to prevent race conditions.
-    Returns the created Room or None if match cannot be made.
+    Returns the created Room, or raises MatchRejected with every reason the
+    locking statement found.
+
+    Blocks known to the in-memory graph are rejected before taking the lock.
+    One statement then locks the recruitment and reports whether either user
+    already has an active room and, from the ``blocks`` table itself, whether
+    they blocked each other, so a stale graph cannot let a blocked pair match.
+    The room, its members and the status change follow as three writes in the
+    same transaction.
+
+    With ``joiner_recruitment_id`` (automatic matching) the joiner's own open
+    recruitment is locked in the same statement and closed with the first; the
+    joiner takes its desired role.
     """
     now = utcnow()
 
-    # Check the recruitment is still open (with lock on PostgreSQL)
-    stmt = select(Recruitment).where(
-        Recruitment.id == recruitment.id,
+    # Check blocker/blocked relationship (the owner never changes)
+    if await block_graph.blocked_between(db, recruitment.user_id, joiner_id):
+        raise _rejected(recruitment.id, joiner_id, "Users have blocked each other")
+
+    # Lock the recruitment(s) if still open, with the active-room and block checks
+    ids = [recruitment.id]
+    if joiner_recruitment_id is not None:
+        ids.append(joiner_recruitment_id)
+    stmt = select(*_locked_columns(joiner_id)).where(
+        Recruitment.id.in_(ids),
         Recruitment.status == RecruitmentStatus.open,
         Recruitment.expires_at > now,
     )
-    # SQLite doesn't support FOR UPDATE
-    dialect = db.bind.dialect.name if db.bind else ""
-    if dialect != "sqlite":
-        stmt = stmt.with_for_update(skip_locked=True)
-    result = await db.execute(stmt)
-    locked_recruitment = result.scalar_one_or_none()
-    if not locked_recruitment:
-        return None
+    rows = {r.id: r for r in (await db.execute(_for_update(db, stmt))).all()}
+    reasons: list[str] = []
+    if recruitment.id not in rows:
+        # Matched, cancelled or expired meanwhile, or being joined by someone else
+        reasons.append("Recruitment is no longer available")
+    if joiner_recruitment_id is not None and joiner_recruitment_id not in rows:
+        reasons.append("The joiner's recruitment is no longer available")
+    if any(r.blocked for r in rows.values()):
+        reasons.append("Users have blocked each other")
+    if any(r.owner_busy for r in rows.values() if r.user_id != joiner_id):
+        reasons.append("The recruiter is already in an active room")
+    joiner_busy = any(r.joiner_busy for r in rows.values())
+    if joiner_busy:
+        reasons.append("The joiner is already in an active room")
+    if reasons:
+        raise _rejected(recruitment.id, joiner_id, *reasons, joiner_busy=joiner_busy)
+    return await _create_room(
+        db, now, rows[recruitment.id], joiner_id, rows.get(joiner_recruitment_id)
+    )
+
+
+async def quick_join(
+    db: AsyncSession, joiner_id: uuid.UUID, game: str, region: str
+) -> Room | None:
+    """Match the joiner with the longest waiting open recruitment for ``game``/``region``.
 
-    # Check blocker/blocked relationship
-    block_check = await db.execute(
-        select(Block).where(
-            (
-                (Block.blocker_id == locked_recruitment.user_id)
-                & (Block.blocked_id == joiner_id)
-            )
-            | (
-                (Block.blocker_id == joiner_id)
-                & (Block.blocked_id == locked_recruitment.user_id)
-            )
+    A single SELECT ... FOR UPDATE SKIP LOCKED LIMIT 1 picks the oldest
+    recruitment that is not the joiner's own, not from a blocked or blocking
+    user and whose owner has no active room. Rows other joiners hold are
+    skipped rather than waited on, so concurrent quick joins each take a
+    different recruitment. None when nothing is available; raises
+    MatchRejected with ``joiner_busy`` if the joiner already has an active
+    room (callers check that first, so only after a race).
+    """
+    now = utcnow()
+    stmt = (
+        select(*_locked_columns(joiner_id))
+        .where(
+            Recruitment.game == game,
+            Recruitment.region == region,
+            Recruitment.status == RecruitmentStatus.open,
+            Recruitment.expires_at > now,
+            Recruitment.user_id != joiner_id,
+            ~_in_active_room(Recruitment.user_id),
+            ~_blocked_between(Recruitment.user_id, joiner_id),
         )
+        .order_by(Recruitment.created_at, Recruitment.id)
+        .limit(1)
     )
-    if block_check.scalar_one_or_none():
+    row = (await db.execute(_for_update(db, stmt))).one_or_none()
+    if row is None:
         return None
+    if row.joiner_busy:
+        raise _rejected(
+            row.id, joiner_id, "The joiner is already in an active room", joiner_busy=True
+        )
+    return await _create_room(db, now, row, joiner_id)
 
-    # Check joiner doesn't already have an active room
-    active_room_check = await db.execute(
-        select(RoomMember)
-        .join(Room, Room.id == RoomMember.room_id)
-        .where(RoomMember.user_id == joiner_id, Room.status == RoomStatus.active)
-    )
-    if active_room_check.scalar_one_or_none():
-        return None
 
-    # Check owner doesn't already have an active room
-    owner_room_check = await db.execute(
-        select(RoomMember)
-        .join(Room, Room.id == RoomMember.room_id)
-        .where(RoomMember.user_id == locked_recruitment.user_id, Room.status == RoomStatus.active)
-    )
-    if owner_room_check.scalar_one_or_none():
-        return None
+async def _create_room(
+    db: AsyncSession,
+    now: datetime,
+    owner: Row[Any],
+    joiner_id: uuid.UUID,
+    joiner_recruitment: Row[Any] | None = None,
+) -> Room:
+    """Create the room for locked recruitment rows, close them and notify both users."""
+    matched = [owner] if joiner_recruitment is None else [owner, joiner_recruitment]
 
-    # Create room
-    locked_recruitment.status = RecruitmentStatus.matched
-    room = Room(
-        recruitment_id=locked_recruitment.id,
-        status=RoomStatus.active,
-        expires_at=now + timedelta(hours=app_settings.room_expiry_hours),
+    # Create room and members; ids are generated here so nothing is read back
+    room = await db.scalar(
+        insert(Room)
+        .values(
+            id=new_uuid(),
+            recruitment_id=owner.id,
+            status=RoomStatus.active,
+            expires_at=now + timedelta(hours=app_settings.room_expiry_hours),
+        )
+        .returning(Room)
     )
-    db.add(room)
-    await db.flush()
-
-    # Add members
-    owner_member = RoomMember(
-        room_id=room.id,
-        user_id=locked_recruitment.user_id,
-        role=locked_recruitment.desired_role,
+    await db.execute(
+        insert(RoomMember),
+        [
+            {"room_id": room.id, "user_id": owner.user_id, "role": owner.desired_role},
+            {
+                "room_id": room.id,
+                "user_id": joiner_id,
+                "role": joiner_recruitment.desired_role if joiner_recruitment else None,
+            },
+        ],
     )
-    joiner_member = RoomMember(room_id=room.id, user_id=joiner_id)
-    db.add_all([owner_member, joiner_member])
-    await db.commit()
-    await db.refresh(room)
-
-    # Notify both users via WebSocket
-    await manager.send_to_users(
-        [locked_recruitment.user_id, joiner_id],
-        {"type": "match_created", "data": {"room_id": str(room.id)}},
+    await db.execute(
+        update(Recruitment)
+        .where(Recruitment.id.in_([r.id for r in matched]))
+        .values(status=RecruitmentStatus.matched)
     )
-    await manager.broadcast_to_lobby(
-        {
-            "type": "recruitment_update",
-            "data": {"action": "matched", "recruitment_id": str(locked_recruitment.id)},
-        },
+    # Notify both users via WebSocket once committed
+    enqueue_to_users(
+        db,
+        [owner.user_id, joiner_id],
+        {"type": "match_created", "data": {"room_id": str(room.id)}},
     )
+    for r in matched:
+        enqueue_recruitment_removed(db, r.id, r.game, r.region, "matched")
+    await db.commit()
+
+    for r in matched:
+        lobby_snapshot.remove(r.id)
+    outbox_publisher.notify()
 
     return room
@@ -0,0 +1,200 @@
+"""Transactional outbox for notifications caused by database changes.
+
+Handlers write their WebSocket events to ``outbox_events`` with the ``enqueue_*``
+helpers in the same transaction as the change, then call
+``outbox_publisher.notify()`` after committing and return. The events are sent
+by ``OutboxPublisher`` in the background, so a slow fan-out no longer holds up
+the request and an event is never lost between the commit and the send.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections.abc import Iterable
+from datetime import timezone
+from typing import Any
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.base import utcnow
+from app.models.outbox import OutboxEvent
+from app.schemas.recruitment import RecruitmentResponse
+from app.services.lobby import (
+    publish_blocks_changed,
+    publish_recruitment_created,
+    publish_recruitment_removed,
+)
+from app.websocket import manager
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_to_users(
+    db: AsyncSession, user_ids: Iterable[uuid.UUID], event: dict[str, Any]
+) -> None:
+    db.add(OutboxEvent(kind="users", payload={"users": [str(u) for u in user_ids], "event": event}))
+
+
+def enqueue_recruitment_created(db: AsyncSession, response: RecruitmentResponse) -> None:
+    db.add(
+        OutboxEvent(
+            kind="recruitment_created",
+            payload={"recruitment": response.model_dump(mode="json")},
+        )
+    )
+
+
+def enqueue_recruitment_removed(
+    db: AsyncSession, recruitment_id: uuid.UUID, game: str, region: str, action: str
+) -> None:
+    db.add(
+        OutboxEvent(
+            kind="recruitment_removed",
+            payload={
+                "recruitment_id": str(recruitment_id),
+                "game": game,
+                "region": region,
+                "action": action,
+            },
+        )
+    )
+
+
+def enqueue_blocks_changed(db: AsyncSession, blocker_id: uuid.UUID, blocked_id: uuid.UUID) -> None:
+    db.add(
+        OutboxEvent(
+            kind="blocks_changed",
+            payload={"blocker_id": str(blocker_id), "blocked_id": str(blocked_id)},
+        )
+    )
+
+
+async def _dispatch(db: AsyncSession, kind: str, payload: dict[str, Any]) -> None:
+    if kind == "users":
+        await manager.send_to_users([uuid.UUID(u) for u in payload["users"]], payload["event"])
+    elif kind == "recruitment_created":
+        response = RecruitmentResponse.model_validate(payload["recruitment"])
+        await publish_recruitment_created(db, response)
+    elif kind == "recruitment_removed":
+        await publish_recruitment_removed(
+            uuid.UUID(payload["recruitment_id"]),
+            payload["game"],
+            payload["region"],
+            payload["action"],
+        )
+    elif kind == "blocks_changed":
+        await publish_blocks_changed(
+            uuid.UUID(payload["blocker_id"]), uuid.UUID(payload["blocked_id"])
+        )
+    else:
+        raise ValueError(f"Unknown outbox event kind: {kind}")
+
+
+class OutboxPublisher:
+    """Publishes ``outbox_events`` in write order and deletes them.
+
+    Each batch claims up to ``batch_size`` of the oldest events with ``FOR
+    UPDATE SKIP LOCKED``, publishes them and deletes them in one transaction,
+    so every worker can run a publisher without sending an event twice. The
+    loop wakes on ``notify`` and otherwise every ``interval_seconds``, which
+    picks up events committed by a worker that stopped before publishing them.
+    Delivery is at least once: events of a batch interrupted before its commit
+    are published again. An event that fails to publish is logged and dropped
+    rather than blocking the ones behind it.
+    """
+
+    def __init__(
+        self, interval_seconds: float | None = None, batch_size: int | None = None
+    ) -> None:
+        if interval_seconds is None:
+            interval_seconds = settings.outbox_poll_interval_seconds
+        self._interval = interval_seconds
+        self._batch_size = batch_size if batch_size is not None else settings.outbox_batch_size
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+        self.published = 0
+        self.failures = 0
+        self.batches = 0
+        self.last_batch_ms = 0.0
+        self.last_lag_ms = 0.0
+
+    def notify(self) -> None:
+        """Wake the publisher; call after committing a transaction that enqueued events."""
+        self._wake.set()
+
+    async def publish_batch(self) -> int:
+        """Publish one batch; returns the number of events taken from the table."""
+        started = time.perf_counter()
+        async with async_session() as db:
+            events = list(
+                await db.scalars(
+                    select(OutboxEvent)
+                    .order_by(OutboxEvent.id)
+                    .limit(self._batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+            )
+            if not events:
+                return 0
+            for event in events:
+                try:
+                    await _dispatch(db, event.kind, event.payload)
+                except Exception:
+                    self.failures += 1
+                    logger.exception("Failed to publish outbox event %d (%s)", event.id, event.kind)
+            await db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_([e.id for e in events])))
+            await db.commit()
+
+        oldest = events[0].created_at
+        if oldest.tzinfo is None:
+            oldest = oldest.replace(tzinfo=timezone.utc)
+        self.last_lag_ms = (utcnow() - oldest).total_seconds() * 1000
+        self.last_batch_ms = (time.perf_counter() - started) * 1000
+        self.published += len(events)
+        self.batches += 1
+        return len(events)
+
+    async def flush(self) -> int:
+        """Publish batches until the table is empty; returns the events published."""
+        total = 0
+        while count := await self.publish_batch():
+            total += count
+        return total
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self._interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Outbox publishing failed")
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "outbox_published": self.published,
+            "outbox_failures": self.failures,
+            "outbox_batches": self.batches,
+            "outbox_last_batch_ms": round(self.last_batch_ms, 3),
+            "outbox_last_lag_ms": round(self.last_lag_ms, 3),
+        }
+
+
+outbox_publisher = OutboxPublisher()
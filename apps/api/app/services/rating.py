@@ -0,0 +1,172 @@
+"""Per-user, per-game skill ratings (Elo) driven by room feedback.
+
+A thumbs up counts as a win for the rated user against the user who gave it,
+a thumbs down as a loss; only the rated user's rating moves. Users start at
+``DEFAULT_RATING`` in every game. ``rebuild_ratings`` replays all feedback in
+order, for the initial backfill or after changing the formula:
+
+    uv run python -m app.services.rating
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections.abc import Iterable
+
+from sqlalchemy import Insert, delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.feedback import Feedback, Rating
+from app.models.rating import DEFAULT_RATING, UserRating
+from app.models.recruitment import Recruitment
+from app.models.room import Room
+
+logger = logging.getLogger(__name__)
+
+K_FACTOR = 32
+
+
+def expected_score(rating: int, opponent: int) -> float:
+    return 1 / (1 + 10 ** ((opponent - rating) / 400))
+
+
+def updated_rating(rating: int, opponent: int, score: float) -> int:
+    return round(rating + K_FACTOR * (score - expected_score(rating, opponent)))
+
+
+class RatingBook:
+    """Cache of ratings read from ``user_ratings``, keyed by (user, game).
+
+    Missing users are cached at ``DEFAULT_RATING``. Ratings changed on this
+    worker are written through with ``set``; the whole cache is dropped every
+    ``max_age`` seconds so changes made by other workers show up eventually.
+    """
+
+    def __init__(self, max_age: float | None = None) -> None:
+        self._max_age = max_age if max_age is not None else settings.rating_cache_seconds
+        self._ratings: dict[tuple[uuid.UUID, str], int] = {}
+        self._since = time.monotonic()
+
+    async def get_many(
+        self, db: AsyncSession, game: str, user_ids: Iterable[uuid.UUID]
+    ) -> dict[uuid.UUID, int]:
+        if time.monotonic() - self._since > self._max_age:
+            self.clear()
+        user_ids = set(user_ids)
+        missing = [u for u in user_ids if (u, game) not in self._ratings]
+        if missing:
+            result = await db.execute(
+                select(UserRating.user_id, UserRating.rating).where(
+                    UserRating.game == game, UserRating.user_id.in_(missing)
+                )
+            )
+            found = dict(result.all())
+            for user_id in missing:
+                self._ratings[(user_id, game)] = found.get(user_id, DEFAULT_RATING)
+        return {u: self._ratings[(u, game)] for u in user_ids}
+
+    async def get(self, db: AsyncSession, user_id: uuid.UUID, game: str) -> int:
+        return (await self.get_many(db, game, [user_id]))[user_id]
+
+    def set(self, user_id: uuid.UUID, game: str, rating: int) -> None:
+        self._ratings[(user_id, game)] = rating
+
+    def clear(self) -> None:
+        self._ratings.clear()
+        self._since = time.monotonic()
+
+
+rating_book = RatingBook()
+
+
+def _insert_rating_if_missing(db: AsyncSession, user_id: uuid.UUID, game: str) -> Insert:
+    # SQLite (tests) and PostgreSQL both spell it ON CONFLICT DO NOTHING
+    dialect = db.bind.dialect.name if db.bind else ""
+    insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+    return (
+        insert(UserRating)
+        .values(user_id=user_id, game=game, rating=DEFAULT_RATING, rated_count=0)
+        .on_conflict_do_nothing(index_elements=["user_id", "game"])
+    )
+
+
+async def record_rating(
+    db: AsyncSession,
+    game: str,
+    from_user_id: uuid.UUID,
+    to_user_id: uuid.UUID,
+    rating: Rating,
+) -> int:
+    """Apply one feedback to ``to_user_id``'s rating in ``game``; returns the new rating.
+
+    The caller commits, then passes the result to ``rating_book.set``. A first
+    rating creates the row with ON CONFLICT DO NOTHING and locks whichever row
+    won, so two first feedbacks for the same user apply one after the other
+    instead of failing on ``uq_user_rating_game``.
+    """
+    rating_of = select(UserRating).where(UserRating.game == game).with_for_update()
+    rows = {
+        r.user_id: r
+        for r in await db.scalars(
+            rating_of.where(UserRating.user_id.in_([from_user_id, to_user_id]))
+        )
+    }
+    opponent = rows[from_user_id].rating if from_user_id in rows else DEFAULT_RATING
+    target = rows.get(to_user_id)
+    if target is None:
+        await db.execute(_insert_rating_if_missing(db, to_user_id, game))
+        target = await db.scalar(
+            rating_of.where(UserRating.user_id == to_user_id).execution_options(
+                populate_existing=True
+            )
+        )
+    score = 1.0 if rating == Rating.thumbs_up else 0.0
+    target.rating = updated_rating(target.rating, opponent, score)
+    target.rated_count += 1
+    return target.rating
+
+
+async def rebuild_ratings(db: AsyncSession) -> int:
+    """Recompute every rating by replaying ``feedbacks`` oldest first; returns rows written."""
+    result = await db.execute(
+        select(Feedback.from_user_id, Feedback.to_user_id, Feedback.rating, Recruitment.game)
+        .join(Room, Room.id == Feedback.room_id)
+        .join(Recruitment, Recruitment.id == Room.recruitment_id)
+        .order_by(Feedback.created_at, Feedback.id)
+    )
+    ratings: dict[tuple[uuid.UUID, str], int] = {}
+    counts: dict[tuple[uuid.UUID, str], int] = {}
+    for from_user_id, to_user_id, rating, game in result.all():
+        key = (to_user_id, game)
+        ratings[key] = updated_rating(
+            ratings.get(key, DEFAULT_RATING),
+            ratings.get((from_user_id, game), DEFAULT_RATING),
+            1.0 if rating == Rating.thumbs_up else 0.0,
+        )
+        counts[key] = counts.get(key, 0) + 1
+
+    await db.execute(delete(UserRating))
+    db.add_all(
+        UserRating(user_id=user_id, game=game, rating=value, rated_count=counts[(user_id, game)])
+        for (user_id, game), value in ratings.items()
+    )
+    await db.commit()
+    rating_book.clear()
+    return len(ratings)
+
+
+async def _main() -> None:
+    from app.database import async_session, engine
+
+    async with async_session() as db:
+        count = await rebuild_ratings(db)
+    await engine.dispose()
+    logger.info("Rebuilt %d ratings", count)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
@@ -0,0 +1,71 @@
+"""Per-user thumbs-up/down counters stored on ``users``.
+
+``record_feedback`` bumps them in the same transaction that inserts the
+feedback row. ``rebuild_reputation`` recomputes every counter from
+``feedbacks``; run it once after the migration and whenever the counters are
+suspected to have drifted:
+
+    uv run python -m app.services.reputation
+"""
+
+import asyncio
+import logging
+import uuid
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.feedback import Feedback, Rating
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+async def record_feedback(db: AsyncSession, to_user_id: uuid.UUID, rating: Rating) -> int:
+    """Count one more rating for ``to_user_id``; returns the new thumbs-up count.
+
+    The caller commits, so the counter only moves if the feedback row is stored.
+    """
+    column = User.thumbs_up_count if rating == Rating.thumbs_up else User.thumbs_down_count
+    result = await db.execute(
+        update(User)
+        .where(User.id == to_user_id)
+        .values({column: column + 1})
+        .returning(User.thumbs_up_count)
+    )
+    return result.scalar_one()
+
+
+def _count(rating: Rating):
+    return (
+        select(func.count())
+        .where(Feedback.to_user_id == User.id, Feedback.rating == rating)
+        .correlate(User)
+        .scalar_subquery()
+    )
+
+
+async def rebuild_reputation(db: AsyncSession) -> int:
+    """Recompute every user's counters from ``feedbacks``; returns rows updated."""
+    result = await db.execute(
+        update(User).values(
+            thumbs_up_count=_count(Rating.thumbs_up),
+            thumbs_down_count=_count(Rating.thumbs_down),
+        )
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def _main() -> None:
+    from app.database import async_session, engine
+
+    async with async_session() as db:
+        count = await rebuild_reputation(db)
+    await engine.dispose()
+    logger.info("Rebuilt reputation counters for %d users", count)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
@@ -12,6 +12,9 @@ with open(_SHARED / "regions.json") as f:
     REGIONS = json.load(f)
 VALID_REGION_IDS = {r["id"] for r in REGIONS}
 
+with open(_SHARED / "constants.json") as f:
+    CONSTANTS = json.load(f)
+
 
 def sanitize_text(text: str) -> str:
     return html.escape(text.strip())
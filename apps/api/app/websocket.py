@@ -1,68 +1,643 @@
 import asyncio
+import json
 import logging
+import math
+import time
 import uuid
+from collections import OrderedDict, deque
+from collections.abc import Awaitable, Callable, Iterable
+from datetime import datetime
 from typing import Any
 
 from fastapi import WebSocket
 
+from app.backplane import Backplane, InProcessBackplane, create_backplane
+from app.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 
+def _json_default(obj: Any) -> str:
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def encode_event(data: dict[str, Any]) -> str:
+    """Encode an event to a JSON text frame, with orjson when it is installed.
+
+    Callers that send the same event to many sockets encode it once and pass
+    the resulting string around; every queue holds a reference to that one buffer.
+    """
+    if orjson is not None:
+        return orjson.dumps(data).decode()
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=_json_default)
+
+
+Event = dict[str, Any] | str
+
+# A lobby topic: (game slug, region id)
+Topic = tuple[str, str]
+
+# Looks up the users a user blocked or was blocked by
+PeerResolver = Callable[[uuid.UUID], Awaitable[frozenset[uuid.UUID]]]
+
+MAX_TOPICS_PER_CONNECTION = 100
+
+RESYNC_FRAME = encode_event({"type": "resync", "data": {}})
+
+# Server heartbeat; clients answer with a "pong" text frame
+PING_FRAME = "ping"
+
+# Close code sent to slow consumers under the "disconnect" overflow policy
+WS_CLOSE_TRY_AGAIN_LATER = 1013
+# Close code sent to sockets that stopped answering heartbeats
+WS_CLOSE_GOING_AWAY = 1001
+
+
+def _stamp(seq: int, body: str) -> str:
+    """Prefix an encoded event object with its sequence number without re-encoding it."""
+    if body == "{}":
+        return f'{{"seq":{seq}}}'
+    return f'{{"seq":{seq},{body[1:]}'
+
+
+class _Outbox:
+    """Bounded send queue for a single socket, drained by its own writer task."""
+
+    def __init__(self, ws: WebSocket, maxsize: int) -> None:
+        self.ws = ws
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=maxsize)
+        self.resync_pending = False
+        self.writer: asyncio.Task[None] | None = None
+        # Monotonic time of the last frame received from the client
+        self.last_seen = time.monotonic()
+
+    def discard_pending(self) -> int:
+        discarded = 0
+        while True:
+            try:
+                self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return discarded
+            self.queue.task_done()
+            discarded += 1
+
+
+class _TimerWheel:
+    """Hashed timing wheel of sockets keyed by the tick of their next heartbeat check.
+
+    Activity only updates ``_Outbox.last_seen``; a socket is re-bucketed when its
+    slot comes due, so there is no per-socket timer to cancel or reschedule.
+    """
+
+    def __init__(self, tick: float, horizon: float) -> None:
+        self.tick = tick
+        self.slots: list[set[WebSocket]] = [
+            set() for _ in range(max(2, math.ceil(horizon / tick) + 1))
+        ]
+        self.pos = 0
+
+    def schedule(self, ws: WebSocket, delay: float) -> None:
+        ticks = min(max(1, math.ceil(delay / self.tick)), len(self.slots) - 1)
+        self.slots[(self.pos + ticks) % len(self.slots)].add(ws)
+
+    def advance(self) -> set[WebSocket]:
+        """Move one tick forward and return the sockets that are due."""
+        self.pos = (self.pos + 1) % len(self.slots)
+        due, self.slots[self.pos] = self.slots[self.pos], set()
+        return due
+
+
+class _ReplayBuffer:
+    """Ring buffer of recently sent frames, kept for clients that reconnect.
+
+    ``floor`` is the highest sequence number that has rolled off; a client that
+    last saw anything older has a gap and must resync.
+    """
+
+    def __init__(self, maxlen: int) -> None:
+        self.items: deque[tuple[int, str, frozenset[uuid.UUID]]] = deque(maxlen=maxlen)
+        self.floor = 0
+
+    def append(self, seq: int, frame: str, exclude: frozenset[uuid.UUID]) -> None:
+        if len(self.items) == self.items.maxlen:
+            self.floor = self.items[0][0]
+        self.items.append((seq, frame, exclude))
+
+    def after(self, seq: int) -> list[tuple[int, str, frozenset[uuid.UUID]]]:
+        newer = []
+        for item in reversed(self.items):
+            if item[0] <= seq:
+                break
+            newer.append(item)
+        newer.reverse()
+        return newer
+
+
 class ConnectionManager:
-    """Manages WebSocket connections per user, with lobby broadcast support."""
+    """Manages WebSocket connections per user, with lobby broadcast support.
+
+    Every event is encoded to a JSON text frame once per call, and the same
+    frame is queued for every recipient. Every socket gets a bounded outbound
+    queue drained by a dedicated writer task, so emitting an event never waits
+    on the network. When a queue overflows the socket is either downgraded to a
+    single ``resync`` event (pending events are dropped and the client is
+    expected to refetch) or disconnected, depending on ``overflow_policy``.
+
+    Events are delivered to local sockets immediately and published once on the
+    backplane, which hands them to the managers of the other worker processes.
+
+    Lobby sockets receive every lobby event until they subscribe to a set of
+    (game, region) topics; from then on a topic broadcast only reaches the
+    sockets indexed under that topic.
+
+    Each event gets a sequence number that increases monotonically within this
+    process (identified by ``epoch``) and is kept in a bounded replay buffer per
+    lobby topic and per user. A client reconnecting with the last ``seq`` it saw
+    gets just the events it missed, or a ``resync`` when a buffer has rolled over.
 
-    def __init__(self) -> None:
+    Liveness is tracked by one heartbeat task for all sockets: a socket silent
+    for ``ping_interval`` is sent a ``ping``, and one silent for ``idle_timeout``
+    is closed along with the rest of that tick's idle sockets.
+    """
+
+    def __init__(
+        self,
+        send_timeout: float | None = None,
+        queue_size: int | None = None,
+        overflow_policy: str | None = None,
+        backplane: Backplane | None = None,
+        replay_size: int | None = None,
+        replay_max_users: int | None = None,
+        ping_interval: float | None = None,
+        idle_timeout: float | None = None,
+        heartbeat_tick: float | None = None,
+    ) -> None:
         self._connections: dict[uuid.UUID, set[WebSocket]] = {}
+        self._owners: dict[WebSocket, uuid.UUID] = {}
+        self._outboxes: dict[WebSocket, _Outbox] = {}
         self._lobby: set[WebSocket] = set()
+        # Lobby sockets without a topic subscription receive every lobby event
+        self._firehose: set[WebSocket] = set()
+        self._topics: dict[Topic, set[WebSocket]] = {}
+        self._subscriptions: dict[WebSocket, set[Topic]] = {}
         self._lock = asyncio.Lock()
+        self._send_timeout = (
+            send_timeout if send_timeout is not None else settings.ws_send_timeout_seconds
+        )
+        self._queue_size = queue_size if queue_size is not None else settings.ws_send_queue_size
+        self._overflow_policy = overflow_policy or settings.ws_overflow_policy
+        self._backplane = backplane or InProcessBackplane()
+
+        self.epoch = uuid.uuid4().hex
+        self._seq = 0
+        self._replay_size = (
+            replay_size if replay_size is not None else settings.ws_replay_buffer_size
+        )
+        self._replay_max_users = (
+            replay_max_users if replay_max_users is not None else settings.ws_replay_max_users
+        )
+        # Lobby buffers keyed by topic; None holds events broadcast without a topic
+        self._lobby_replay: dict[Topic | None, _ReplayBuffer] = {}
+        self._user_replay: OrderedDict[uuid.UUID, _ReplayBuffer] = OrderedDict()
+        # Highest seq that may have been lost along with an evicted user buffer
+        self._user_replay_floor = 0
+
+        self._ping_interval = (
+            ping_interval if ping_interval is not None else settings.ws_ping_interval_seconds
+        )
+        self._idle_timeout = (
+            idle_timeout if idle_timeout is not None else settings.ws_idle_timeout_seconds
+        )
+        self._wheel = _TimerWheel(
+            heartbeat_tick if heartbeat_tick is not None else settings.ws_heartbeat_tick_seconds,
+            max(self._ping_interval, self._idle_timeout),
+        )
+        self._heartbeat: asyncio.Task[None] | None = None
+        # Closes of evicted sockets; the loop itself only keeps weak references
+        self._closing: set[asyncio.Task[None]] = set()
+        self._remote_listeners: list[Callable[[str, list[uuid.UUID] | None], None]] = []
+        self._peer_resolver: PeerResolver | None = None
+
+        self.dropped_events = 0
+        self.resyncs = 0
+        self.evictions = 0
+        self.pings_sent = 0
+        self.idle_closes = 0
+
+    async def connect(
+        self,
+        user_id: uuid.UUID,
+        ws: WebSocket,
+        topics: Iterable[Topic] = (),
+        since: int | None = None,
+        epoch: str | None = None,
+        hello: bool = False,
+    ) -> None:
+        """Register ``ws`` for ``user_id``.
 
-    async def connect(self, user_id: uuid.UUID, ws: WebSocket) -> None:
+        With ``hello`` the socket first receives the current epoch and seq. With
+        ``since`` (and the ``epoch`` it came from) the events missed since then
+        are queued ahead of anything new, or a ``resync`` if they are gone.
+        """
+        box = _Outbox(ws, self._queue_size)
+        box.writer = asyncio.create_task(self._write_loop(box))
         async with self._lock:
             if user_id not in self._connections:
                 self._connections[user_id] = set()
             self._connections[user_id].add(ws)
+            self._owners[ws] = user_id
+            self._outboxes[ws] = box
             self._lobby.add(ws)
+            self._index_topics(ws, topics)
+            self._wheel.schedule(ws, self._ping_interval)
+            if hello:
+                hello_event = {"type": "hello", "data": {"epoch": self.epoch, "seq": self._seq}}
+                self._enqueue(box, encode_event(hello_event))
+            if since is not None:
+                self._replay(box, user_id, since, epoch)
+
+    def _replay(self, box: _Outbox, user_id: uuid.UUID, since: int, epoch: str | None) -> None:
+        """Queue the frames ``user_id`` missed after ``since``. Caller must hold the lock."""
+        if epoch != self.epoch or since > self._seq:
+            self._enqueue(box, RESYNC_FRAME)
+            return
+
+        topics = self._subscriptions.get(box.ws)
+        if topics is None:
+            lobby_buffers = list(self._lobby_replay.values())
+        else:
+            lobby_buffers = [
+                self._lobby_replay[t] for t in (None, *topics) if t in self._lobby_replay
+            ]
+        user_buffer = self._user_replay.get(user_id)
+        user_floor = user_buffer.floor if user_buffer else self._user_replay_floor
+
+        if since < user_floor or any(since < buf.floor for buf in lobby_buffers):
+            self._enqueue(box, RESYNC_FRAME)
+            return
+
+        missed = [item for buf in lobby_buffers for item in buf.after(since)]
+        if user_buffer:
+            missed.extend(user_buffer.after(since))
+        missed.sort(key=lambda item: item[0])
+        for _, frame, exclude in missed:
+            if user_id not in exclude:
+                self._enqueue(box, frame)
 
     async def disconnect(self, user_id: uuid.UUID, ws: WebSocket) -> None:
         async with self._lock:
+            self._remove(user_id, ws)
+
+    def _remove(self, user_id: uuid.UUID | None, ws: WebSocket) -> None:
+        """Drop ``ws`` from every registry and stop its writer. Caller must hold the lock."""
+        if user_id is not None:
             conns = self._connections.get(user_id)
             if conns:
                 conns.discard(ws)
                 if not conns:
                     del self._connections[user_id]
-            self._lobby.discard(ws)
+        self._owners.pop(ws, None)
+        self._lobby.discard(ws)
+        self._firehose.discard(ws)
+        self._unindex_topics(ws)
+        box = self._outboxes.pop(ws, None)
+        if box is not None:
+            box.discard_pending()
+            if box.writer is not None and box.writer is not asyncio.current_task():
+                box.writer.cancel()
+
+    async def _send(self, ws: WebSocket, frame: str) -> bool:
+        try:
+            async with asyncio.timeout(self._send_timeout):
+                await ws.send_text(frame)
+            return True
+        except Exception:
+            return False
+
+    async def _write_loop(self, box: _Outbox) -> None:
+        while True:
+            frame = await box.queue.get()
+            try:
+                if frame is RESYNC_FRAME:
+                    box.resync_pending = False
+                if not await self._send(box.ws, frame):
+                    logger.info("Dropping stale WebSocket connection")
+                    async with self._lock:
+                        self._remove(self._owners.get(box.ws), box.ws)
+                    return
+            finally:
+                box.queue.task_done()
+
+    def _enqueue(self, box: _Outbox, frame: str) -> None:
+        if box.resync_pending:
+            # The client will refetch on resync; anything queued until then is redundant
+            self.dropped_events += 1
+            return
+        try:
+            box.queue.put_nowait(frame)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self._overflow_policy == "disconnect":
+            self.dropped_events += box.discard_pending() + 1
+            self.evictions += 1
+            self._remove(self._owners.get(box.ws), box.ws)
+            task = asyncio.create_task(
+                self._close(box.ws, WS_CLOSE_TRY_AGAIN_LATER, "Slow consumer")
+            )
+            self._closing.add(task)
+            task.add_done_callback(self._closed)
+            return
+
+        self.dropped_events += box.discard_pending() + 1
+        self.resyncs += 1
+        box.resync_pending = True
+        box.queue.put_nowait(RESYNC_FRAME)
+
+    async def _close(self, ws: WebSocket, code: int, reason: str) -> None:
+        try:
+            async with asyncio.timeout(self._send_timeout):
+                await ws.close(code=code, reason=reason)
+        except Exception:
+            pass
 
-    async def send_to_user(self, user_id: uuid.UUID, data: dict[str, Any]) -> None:
+    def _closed(self, task: asyncio.Task[None]) -> None:
+        self._closing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Closing an evicted socket failed", exc_info=task.exception())
+
+    def touch(self, ws: WebSocket) -> None:
+        """Record that the client sent something; called for every received frame."""
+        box = self._outboxes.get(ws)
+        if box is not None:
+            box.last_seen = time.monotonic()
+
+    async def _heartbeat_tick(self, now: float) -> None:
+        """Ping quiet sockets and close idle ones among those due this tick."""
+        idle: list[WebSocket] = []
         async with self._lock:
-            conns = self._connections.get(user_id)
-            if not conns:
+            for ws in self._wheel.advance():
+                box = self._outboxes.get(ws)
+                if box is None:
+                    continue
+                silent = now - box.last_seen
+                if silent >= self._idle_timeout:
+                    idle.append(ws)
+                    self._remove(self._owners.get(ws), ws)
+                elif silent >= self._ping_interval:
+                    self._enqueue(box, PING_FRAME)
+                    self.pings_sent += 1
+                    self._wheel.schedule(ws, self._idle_timeout - silent)
+                else:
+                    self._wheel.schedule(ws, self._ping_interval - silent)
+        if idle:
+            self.idle_closes += len(idle)
+            logger.info("Closing %d idle WebSocket connections", len(idle))
+            await asyncio.gather(
+                *(self._close(ws, WS_CLOSE_GOING_AWAY, "Idle timeout") for ws in idle)
+            )
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._wheel.tick)
+            try:
+                await self._heartbeat_tick(time.monotonic())
+            except Exception:
+                logger.exception("WebSocket heartbeat failed")
+
+    def _fan_out(self, targets: Iterable[WebSocket], frame: str) -> None:
+        """Queue ``frame`` for each target. Caller must hold the lock."""
+        for ws in targets:
+            box = self._outboxes.get(ws)
+            if box is not None:
+                self._enqueue(box, frame)
+
+    async def send_to_user(self, user_id: uuid.UUID, event: Event) -> None:
+        await self.send_to_users([user_id], event)
+
+    async def send_to_users(self, user_ids: list[uuid.UUID], event: Event) -> None:
+        body = event if isinstance(event, str) else encode_event(event)
+        await self._deliver_to_users(user_ids, body)
+        await self._backplane.publish(
+            encode_event(
+                {"origin": self.epoch, "users": [str(uid) for uid in user_ids], "body": body}
+            )
+        )
+
+    async def broadcast_to_lobby(
+        self,
+        event: Event,
+        topic: Topic | None = None,
+        exclude_users: Iterable[uuid.UUID] = (),
+        exclude_peers_of: uuid.UUID | None = None,
+    ) -> None:
+        """Send ``event`` to lobby sockets.
+
+        With a ``topic`` only unsubscribed sockets and those subscribed to that
+        topic receive it; without one every lobby socket does. Sockets of
+        ``exclude_users`` are skipped. When those are the block peers of
+        ``exclude_peers_of``, other workers are sent just that user id and look
+        the peers up with their own resolver (``set_peer_resolver``): the list
+        itself can outgrow a NOTIFY payload.
+        """
+        body = event if isinstance(event, str) else encode_event(event)
+        excluded = frozenset(exclude_users)
+        await self._deliver_to_lobby(body, topic, excluded)
+        await self._backplane.publish(
+            encode_event(
+                {
+                    "origin": self.epoch,
+                    "users": None,
+                    "topic": list(topic) if topic else None,
+                    "exclude": [] if exclude_peers_of else [str(uid) for uid in excluded],
+                    "exclude_peers_of": str(exclude_peers_of) if exclude_peers_of else None,
+                    "body": body,
+                }
+            )
+        )
+
+    async def subscribe(self, ws: WebSocket, topics: Iterable[Topic]) -> set[Topic]:
+        """Replace the lobby topics of ``ws``. An empty set means "everything"."""
+        async with self._lock:
+            if ws not in self._lobby:
+                return set()
+            self._unindex_topics(ws)
+            return self._index_topics(ws, topics)
+
+    def _index_topics(self, ws: WebSocket, topics: Iterable[Topic]) -> set[Topic]:
+        """Caller must hold the lock."""
+        wanted = set(list(topics)[:MAX_TOPICS_PER_CONNECTION])
+        if not wanted:
+            self._firehose.add(ws)
+            return wanted
+        self._firehose.discard(ws)
+        self._subscriptions[ws] = wanted
+        for topic in wanted:
+            self._topics.setdefault(topic, set()).add(ws)
+        return wanted
+
+    def _unindex_topics(self, ws: WebSocket) -> None:
+        """Caller must hold the lock."""
+        for topic in self._subscriptions.pop(ws, ()):
+            subscribers = self._topics.get(topic)
+            if subscribers:
+                subscribers.discard(ws)
+                if not subscribers:
+                    del self._topics[topic]
+
+    async def send_to_socket(self, ws: WebSocket, event: Event) -> None:
+        """Queue an event for a single local socket (replies to client requests)."""
+        frame = event if isinstance(event, str) else encode_event(event)
+        async with self._lock:
+            self._fan_out([ws], frame)
+
+    def _next_seq(self) -> int:
+        self._seq += 1
+        return self._seq
+
+    def _user_buffer(self, user_id: uuid.UUID) -> _ReplayBuffer:
+        """Caller must hold the lock."""
+        buf = self._user_replay.get(user_id)
+        if buf is None:
+            buf = self._user_replay[user_id] = _ReplayBuffer(self._replay_size)
+            if len(self._user_replay) > self._replay_max_users:
+                _, evicted = self._user_replay.popitem(last=False)
+                last_seq = evicted.items[-1][0] if evicted.items else evicted.floor
+                self._user_replay_floor = max(self._user_replay_floor, last_seq)
+        else:
+            self._user_replay.move_to_end(user_id)
+        return buf
+
+    async def _deliver_to_users(self, user_ids: Iterable[uuid.UUID], body: str) -> None:
+        async with self._lock:
+            frame = _stamp(self._next_seq(), body)
+            user_ids = set(user_ids)
+            for uid in user_ids:
+                self._user_buffer(uid).append(self._seq, frame, frozenset())
+            targets = {ws for uid in user_ids for ws in self._connections.get(uid, ())}
+            self._fan_out(targets, frame)
+
+    async def _deliver_to_lobby(
+        self,
+        body: str,
+        topic: Topic | None = None,
+        exclude_users: frozenset[uuid.UUID] = frozenset(),
+    ) -> None:
+        async with self._lock:
+            frame = _stamp(self._next_seq(), body)
+            buf = self._lobby_replay.get(topic)
+            if buf is None:
+                buf = self._lobby_replay[topic] = _ReplayBuffer(self._replay_size)
+            buf.append(self._seq, frame, exclude_users)
+
+            if topic is None:
+                targets = list(self._lobby)
+            else:
+                targets = list(self._firehose)
+                targets.extend(self._topics.get(topic, ()))
+            if exclude_users:
+                excluded = {ws for uid in exclude_users for ws in self._connections.get(uid, ())}
+                targets = [ws for ws in targets if ws not in excluded]
+            self._fan_out(targets, frame)
+
+    async def _on_backplane_message(self, message: str) -> None:
+        try:
+            envelope = json.loads(message)
+            if envelope.get("origin") == self.epoch:
+                # Our own event, echoed back; already delivered locally
                 return
-            stale: list[WebSocket] = []
-            for ws in conns:
-                try:
-                    await ws.send_json(data)
-                except Exception:
-                    stale.append(ws)
-            for ws in stale:
-                conns.discard(ws)
-                self._lobby.discard(ws)
-            if not conns:
-                del self._connections[user_id]
+            body = envelope["body"]
+            users = envelope["users"]
+            topic = tuple(envelope["topic"]) if envelope.get("topic") else None
+            exclude = frozenset(uuid.UUID(uid) for uid in envelope.get("exclude") or ())
+            peers_of = envelope.get("exclude_peers_of")
+            peers_of = uuid.UUID(peers_of) if peers_of else None
+            user_ids = [uuid.UUID(uid) for uid in users] if users is not None else None
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed backplane message")
+            return
+        if user_ids is not None:
+            await self._deliver_to_users(user_ids, body)
+        elif peers_of is None:
+            await self._deliver_to_lobby(body, topic, exclude)
+        elif (peers := await self._resolve_peers(peers_of)) is not None:
+            await self._deliver_to_lobby(body, topic, exclude | peers)
+        for listener in self._remote_listeners:
+            try:
+                listener(body, user_ids)
+            except Exception:
+                logger.exception("Remote event listener failed")
+
+    async def _resolve_peers(self, user_id: uuid.UUID) -> frozenset[uuid.UUID] | None:
+        # None withholds the event from sockets: better missed than shown to a blocked user
+        if self._peer_resolver is None:
+            logger.warning("No peer resolver; dropping lobby event excluding peers of %s", user_id)
+            return None
+        try:
+            return await self._peer_resolver(user_id)
+        except Exception:
+            logger.exception("Looking up peers of %s failed; dropping lobby event", user_id)
+            return None
 
-    async def send_to_users(self, user_ids: list[uuid.UUID], data: dict[str, Any]) -> None:
-        for uid in user_ids:
-            await self.send_to_user(uid, data)
+    def set_peer_resolver(self, resolver: PeerResolver) -> None:
+        """Use ``resolver`` for ``exclude_peers_of`` on events from other workers."""
+        self._peer_resolver = resolver
 
-    async def broadcast_to_lobby(self, data: dict[str, Any]) -> None:
+    def add_remote_listener(self, listener: Callable[[str, list[uuid.UUID] | None], None]) -> None:
+        """Call ``listener`` for every event published by another worker.
+
+        It gets the encoded body and the target users, or None for lobby events.
+        """
+        self._remote_listeners.append(listener)
+
+    async def start(self) -> None:
+        await self._backplane.start(self._on_backplane_message)
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def drain(self) -> None:
+        """Wait until every queued event has been written (or its socket dropped)."""
+        boxes = list(self._outboxes.values())
+        await asyncio.gather(*(box.queue.join() for box in boxes))
+
+    async def shutdown(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+            self._heartbeat = None
+        await self._backplane.stop()
         async with self._lock:
-            stale: list[WebSocket] = []
-            for ws in self._lobby:
-                try:
-                    await ws.send_json(data)
-                except Exception:
-                    stale.append(ws)
-            for ws in stale:
-                self._lobby.discard(ws)
+            writers = [box.writer for box in self._outboxes.values() if box.writer]
+            for ws in list(self._outboxes):
+                self._remove(self._owners.get(ws), ws)
+        await asyncio.gather(*writers, *self._closing, return_exceptions=True)
+
+    def stats(self) -> dict[str, int]:
+        depths = [box.queue.qsize() for box in self._outboxes.values()]
+        return {
+            "users": len(self._connections),
+            "connections": len(self._outboxes),
+            "lobby_connections": len(self._lobby),
+            "topics": len(self._topics),
+            "seq": self._seq,
+            "replay_users": len(self._user_replay),
+            "queued_events": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "dropped_events": self.dropped_events,
+            "resyncs": self.resyncs,
+            "evictions": self.evictions,
+            "pings_sent": self.pings_sent,
+            "idle_closes": self.idle_closes,
+        }
 
 
-manager = ConnectionManager()
+manager = ConnectionManager(backplane=create_backplane())
@@ -0,0 +1,94 @@
+"""Lobby broadcast latency with a share of slow clients.
+
+Usage:
+    uv run python -m benchmarks.bench_broadcast [--connections 5000] [--slow 50]
+
+Each fake socket completes ``send_text`` immediately except the ``--slow`` ones,
+which sleep for ``--slow-delay`` seconds (longer than the send timeout, so they
+get evicted). Every connection count runs twice, first with no slow clients as
+the baseline, then with ``--slow`` of them. Reported per run:
+
+* emit: time spent inside ``broadcast_to_lobby`` (what the HTTP handler pays)
+* deliver: time until every fast client has received the event
+
+Both grow linearly with the connection count, since every socket gets its own
+enqueue and send on the one event loop. What the send queues guarantee is
+that, at the same connection count, slow clients leave both close to the
+baseline row.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from app.websocket import ConnectionManager
+
+
+class FastWS:
+    def __init__(self) -> None:
+        self.received_at = 0.0
+
+    async def send_text(self, data) -> None:
+        self.received_at = time.perf_counter()
+
+
+class SlowWS:
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+
+    async def send_text(self, data) -> None:
+        await asyncio.sleep(self.delay)
+
+
+async def run(connections: int, slow: int, slow_delay: float, timeout: float, rounds: int) -> None:
+    for n in sorted({connections // 4, connections // 2, connections}):
+        for slow_count in sorted({0, slow}):
+            await measure(n, slow_count, slow_delay, timeout, rounds)
+
+
+async def measure(n: int, slow: int, slow_delay: float, timeout: float, rounds: int) -> None:
+    mgr = ConnectionManager(send_timeout=timeout)
+    fast: list[FastWS] = []
+    for i in range(n):
+        if i < slow:
+            await mgr.connect(uuid.uuid4(), SlowWS(slow_delay))
+        else:
+            ws = FastWS()
+            fast.append(ws)
+            await mgr.connect(uuid.uuid4(), ws)
+
+    emit: list[float] = []
+    deliver: list[float] = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await mgr.broadcast_to_lobby({"type": "recruitment_update", "data": {}})
+        emit.append((time.perf_counter() - start) * 1000)
+        while any(ws.received_at < start for ws in fast):
+            await asyncio.sleep(0.001)
+        deliver.append((max(ws.received_at for ws in fast) - start) * 1000)
+
+    stats = mgr.stats()
+    await mgr.shutdown()
+    print(
+        f"connections={n:>6} slow={slow:>4} "
+        f"emit p50={statistics.median(emit):7.2f}ms "
+        f"deliver p50={statistics.median(deliver):7.1f}ms max={max(deliver):7.1f}ms "
+        f"evicted={n - stats['connections']}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--slow", type=int, default=50)
+    parser.add_argument("--slow-delay", type=float, default=2.0)
+    parser.add_argument("--timeout", type=float, default=0.25)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.connections, args.slow, args.slow_delay, args.timeout, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""CPU cost of building and encoding list endpoint responses.
+
+Usage:
+    uv run python -m benchmarks.bench_list_response [--items 200]
+
+Two cases, each before and after ``json_list``:
+
+* lobby: ``--items`` recruitments. Before, every item was built with
+  ``model_validate({**row.__dict__, ...})`` and FastAPI's ``serialize_response``
+  validated the list again; now the snapshot's models are encoded directly.
+* messages: ``--items`` chat messages in a SQLite database. Before, ORM
+  ``Message`` objects were loaded and converted one by one; now Core rows are
+  validated and encoded in one pass.
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.models.base import Base
+from app.models.message import Message
+from app.models.room import Room
+from app.models.user import User
+from app.responses import json_list
+from app.schemas.recruitment import RecruitmentResponse
+from app.schemas.room import MessageResponse
+
+
+def _recruitment_rows(n: int) -> list[SimpleNamespace]:
+    now = datetime.now(timezone.utc)
+    return [
+        SimpleNamespace(
+            _sa_instance_state=object(),
+            id=uuid.uuid4(),
+            user_id=uuid.uuid4(),
+            game="valorant",
+            region="jp",
+            start_time=now,
+            desired_role="duelist",
+            memo="気軽にどうぞ",
+            play_style="casual",
+            has_microphone=True,
+            status="open",
+            expires_at=now,
+            created_at=now,
+        )
+        for _ in range(n)
+    ]
+
+
+async def _measure(fn, rounds: int) -> float:
+    start = time.process_time()
+    for _ in range(rounds):
+        await fn()
+    return (time.process_time() - start) / rounds * 1000
+
+
+async def bench_lobby(items: int, rounds: int) -> tuple[float, float]:
+    rows = _recruitment_rows(items)
+    field = create_model_field("response", list[RecruitmentResponse])
+    models = [
+        RecruitmentResponse.model_validate({**r.__dict__, "nickname": "player"}) for r in rows
+    ]
+
+    async def before() -> None:
+        listed = [
+            RecruitmentResponse.model_validate({**r.__dict__, "nickname": "player"}) for r in rows
+        ]
+        await serialize_response(field=field, response_content=listed, dump_json=True)
+
+    async def after() -> None:
+        json_list(RecruitmentResponse, models)
+
+    return await _measure(before, rounds), await _measure(after, rounds)
+
+
+async def bench_messages(items: int, rounds: int) -> tuple[float, float]:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    field = create_model_field("response", list[MessageResponse])
+
+    async with sessions() as db:
+        user = User(nickname="player", session_token=uuid.uuid4().hex)
+        db.add(user)
+        await db.flush()
+        room = Room(recruitment_id=uuid.uuid4(), expires_at=datetime.now(timezone.utc))
+        db.add(room)
+        await db.flush()
+        db.add_all(
+            Message(room_id=room.id, user_id=user.id, content=f"message {i}") for i in range(items)
+        )
+        await db.commit()
+        room_id = room.id
+
+    async def before() -> None:
+        async with sessions() as db:
+            result = await db.execute(
+                select(Message, User.nickname)
+                .join(User, User.id == Message.user_id)
+                .where(Message.room_id == room_id)
+                .order_by(Message.created_at.asc(), Message.id.asc())
+            )
+            # As the handler's _message_response built them
+            listed = [
+                MessageResponse(
+                    id=m.id,
+                    room_id=m.room_id,
+                    user_id=m.user_id,
+                    content=m.content,
+                    created_at=m.created_at,
+                    nickname=nickname,
+                )
+                for m, nickname in result.all()
+            ]
+            await serialize_response(field=field, response_content=listed, dump_json=True)
+
+    async def after() -> None:
+        async with sessions() as db:
+            result = await db.execute(
+                select(
+                    Message.id,
+                    Message.room_id,
+                    Message.user_id,
+                    Message.content,
+                    Message.created_at,
+                    User.nickname,
+                )
+                .join(User, User.id == Message.user_id)
+                .where(Message.room_id == room_id)
+                .order_by(Message.created_at.asc(), Message.id.asc())
+            )
+            json_list(MessageResponse, result.all(), from_attributes=True)
+
+    timings = await _measure(before, rounds), await _measure(after, rounds)
+    await engine.dispose()
+    return timings
+
+
+async def run(items: int, rounds: int) -> None:
+    for name, bench in (("lobby", bench_lobby), ("messages", bench_messages)):
+        before, after = await bench(items, rounds)
+        print(
+            f"{name:<9} items={items:>5} before={before:8.3f}ms after={after:8.3f}ms "
+            f"({before / after:4.1f}x) CPU per response"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.items, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
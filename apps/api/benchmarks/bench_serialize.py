@@ -0,0 +1,89 @@
+"""CPU cost of encoding one lobby event for many recipients.
+
+Usage:
+    uv run python -m benchmarks.bench_serialize [--recipients 5000]
+
+Compares the old per-socket ``send_json`` behaviour (one ``json.dumps`` per
+recipient) against encoding once with the stdlib and once with orjson.
+"""
+
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+
+import app.websocket as ws_module
+from app.websocket import encode_event
+
+
+def _sample_event() -> dict:
+    now = datetime.now(timezone.utc).isoformat()
+    return {
+        "type": "recruitment_update",
+        "data": {
+            "action": "created",
+            "recruitment": {
+                "id": str(uuid.uuid4()),
+                "user_id": str(uuid.uuid4()),
+                "game": "valorant",
+                "region": "jp",
+                "start_time": now,
+                "desired_role": "duelist",
+                "memo": "気軽にどうぞ",
+                "play_style": "casual",
+                "has_microphone": True,
+                "status": "open",
+                "expires_at": now,
+                "created_at": now,
+                "nickname": "player",
+                "thumbs_up_count": 3,
+            },
+        },
+    }
+
+
+def _per_socket(event: dict, recipients: int) -> None:
+    # Mirrors starlette's WebSocket.send_json
+    for _ in range(recipients):
+        json.dumps(event, separators=(",", ":"), ensure_ascii=False)
+
+
+def _once(event: dict, recipients: int) -> None:
+    frame = encode_event(event)
+    for _ in range(recipients):
+        _ = frame
+
+
+def _measure(fn, event: dict, recipients: int, rounds: int) -> float:
+    start = time.process_time()
+    for _ in range(rounds):
+        fn(event, recipients)
+    return (time.process_time() - start) / rounds * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipients", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    event = _sample_event()
+    per_socket = _measure(_per_socket, event, args.recipients, args.rounds)
+    print(f"per-socket json.dumps : {per_socket:8.3f} ms CPU per broadcast")
+
+    orjson = ws_module.orjson
+    ws_module.orjson = None
+    stdlib_once = _measure(_once, event, args.recipients, args.rounds)
+    ws_module.orjson = orjson
+    print(f"encode once (json)    : {stdlib_once:8.3f} ms CPU per broadcast")
+
+    if orjson is not None:
+        orjson_once = _measure(_once, event, args.recipients, args.rounds)
+        print(f"encode once (orjson)  : {orjson_once:8.3f} ms CPU per broadcast")
+    else:
+        print("encode once (orjson)  : orjson not installed")
+
+
+if __name__ == "__main__":
+    main()
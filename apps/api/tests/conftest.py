@@ -1,17 +1,27 @@
 import asyncio
+import json
 import os
 from collections.abc import AsyncGenerator
 
 os.environ["APP_ENV"] = "test"
 os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///:memory:"
+os.environ["LOBBY_COALESCE_WINDOW_MS"] = "0"
 
 import pytest
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
+import app.services.blocks as blocks_module
+import app.services.games as games_module
+import app.services.outbox as outbox_module
 from app.database import get_db
 from app.main import app
 from app.models.base import Base
+from app.services.automatch import auto_matcher
+from app.services.blocks import block_graph
+from app.services.games import game_catalog
+from app.services.lobby import lobby_snapshot
+from app.services.rating import rating_book
 
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
 
@@ -47,6 +57,15 @@ async def _seed_games(session: AsyncSession):
     await session.commit()
 
 
+@pytest.fixture(autouse=True)
+def _service_sessions(monkeypatch):
+    # Services that open their own sessions; tests publish outbox events
+    # explicitly with outbox_publisher.flush()
+    monkeypatch.setattr(outbox_module, "async_session", TestSessionLocal)
+    monkeypatch.setattr(games_module, "async_session", TestSessionLocal)
+    monkeypatch.setattr(blocks_module, "async_session", TestSessionLocal)
+
+
 @pytest.fixture(autouse=True)
 async def setup_db():
     async with engine.begin() as conn:
@@ -54,10 +73,25 @@ async def setup_db():
     async with TestSessionLocal() as session:
         await _seed_games(session)
     yield
+    lobby_snapshot.reset()
+    block_graph.invalidate()
+    auto_matcher.reset()
+    rating_book.clear()
+    game_catalog.clear()
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
 
 
+class RecordingWS:
+    """Fake WebSocket that keeps every frame sent to it, decoded."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, data):
+        self.sent.append(json.loads(data))
+
+
 async def override_get_db() -> AsyncGenerator[AsyncSession, None]:
     async with TestSessionLocal() as session:
         yield session
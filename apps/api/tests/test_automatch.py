@@ -0,0 +1,184 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+
+import app.services.automatch as automatch_module
+from app.models.block import Block
+from app.models.rating import UserRating
+from app.models.recruitment import Recruitment, RecruitmentStatus
+from app.models.room import Room, RoomMember
+from app.models.user import User
+from app.schemas.recruitment import RecruitmentResponse
+from app.services.automatch import AutoMatcher, MatchQueue
+from app.services.lobby import lobby_snapshot
+from tests.conftest import TestSessionLocal
+
+
+@pytest.fixture(autouse=True)
+def _test_sessions(monkeypatch):
+    monkeypatch.setattr(automatch_module, "async_session", TestSessionLocal)
+
+
+async def _seed(*specs: tuple[str, str, int]) -> list[Recruitment]:
+    """One user and recruitment per (game, region, start offset in minutes), oldest first."""
+    now = datetime.now(timezone.utc)
+    recruitments = []
+    async with TestSessionLocal() as db:
+        for i, (game, region, offset) in enumerate(specs):
+            user = User(nickname=f"player{i}", session_token=uuid.uuid4().hex)
+            db.add(user)
+            await db.flush()
+            r = Recruitment(
+                user_id=user.id,
+                game=game,
+                region=region,
+                start_time=now + timedelta(minutes=offset),
+                desired_role=f"role{i}",
+                expires_at=now + timedelta(hours=1),
+                created_at=now + timedelta(seconds=i),
+            )
+            db.add(r)
+            recruitments.append(r)
+        await db.commit()
+        await lobby_snapshot.load(db)
+    return recruitments
+
+
+async def _members(room_ids: list[uuid.UUID]) -> set[tuple[uuid.UUID, str | None]]:
+    async with TestSessionLocal() as db:
+        result = await db.execute(
+            select(RoomMember.user_id, RoomMember.role).where(RoomMember.room_id.in_(room_ids))
+        )
+        return set(result.all())
+
+
+async def test_automatch_pairs_within_window_longest_waiting_first():
+    a, b, c, d, e = await _seed(
+        ("valorant", "jp", 0),
+        ("valorant", "jp", 40),  # outside a's window, inside c's
+        ("valorant", "jp", 10),
+        ("valorant", "jp", 30),
+        ("apex_legends", "jp", 0),  # nobody else plays apex
+    )
+    matcher = AutoMatcher(window_minutes=15, interval_seconds=0)
+
+    assert await matcher.run_once() == 2
+
+    async with TestSessionLocal() as db:
+        rooms = (await db.execute(select(Room.id, Room.recruitment_id))).all()
+        statuses = dict((await db.execute(select(Recruitment.id, Recruitment.status))).all())
+    # a waited longest and takes c; b then takes d
+    assert {rid for _, rid in rooms} == {a.id, b.id}
+    assert await _members([room_id for room_id, _ in rooms]) == {
+        (a.user_id, "role0"),
+        (c.user_id, "role2"),
+        (b.user_id, "role1"),
+        (d.user_id, "role3"),
+    }
+    assert statuses[e.id] == RecruitmentStatus.open
+    assert all(statuses[r.id] == RecruitmentStatus.matched for r in (a, b, c, d))
+    assert lobby_snapshot.get(a.id) is None and lobby_snapshot.get(c.id) is None
+
+    stats = matcher.stats()
+    assert (stats["matches"], stats["attempts"], stats["failures"]) == (2, 2, 0)
+    assert stats["matches_last_minute"] == 2
+    assert (stats["queues"], stats["queued"]) == (1, 1)
+
+    # Nothing left to pair
+    assert await matcher.run_once() == 0
+
+
+async def test_automatch_skips_blocked_pairs_and_failed_attempts():
+    a, b, c = await _seed(("valorant", "jp", 0), ("valorant", "jp", 5), ("valorant", "jp", 10))
+    async with TestSessionLocal() as db:
+        db.add(Block(blocker_id=b.user_id, blocked_id=a.user_id))
+        await db.commit()
+    matcher = AutoMatcher(window_minutes=15, interval_seconds=0)
+
+    # a can't pair with b, so it takes c
+    assert await matcher.run_once() == 1
+    async with TestSessionLocal() as db:
+        room_id = await db.scalar(select(Room.id))
+    assert await _members([room_id]) == {(a.user_id, "role0"), (c.user_id, "role2")}
+
+    # A pair that fails in the database is not retried while both stay queued
+    d, e = await _seed(("overwatch2", "jp", 0), ("overwatch2", "jp", 5))
+    async with TestSessionLocal() as db:
+        await db.execute(
+            Recruitment.__table__.update()
+            .where(Recruitment.id == e.id)
+            .values(status=RecruitmentStatus.cancelled)
+        )
+        await db.commit()
+    assert await matcher.run_once() == 0
+    assert await matcher.run_once() == 0
+    assert matcher.stats()["failures"] == 1
+
+
+def test_match_queue_nearest_walks_out_from_the_rating():
+    now = datetime.now(timezone.utc)
+    queue = MatchQueue()
+    entries = {}
+    for rating in (1200, 1450, 1500, 1580, 1900):
+        r = RecruitmentResponse(
+            id=uuid.uuid4(),
+            user_id=uuid.uuid4(),
+            game="valorant",
+            region="jp",
+            start_time=now,
+            desired_role=None,
+            memo=None,
+            play_style=None,
+            has_microphone=False,
+            status=RecruitmentStatus.open,
+            expires_at=now,
+            created_at=now,
+        )
+        queue.add(r, rating)
+        entries[r.id] = rating
+
+    assert [entries[r.id] for r in queue.nearest(1520)] == [1500, 1580, 1450, 1200, 1900]
+    moved = next(rid for rid, rating in entries.items() if rating == 1900)
+    queue.add(queue.entries[moved], 1530)
+    entries[moved] = 1530
+    assert [entries[r.id] for r in queue.nearest(1520)][:2] == [1530, 1500]
+    queue.remove(moved)
+    assert len(list(queue.nearest(0))) == 4
+
+
+async def _rate(ratings: dict[uuid.UUID, int]) -> None:
+    async with TestSessionLocal() as db:
+        db.add_all(
+            UserRating(user_id=user_id, game="valorant", rating=rating)
+            for user_id, rating in ratings.items()
+        )
+        await db.commit()
+
+
+async def test_rating_mode_pairs_nearest_rated():
+    a, b, c = await _seed(("valorant", "jp", 0), ("valorant", "jp", 5), ("valorant", "jp", 10))
+    await _rate({a.user_id: 1800, b.user_id: 1200, c.user_id: 1750})
+    matcher = AutoMatcher(window_minutes=15, interval_seconds=0, mode="rating")
+
+    # a waited longest; c is nearest to its rating although b waited longer
+    assert await matcher.run_once() == 1
+    async with TestSessionLocal() as db:
+        room_id = await db.scalar(select(Room.id))
+    assert await _members([room_id]) == {(a.user_id, "role0"), (c.user_id, "role2")}
+
+
+async def test_quick_join_rating_mode(auth_client: AsyncClient):
+    a, b, c = await _seed(("valorant", "jp", 0), ("valorant", "jp", 5), ("valorant", "jp", 10))
+    me = uuid.UUID((await auth_client.get("/api/auth/me")).json()["id"])
+    await _rate({me: 1300, a.user_id: 1800, b.user_id: 1250, c.user_id: 1500})
+
+    resp = await auth_client.post(
+        "/api/recruitments/quick-join?game=valorant&region=jp&mode=rating"
+    )
+    assert resp.status_code == 200
+    async with TestSessionLocal() as db:
+        room = await db.get(Room, uuid.UUID(resp.json()["room_id"]))
+    assert room.recruitment_id == b.id
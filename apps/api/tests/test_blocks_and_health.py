@@ -1,4 +1,13 @@
+import json
+import uuid
+from datetime import datetime, timezone
+
 from httpx import AsyncClient
+from sqlalchemy import delete
+
+from app.models.block import Block
+from app.services.blocks import BlockGraph, block_graph
+from tests.conftest import TestSessionLocal
 
 
 async def test_health(client: AsyncClient):
@@ -29,3 +38,87 @@ async def test_block_and_unblock(auth_client: AsyncClient, second_auth_client: A
     resp = await auth_client.get("/api/blocks")
     assert resp.status_code == 200
     assert len(resp.json()) == 0
+
+
+async def test_block_graph_follows_blocks_and_gates_matching(
+    auth_client: AsyncClient, second_auth_client: AsyncClient
+):
+    me1 = (await auth_client.get("/api/auth/me")).json()["id"]
+    me2 = (await second_auth_client.get("/api/auth/me")).json()["id"]
+    resp = await second_auth_client.post(
+        "/api/recruitments",
+        json={
+            "game": "apex_legends",
+            "region": "na",
+            "start_time": datetime.now(timezone.utc).isoformat(),
+        },
+    )
+    rid = resp.json()["id"]
+
+    # Blocks in both directions; removing one keeps the pair apart
+    await auth_client.post("/api/blocks", json={"blocked_id": me2})
+    await second_auth_client.post("/api/blocks", json={"blocked_id": me1})
+    await auth_client.delete(f"/api/blocks/{me2}")
+    async with TestSessionLocal() as db:
+        assert await block_graph.peers(db, uuid.UUID(me1)) == {uuid.UUID(me2)}
+    resp = await auth_client.post(f"/api/recruitments/{rid}/join")
+    assert resp.status_code == 409
+    # ...without telling the joiner why
+    assert resp.json()["detail"] == "Match could not be created"
+
+    await second_auth_client.delete(f"/api/blocks/{me1}")
+    resp = await auth_client.post(f"/api/recruitments/{rid}/join")
+    assert resp.status_code == 200
+
+
+async def test_block_graph_reloads_after_remote_change(
+    auth_client: AsyncClient, second_auth_client: AsyncClient
+):
+    me1 = uuid.UUID((await auth_client.get("/api/auth/me")).json()["id"])
+    me2 = uuid.UUID((await second_auth_client.get("/api/auth/me")).json()["id"])
+    async with TestSessionLocal() as db:
+        assert await block_graph.peers(db, me1) == frozenset()
+
+        # Written by another worker: the cached graph doesn't see it yet
+        db.add(Block(blocker_id=me2, blocked_id=me1))
+        await db.commit()
+        assert await block_graph.peers(db, me1) == frozenset()
+
+        block_graph.apply_event(json.dumps({"type": "blocks_changed", "data": {}}), [me1, me2])
+        assert await block_graph.peers(db, me1) == {me2}
+        assert await block_graph.blocked_between(db, me2, me1)
+
+
+async def test_missed_block_event_neither_matches_nor_lingers(
+    auth_client: AsyncClient, second_auth_client: AsyncClient
+):
+    me1 = uuid.UUID((await auth_client.get("/api/auth/me")).json()["id"])
+    me2 = uuid.UUID((await second_auth_client.get("/api/auth/me")).json()["id"])
+    resp = await second_auth_client.post(
+        "/api/recruitments",
+        json={
+            "game": "apex_legends",
+            "region": "na",
+            "start_time": datetime.now(timezone.utc).isoformat(),
+        },
+    )
+    rid = resp.json()["id"]
+    async with TestSessionLocal() as db:
+        assert await block_graph.peers(db, me1) == frozenset()
+        # Written by another worker whose blocks_changed event never arrives
+        db.add(Block(blocker_id=me2, blocked_id=me1))
+        await db.commit()
+
+    # The stale graph doesn't decide the match: the locking statement reads blocks
+    resp = await auth_client.post(f"/api/recruitments/{rid}/join")
+    assert resp.status_code == 409
+    resp = await auth_client.post("/api/recruitments/quick-join?game=apex_legends&region=na")
+    assert resp.status_code == 404
+
+    # ...and a graph older than its max age is reloaded
+    graph = BlockGraph(max_age=0)
+    async with TestSessionLocal() as db:
+        assert await graph.peers(db, me1) == {me2}
+        await db.execute(delete(Block))
+        await db.commit()
+        assert await graph.peers(db, me1) == frozenset()
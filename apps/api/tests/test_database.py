@@ -0,0 +1,45 @@
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+
+from app.database import PoolMetrics, get_db
+from app.main import app
+from tests.conftest import TestSessionLocal, engine
+
+
+async def test_db_session_closes_before_response_is_sent(monkeypatch):
+    events = []
+
+    async def tracking_get_db():
+        async with TestSessionLocal() as session:
+            yield session
+        events.append("session closed")
+
+    async def tracking_app(scope, receive, send):
+        async def tracking_send(message):
+            if message["type"] == "http.response.start":
+                events.append("response sent")
+            await send(message)
+
+        await app(scope, receive, tracking_send)
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, tracking_get_db)
+    transport = ASGITransport(app=tracking_app)
+    async with AsyncClient(transport=transport, base_url="http://test") as c:
+        await c.post("/api/auth/login", json={"nickname": "tracked"})
+        events.clear()
+        resp = await c.get("/api/auth/me")
+    assert resp.status_code == 200
+    # One session shared by get_current_user and the route, closed first
+    assert events == ["session closed", "response sent"]
+
+
+async def test_pool_metrics_record_checkout_durations():
+    metrics = PoolMetrics(engine)
+    async with TestSessionLocal() as db:
+        await db.execute(text("SELECT 1"))
+        assert metrics.checkouts == 1
+        assert metrics.stats()["checkout_max_ms"] == 0.0
+    stats = metrics.stats()
+    assert stats["checkouts"] == 1
+    assert stats["checkout_max_ms"] > 0
+    assert stats["checkout_p50_ms"] == stats["checkout_max_ms"]
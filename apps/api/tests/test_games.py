@@ -0,0 +1,40 @@
+from httpx import AsyncClient
+
+from app.models.game import Game
+from tests.conftest import TestSessionLocal
+
+
+async def test_list_games_returns_active_games_by_name(client: AsyncClient):
+    async with TestSessionLocal() as db:
+        db.add(Game(slug="retired", name="Aardvark Arena", category="fps", is_active=False))
+        db.add(
+            Game(
+                slug="zeta_tactics",
+                name="Zeta Tactics",
+                name_ja="ゼータ",
+                category="strategy",
+                platform_tags=["pc", "switch"],
+            )
+        )
+        await db.commit()
+
+    resp = await client.get("/api/games")
+    assert resp.status_code == 200
+    games = resp.json()
+    names = [g["name"] for g in games]
+    assert "Aardvark Arena" not in names
+    assert names == sorted(names)
+    assert names[0] == "Apex Legends"
+    assert games[-1] == {
+        "id": games[-1]["id"],
+        "slug": "zeta_tactics",
+        "name": "Zeta Tactics",
+        "name_ja": "ゼータ",
+        "category": "strategy",
+        "platform_tags": ["pc", "switch"],
+    }
+
+    resp = await client.get("/api/games?category=fps&q=legends")
+    assert [g["slug"] for g in resp.json()] == ["apex_legends"]
+    resp = await client.get("/api/games?platform=switch")
+    assert [g["slug"] for g in resp.json()] == ["zeta_tactics"]
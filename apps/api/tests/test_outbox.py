@@ -0,0 +1,80 @@
+import uuid
+from datetime import datetime, timezone
+
+from httpx import AsyncClient
+from sqlalchemy import func, select
+
+from app.models.outbox import OutboxEvent
+from app.services.outbox import OutboxPublisher, enqueue_to_users, outbox_publisher
+from app.websocket import manager
+from tests.conftest import RecordingWS, TestSessionLocal
+
+
+async def _pending() -> list[str]:
+    async with TestSessionLocal() as db:
+        return list(await db.scalars(select(OutboxEvent.kind).order_by(OutboxEvent.id)))
+
+
+async def test_match_events_are_committed_with_the_match_and_published_later(
+    auth_client: AsyncClient, second_auth_client: AsyncClient
+):
+    me1 = uuid.UUID((await auth_client.get("/api/auth/me")).json()["id"])
+    resp = await auth_client.post(
+        "/api/recruitments",
+        json={
+            "game": "valorant",
+            "region": "jp",
+            "start_time": datetime.now(timezone.utc).isoformat(),
+        },
+    )
+    rid = resp.json()["id"]
+    await outbox_publisher.flush()
+
+    watcher = RecordingWS()
+    await manager.connect(me1, watcher)
+    try:
+        resp = await second_auth_client.post(f"/api/recruitments/{rid}/join")
+        assert resp.status_code == 200
+        # The handler returned without sending; the events wait in the outbox
+        await manager.drain()
+        assert watcher.sent == []
+        assert await _pending() == ["users", "recruitment_removed"]
+        # ...while this worker's lobby list already reflects the match
+        assert (await auth_client.get("/api/recruitments")).json() == []
+
+        assert await outbox_publisher.flush() == 2
+        await manager.drain()
+    finally:
+        await manager.disconnect(me1, watcher)
+
+    assert [e["type"] for e in watcher.sent] == ["match_created", "recruitment_update"]
+    assert watcher.sent[0]["data"] == {"room_id": resp.json()["room_id"]}
+    assert watcher.sent[1]["data"] == {"action": "matched", "recruitment_id": rid}
+    assert await _pending() == []
+
+
+async def test_publisher_batches_and_skips_failing_events(auth_client: AsyncClient):
+    me = uuid.UUID((await auth_client.get("/api/auth/me")).json()["id"])
+    async with TestSessionLocal() as db:
+        for i in range(3):
+            enqueue_to_users(db, [me], {"type": "ping", "data": {"n": i}})
+        db.add(OutboxEvent(kind="unknown", payload={}))
+        enqueue_to_users(db, [me], {"type": "ping", "data": {"n": 3}})
+        await db.commit()
+
+    publisher = OutboxPublisher(interval_seconds=0, batch_size=2)
+    watcher = RecordingWS()
+    await manager.connect(me, watcher)
+    try:
+        assert await publisher.flush() == 5
+        await manager.drain()
+    finally:
+        await manager.disconnect(me, watcher)
+
+    # Published in write order; the bad event is dropped without holding up the rest
+    assert [e["data"]["n"] for e in watcher.sent] == [0, 1, 2, 3]
+    stats = publisher.stats()
+    assert (stats["outbox_published"], stats["outbox_batches"]) == (5, 3)
+    assert stats["outbox_failures"] == 1
+    async with TestSessionLocal() as db:
+        assert await db.scalar(select(func.count()).select_from(OutboxEvent)) == 0
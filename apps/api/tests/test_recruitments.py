@@ -1,6 +1,21 @@
+import json
+import uuid
 from datetime import datetime, timedelta, timezone
 
+import pytest
 from httpx import AsyncClient
+from sqlalchemy import select
+
+from app.models.block import Block
+from app.models.recruitment import Recruitment, RecruitmentStatus
+from app.models.room import Room, RoomMember
+from app.models.user import User
+from app.schemas.recruitment import RecruitmentResponse
+from app.services.lobby import lobby_snapshot
+from app.services.matching import MatchRejected, find_match_and_create_room
+from app.services.outbox import outbox_publisher
+from app.websocket import manager
+from tests.conftest import RecordingWS, TestSessionLocal
 
 
 async def test_create_recruitment(auth_client: AsyncClient):
@@ -78,6 +93,36 @@ async def test_join_recruitment(auth_client: AsyncClient, second_auth_client: As
     assert "room_id" in data
 
 
+async def test_join_while_in_active_room_names_only_that_cause(
+    auth_client: AsyncClient, second_auth_client: AsyncClient
+):
+    start = datetime.now(timezone.utc).isoformat()
+    resp = await auth_client.post(
+        "/api/recruitments", json={"game": "valorant", "region": "jp", "start_time": start}
+    )
+    resp = await second_auth_client.post(f"/api/recruitments/{resp.json()['id']}/join")
+    assert resp.status_code == 200
+
+    now = datetime.now(timezone.utc)
+    async with TestSessionLocal() as db:
+        other = User(nickname="other", session_token=uuid.uuid4().hex)
+        db.add(other)
+        await db.flush()
+        recruitment = Recruitment(
+            user_id=other.id,
+            game="valorant",
+            region="jp",
+            start_time=now,
+            expires_at=now + timedelta(hours=1),
+        )
+        db.add(recruitment)
+        await db.commit()
+
+    resp = await second_auth_client.post(f"/api/recruitments/{recruitment.id}/join")
+    assert resp.status_code == 409
+    assert resp.json()["detail"] == "You already have an active room"
+
+
 async def test_cannot_join_own_recruitment(auth_client: AsyncClient):
     resp = await auth_client.post(
         "/api/recruitments",
@@ -123,3 +168,429 @@ async def test_create_recruitment_past_start_time(auth_client: AsyncClient):
         },
     )
     assert resp.status_code == 422
+
+
+async def test_recruitment_events_carry_payload_and_tombstones(
+    auth_client: AsyncClient, second_auth_client: AsyncClient
+):
+    me2 = await second_auth_client.get("/api/auth/me")
+    watcher = RecordingWS()
+    await manager.connect(uuid.UUID(me2.json()["id"]), watcher)
+    try:
+        resp = await auth_client.post(
+            "/api/recruitments",
+            json={
+                "game": "valorant",
+                "region": "jp",
+                "start_time": datetime.now(timezone.utc).isoformat(),
+                "memo": "hi",
+            },
+        )
+        rid = resp.json()["id"]
+        await auth_client.delete(f"/api/recruitments/{rid}")
+        await outbox_publisher.flush()
+        await manager.drain()
+    finally:
+        await manager.disconnect(uuid.UUID(me2.json()["id"]), watcher)
+
+    created, cancelled = [e["data"] for e in watcher.sent]
+    assert created["action"] == "created"
+    assert created["recruitment"] == resp.json()
+    assert created["recruitment"]["nickname"] == "testuser"
+    assert created["recruitment"]["thumbs_up_count"] == 0
+    assert cancelled == {"action": "cancelled", "recruitment_id": rid}
+
+
+async def test_created_event_skips_blocked_users(
+    auth_client: AsyncClient, second_auth_client: AsyncClient
+):
+    me2 = await second_auth_client.get("/api/auth/me")
+    user2_id = uuid.UUID(me2.json()["id"])
+    me1 = await auth_client.get("/api/auth/me")
+    await second_auth_client.post("/api/blocks", json={"blocked_id": me1.json()["id"]})
+
+    watcher = RecordingWS()
+    await outbox_publisher.flush()
+    await manager.connect(user2_id, watcher)
+    try:
+        await auth_client.post(
+            "/api/recruitments",
+            json={
+                "game": "valorant",
+                "region": "jp",
+                "start_time": datetime.now(timezone.utc).isoformat(),
+            },
+        )
+        await outbox_publisher.flush()
+        await manager.drain()
+    finally:
+        await manager.disconnect(user2_id, watcher)
+
+    assert watcher.sent == []
+
+
+async def test_list_is_served_from_snapshot(auth_client: AsyncClient):
+    resp = await auth_client.post(
+        "/api/recruitments",
+        json={
+            "game": "valorant",
+            "region": "jp",
+            "start_time": datetime.now(timezone.utc).isoformat(),
+        },
+    )
+    rid = resp.json()["id"]
+    listed = await auth_client.get("/api/recruitments")
+    assert [r["id"] for r in listed.json()] == [rid]
+
+    await auth_client.delete(f"/api/recruitments/{rid}")
+    listed = await auth_client.get("/api/recruitments")
+    assert listed.json() == []
+
+
+async def test_snapshot_reload_keeps_changes_made_during_its_query():
+    now = datetime.now(timezone.utc)
+    async with TestSessionLocal() as db:
+        user = User(nickname="owner", session_token=uuid.uuid4().hex)
+        db.add(user)
+        await db.flush()
+        stale = Recruitment(
+            user_id=user.id,
+            game="valorant",
+            region="jp",
+            start_time=now,
+            expires_at=now + timedelta(hours=1),
+        )
+        db.add(stale)
+        await db.commit()
+        await lobby_snapshot.load(db)
+    added = RecruitmentResponse.model_validate(
+        {
+            **lobby_snapshot.get(stale.id).model_dump(),
+            "id": uuid.uuid4(),
+            "created_at": now + timedelta(seconds=1),
+        }
+    )
+
+    class InterleavedSession:
+        """Reads the rows, then lets a match and a creation land before load sees them."""
+
+        def __init__(self, db):
+            self._db = db
+
+        async def execute(self, stmt):
+            result = await self._db.execute(stmt)
+            lobby_snapshot.remove(stale.id)
+            lobby_snapshot.add(added)
+            return result
+
+    async with TestSessionLocal() as db:
+        await lobby_snapshot.load(InterleavedSession(db))
+    assert lobby_snapshot.get(stale.id) is None
+    assert lobby_snapshot.get(added.id) == added
+
+    # A later reload still honours the tombstone although the row reads as open
+    async with TestSessionLocal() as db:
+        await lobby_snapshot.load(db)
+    assert lobby_snapshot.get(stale.id) is None
+
+
+async def test_snapshot_applies_events_from_other_workers(client: AsyncClient):
+    now = datetime.now(timezone.utc)
+    remote = {
+        "id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "game": "apex_legends",
+        "region": "na",
+        "start_time": now.isoformat(),
+        "desired_role": None,
+        "memo": None,
+        "play_style": None,
+        "has_microphone": False,
+        "status": "open",
+        "expires_at": (now + timedelta(hours=1)).isoformat(),
+        "created_at": now.isoformat(),
+        "nickname": "remote",
+        "thumbs_up_count": 2,
+    }
+    await client.get("/api/recruitments")
+
+    lobby_snapshot.apply_event(
+        json.dumps(
+            {
+                "type": "recruitment_update",
+                "data": {
+                    "action": "created",
+                    "recruitment_id": remote["id"],
+                    "recruitment": remote,
+                },
+            }
+        )
+    )
+    listed = await client.get("/api/recruitments")
+    assert [r["nickname"] for r in listed.json()] == ["remote"]
+
+    lobby_snapshot.apply_event(
+        json.dumps(
+            {
+                "type": "recruitment_batch",
+                "data": {"updates": [{"action": "matched", "recruitment_id": remote["id"]}]},
+            }
+        )
+    )
+    assert (await client.get("/api/recruitments")).json() == []
+
+
+def _snapshot_entry(game: str, region: str, minutes_ago: int, **fields) -> RecruitmentResponse:
+    now = datetime.now(timezone.utc)
+    return RecruitmentResponse.model_validate(
+        {
+            "id": uuid.uuid4(),
+            "user_id": uuid.uuid4(),
+            "game": game,
+            "region": region,
+            "start_time": now + timedelta(minutes=minutes_ago),
+            "desired_role": None,
+            "memo": None,
+            "play_style": None,
+            "has_microphone": False,
+            "status": "open",
+            "expires_at": now + timedelta(hours=1),
+            "created_at": now - timedelta(minutes=minutes_ago),
+            **fields,
+        }
+    )
+
+
+async def test_list_filters_and_keyset_pagination(client: AsyncClient):
+    await client.get("/api/recruitments")
+    entries = [
+        _snapshot_entry("valorant", "jp", 50 - i, has_microphone=i % 2 == 0) for i in range(5)
+    ]
+    entries.append(_snapshot_entry("apex_legends", "na", 1, play_style="casual"))
+    for entry in entries:
+        lobby_snapshot.add(entry)
+    valorant_ids = [str(e.id) for e in entries[:5]]
+
+    first = (await client.get("/api/recruitments?game=valorant&region=jp&limit=2")).json()
+    assert [r["id"] for r in first] == valorant_ids[:2]
+    rest = (
+        await client.get(f"/api/recruitments?game=valorant&limit=10&after={first[-1]['id']}")
+    ).json()
+    assert [r["id"] for r in rest] == valorant_ids[2:]
+
+    # Removed entries are skipped; an unknown cursor starts from the first page
+    lobby_snapshot.remove(entries[1].id)
+    resp = await client.get(f"/api/recruitments?after={entries[0].id}&limit=1")
+    assert [r["id"] for r in resp.json()] == [valorant_ids[2]]
+    resp = await client.get(f"/api/recruitments?after={uuid.uuid4()}&limit=1")
+    assert [r["id"] for r in resp.json()] == [valorant_ids[0]]
+
+    with_mic = (await client.get("/api/recruitments?has_microphone=true")).json()
+    assert [r["id"] for r in with_mic] == [valorant_ids[0], valorant_ids[2], valorant_ids[4]]
+    casual = (await client.get("/api/recruitments?play_style=casual")).json()
+    assert [r["game"] for r in casual] == ["apex_legends"]
+
+    window_end = (datetime.now(timezone.utc) + timedelta(minutes=47)).isoformat()
+    resp = await client.get("/api/recruitments", params={"start_to": window_end})
+    assert [r["game"] for r in resp.json()] == ["valorant", "valorant", "apex_legends"]
+
+    assert (await client.get("/api/recruitments?limit=500")).status_code == 422
+
+
+async def test_list_etag_returns_304_until_lobby_or_blocks_change(
+    auth_client: AsyncClient, second_auth_client: AsyncClient
+):
+    first = await auth_client.get("/api/recruitments")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    resp = await auth_client.get("/api/recruitments", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.content == b""
+
+    # The tag is per query string and per viewer
+    resp = await auth_client.get("/api/recruitments?limit=10", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    resp = await second_auth_client.get("/api/recruitments", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+
+    await second_auth_client.post(
+        "/api/recruitments",
+        json={
+            "game": "apex_legends",
+            "region": "na",
+            "start_time": datetime.now(timezone.utc).isoformat(),
+        },
+    )
+    resp = await auth_client.get("/api/recruitments", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert len(resp.json()) == 1
+    etag = resp.headers["etag"]
+
+    # Blocking the owner hides the recruitment, so the old tag must not match
+    me2 = await second_auth_client.get("/api/auth/me")
+    await auth_client.post("/api/blocks", json={"blocked_id": me2.json()["id"]})
+    resp = await auth_client.get("/api/recruitments", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.json() == []
+
+
+async def test_changes_feed_returns_delta_since_version(
+    auth_client: AsyncClient, second_auth_client: AsyncClient
+):
+    start = (await auth_client.get("/api/recruitments/changes")).json()
+    assert start["full"] is True
+    assert start["recruitments"] == []
+    since = f"since_version={start['version']}&epoch={start['epoch']}"
+
+    resp = await second_auth_client.post(
+        "/api/recruitments",
+        json={
+            "game": "apex_legends",
+            "region": "na",
+            "start_time": datetime.now(timezone.utc).isoformat(),
+        },
+    )
+    rid = resp.json()["id"]
+
+    delta = (await auth_client.get(f"/api/recruitments/changes?{since}")).json()
+    assert delta["full"] is False
+    assert [r["id"] for r in delta["recruitments"]] == [rid]
+    assert delta["removed"] == []
+
+    await second_auth_client.delete(f"/api/recruitments/{rid}")
+    delta = (await auth_client.get(f"/api/recruitments/changes?{since}")).json()
+    assert delta["recruitments"] == []
+    assert delta["removed"] == [rid]
+
+    # Unchanged since the latest version
+    latest = f"since_version={delta['version']}&epoch={delta['epoch']}"
+    delta = (await auth_client.get(f"/api/recruitments/changes?{latest}")).json()
+    assert (delta["full"], delta["recruitments"], delta["removed"]) == (False, [], [])
+
+    # Versions from another worker, from the future or past the changelog get everything
+    for query in ("since_version=1&epoch=other", "since_version=999999", "since_version=-5"):
+        resp = await auth_client.get(f"/api/recruitments/changes?{query}")
+        assert resp.json()["full"] is True
+
+
+async def test_changes_feed_falls_back_to_full_after_block(
+    auth_client: AsyncClient, second_auth_client: AsyncClient
+):
+    start = (await auth_client.get("/api/recruitments/changes")).json()
+    me2 = await second_auth_client.get("/api/auth/me")
+    await auth_client.post("/api/blocks", json={"blocked_id": me2.json()["id"]})
+
+    query = f"since_version={start['version']}&epoch={start['epoch']}"
+    delta = (await auth_client.get(f"/api/recruitments/changes?{query}")).json()
+    assert delta["full"] is True
+
+
+async def test_match_rejected_while_either_user_has_active_room():
+    now = datetime.now(timezone.utc)
+    async with TestSessionLocal() as db:
+        owner, joiner, other = (
+            User(nickname=name, session_token=uuid.uuid4().hex)
+            for name in ("owner", "joiner", "other")
+        )
+        db.add_all([owner, joiner, other])
+        await db.flush()
+
+        def recruitment(user: User) -> Recruitment:
+            return Recruitment(
+                user_id=user.id,
+                game="valorant",
+                region="jp",
+                start_time=now,
+                desired_role="duelist",
+                expires_at=now + timedelta(hours=1),
+            )
+
+        first, second = recruitment(owner), recruitment(other)
+        db.add_all([first, second])
+        await db.commit()
+
+        room = await find_match_and_create_room(db, first, joiner.id)
+        assert room is not None
+        members = await db.execute(
+            select(RoomMember.user_id, RoomMember.role).where(RoomMember.room_id == room.id)
+        )
+        assert set(members.all()) == {(owner.id, "duelist"), (joiner.id, None)}
+        status = await db.scalar(select(Recruitment.status).where(Recruitment.id == first.id))
+        assert status == RecruitmentStatus.matched
+
+        # Already matched
+        with pytest.raises(MatchRejected) as rejected:
+            await find_match_and_create_room(db, first, other.id)
+        assert rejected.value.reasons == ("Recruitment is no longer available",)
+        # Joiner busy, then owner busy
+        with pytest.raises(MatchRejected) as rejected:
+            await find_match_and_create_room(db, second, joiner.id)
+        assert rejected.value.reasons == ("The joiner is already in an active room",)
+        assert rejected.value.joiner_busy
+        third = recruitment(owner)
+        db.add(third)
+        await db.commit()
+        with pytest.raises(MatchRejected) as rejected:
+            await find_match_and_create_room(db, third, joiner.id)
+        # Every reason the locking statement found is reported
+        assert rejected.value.reasons == (
+            "The recruiter is already in an active room",
+            "The joiner is already in an active room",
+        )
+
+
+async def test_quick_join_takes_oldest_joinable_recruitment(
+    auth_client: AsyncClient, second_auth_client: AsyncClient
+):
+    now = datetime.now(timezone.utc)
+    me1 = uuid.UUID((await auth_client.get("/api/auth/me")).json()["id"])
+    me2 = uuid.UUID((await second_auth_client.get("/api/auth/me")).json()["id"])
+    async with TestSessionLocal() as db:
+        blocker, older, newer = (
+            User(nickname=name, session_token=uuid.uuid4().hex)
+            for name in ("blocker", "older", "newer")
+        )
+        db.add_all([blocker, older, newer])
+        await db.flush()
+        db.add(Block(blocker_id=blocker.id, blocked_id=me2))
+        recruitments = {
+            owner: Recruitment(
+                user_id=owner,
+                game="valorant",
+                region="jp",
+                start_time=now,
+                expires_at=now + timedelta(hours=1),
+                created_at=now + timedelta(seconds=i),
+            )
+            for i, owner in enumerate([blocker.id, me2, older.id, newer.id])
+        }
+        db.add_all(recruitments.values())
+        await db.commit()
+
+    # Skips the blocking user's and the joiner's own recruitment
+    resp = await second_auth_client.post("/api/recruitments/quick-join?game=valorant&region=jp")
+    assert resp.status_code == 200
+    async with TestSessionLocal() as db:
+        room = await db.get(Room, uuid.UUID(resp.json()["room_id"]))
+        assert room.recruitment_id == recruitments[older.id].id
+
+    # Already in a room, in either mode
+    for mode in ("oldest", "rating"):
+        resp = await second_auth_client.post(
+            f"/api/recruitments/quick-join?game=valorant&region=jp&mode={mode}"
+        )
+        assert resp.status_code == 409
+        assert resp.json()["detail"] == "You already have an active room"
+
+    # The next joiner gets the next recruitment in line
+    resp = await auth_client.post("/api/recruitments/quick-join?game=valorant&region=jp")
+    assert resp.status_code == 200
+    async with TestSessionLocal() as db:
+        room = await db.get(Room, uuid.UUID(resp.json()["room_id"]))
+        assert room.recruitment_id == recruitments[blocker.id].id
+        members = await db.scalars(select(RoomMember.user_id).where(RoomMember.room_id == room.id))
+        assert set(members) == {blocker.id, me1}
+
+    resp = await auth_client.post("/api/recruitments/quick-join?game=valorant&region=xx")
+    assert resp.status_code == 400
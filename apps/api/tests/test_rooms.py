@@ -1,6 +1,17 @@
+import uuid
 from datetime import datetime, timezone
 
 from httpx import AsyncClient
+from sqlalchemy import insert, select
+
+from app.models.feedback import Rating
+from app.models.rating import UserRating
+from app.models.user import User
+from app.services.outbox import outbox_publisher
+from app.services.rating import rating_book, rebuild_ratings, record_rating, updated_rating
+from app.services.reputation import rebuild_reputation
+from app.websocket import manager
+from tests.conftest import RecordingWS, TestSessionLocal
 
 
 async def _create_room(
@@ -47,11 +58,14 @@ async def test_send_message(auth_client: AsyncClient, second_auth_client: AsyncC
 
 async def test_get_messages(auth_client: AsyncClient, second_auth_client: AsyncClient):
     room_id, _, _ = await _create_room(auth_client, second_auth_client)
-    await auth_client.post(f"/api/rooms/{room_id}/messages", json={"content": "msg1"})
-    await second_auth_client.post(f"/api/rooms/{room_id}/messages", json={"content": "msg2"})
+    sent = [
+        await auth_client.post(f"/api/rooms/{room_id}/messages", json={"content": "msg1"}),
+        await second_auth_client.post(f"/api/rooms/{room_id}/messages", json={"content": "msg2"}),
+    ]
     resp = await auth_client.get(f"/api/rooms/{room_id}/messages")
     assert resp.status_code == 200
-    assert len(resp.json()) == 2
+    # The list is encoded outside FastAPI's response_model path; same shape as a single message
+    assert resp.json() == [r.json() for r in sent]
 
 
 async def test_close_room(auth_client: AsyncClient, second_auth_client: AsyncClient):
@@ -89,6 +103,100 @@ async def test_feedback(auth_client: AsyncClient, second_auth_client: AsyncClien
     assert resp.status_code == 409
 
 
+async def test_feedback_updates_reputation_counters(
+    auth_client: AsyncClient, second_auth_client: AsyncClient
+):
+    room_id, user1_id, user2_id = await _create_room(auth_client, second_auth_client)
+    await auth_client.post(f"/api/rooms/{room_id}/close")
+    await second_auth_client.post(f"/api/rooms/{room_id}/close")
+    await auth_client.post(
+        f"/api/rooms/{room_id}/feedback", json={"to_user_id": user2_id, "rating": "thumbs_up"}
+    )
+    await second_auth_client.post(
+        f"/api/rooms/{room_id}/feedback", json={"to_user_id": user1_id, "rating": "thumbs_down"}
+    )
+
+    async with TestSessionLocal() as db:
+        user1 = await db.get(User, uuid.UUID(user1_id))
+        user2 = await db.get(User, uuid.UUID(user2_id))
+        assert (user1.thumbs_up_count, user1.thumbs_down_count) == (0, 1)
+        assert (user2.thumbs_up_count, user2.thumbs_down_count) == (1, 0)
+
+        # Drift is repaired by the rebuild command
+        user2.thumbs_up_count = 7
+        await db.commit()
+        await rebuild_reputation(db)
+        await db.refresh(user2)
+        assert user2.thumbs_up_count == 1
+
+
+async def test_feedback_updates_game_ratings(
+    auth_client: AsyncClient, second_auth_client: AsyncClient
+):
+    room_id, user1_id, user2_id = await _create_room(auth_client, second_auth_client)
+    user1, user2 = uuid.UUID(user1_id), uuid.UUID(user2_id)
+    await auth_client.post(f"/api/rooms/{room_id}/close")
+    await second_auth_client.post(f"/api/rooms/{room_id}/close")
+    await auth_client.post(
+        f"/api/rooms/{room_id}/feedback", json={"to_user_id": user2_id, "rating": "thumbs_up"}
+    )
+    await second_auth_client.post(
+        f"/api/rooms/{room_id}/feedback", json={"to_user_id": user1_id, "rating": "thumbs_down"}
+    )
+
+    # Even match for user2's thumbs up; user1 then loses to a slightly higher rating
+    expected = {(user1, "valorant", 1485, 1), (user2, "valorant", 1516, 1)}
+    async with TestSessionLocal() as db:
+        rows = await db.execute(
+            select(UserRating.user_id, UserRating.game, UserRating.rating, UserRating.rated_count)
+        )
+        assert set(rows.all()) == expected
+        assert await rating_book.get_many(db, "valorant", [user1, user2]) == {
+            user1: 1485,
+            user2: 1516,
+        }
+
+        await rebuild_ratings(db)
+        rows = await db.execute(
+            select(UserRating.user_id, UserRating.game, UserRating.rating, UserRating.rated_count)
+        )
+        assert set(rows.all()) == expected
+
+
+async def test_first_rating_created_concurrently_is_updated_not_duplicated(
+    auth_client: AsyncClient, second_auth_client: AsyncClient
+):
+    _, user1_id, user2_id = await _create_room(auth_client, second_auth_client)
+    rater, rated = uuid.UUID(user1_id), uuid.UUID(user2_id)
+
+    class RacingSession:
+        """Another feedback creates the rated user's row right after the lookup."""
+
+        def __init__(self, db):
+            self._db = db
+
+        def __getattr__(self, name):
+            return getattr(self._db, name)
+
+        async def scalars(self, stmt):
+            result = await self._db.scalars(stmt)
+            await self._db.execute(
+                insert(UserRating).values(
+                    user_id=rated, game="valorant", rating=1600, rated_count=1
+                )
+            )
+            return result
+
+    async with TestSessionLocal() as db:
+        rating = await record_rating(RacingSession(db), "valorant", rater, rated, Rating.thumbs_up)
+        await db.commit()
+        assert rating == updated_rating(1600, 1500, 1.0)
+        rows = await db.execute(
+            select(UserRating.rating, UserRating.rated_count).where(UserRating.user_id == rated)
+        )
+        assert rows.all() == [(rating, 2)]
+
+
 async def test_message_ng_word(auth_client: AsyncClient, second_auth_client: AsyncClient):
     room_id, _, _ = await _create_room(auth_client, second_auth_client)
     resp = await auth_client.post(
@@ -114,3 +222,39 @@ async def test_cannot_message_closed_room(
     await second_auth_client.post(f"/api/rooms/{room_id}/close")
     resp = await auth_client.post(f"/api/rooms/{room_id}/messages", json={"content": "hi"})
     assert resp.status_code == 400
+
+
+async def test_new_message_event_carries_message(
+    auth_client: AsyncClient, second_auth_client: AsyncClient
+):
+    room_id, _, user2_id = await _create_room(auth_client, second_auth_client)
+
+    ws = RecordingWS()
+    await outbox_publisher.flush()
+    await manager.connect(uuid.UUID(user2_id), ws)
+    try:
+        resp = await auth_client.post(f"/api/rooms/{room_id}/messages", json={"content": "yo"})
+        await outbox_publisher.flush()
+        await manager.drain()
+    finally:
+        await manager.disconnect(uuid.UUID(user2_id), ws)
+
+    [event] = ws.sent
+    assert event["type"] == "new_message"
+    assert event["data"] == {"room_id": room_id, "message": resp.json()}
+
+
+async def test_get_messages_after_cursor(
+    auth_client: AsyncClient, second_auth_client: AsyncClient
+):
+    room_id, _, _ = await _create_room(auth_client, second_auth_client)
+    ids = []
+    for content in ("one", "two", "three"):
+        resp = await auth_client.post(f"/api/rooms/{room_id}/messages", json={"content": content})
+        ids.append(resp.json()["id"])
+
+    resp = await auth_client.get(f"/api/rooms/{room_id}/messages", params={"after": ids[0]})
+    assert [m["content"] for m in resp.json()] == ["two", "three"]
+
+    resp = await auth_client.get(f"/api/rooms/{room_id}/messages", params={"after": ids[-1]})
+    assert resp.json() == []
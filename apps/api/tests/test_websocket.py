@@ -1,14 +1,35 @@
 """Tests for WebSocket ConnectionManager, ticket auth, and WS connection."""
 
+import asyncio
+import json
 import uuid
+from datetime import datetime, timezone
 
 import pytest
 from httpx import AsyncClient
 from starlette.testclient import TestClient
 
+from app.backplane import (
+    PG_NOTIFY_MAX_PAYLOAD,
+    InProcessBackplane,
+    InProcessHub,
+    PostgresBackplane,
+    _asyncpg_dsn,
+)
 from app.main import app
-from app.routers.ws import _consume_ticket
-from app.websocket import ConnectionManager
+from app.models.game import Game
+from app.routers import ws as ws_router
+from app.routers.ws import (
+    _consume_ticket,
+    _issue_ticket,
+    _parse_topics,
+    _parse_topics_param,
+    _ReplaySet,
+)
+from app.services.games import game_catalog
+from app.services.lobby import LobbyCoalescer
+from app.websocket import ConnectionManager, encode_event, manager
+from tests.conftest import RecordingWS, TestSessionLocal
 
 # --- ConnectionManager unit tests ---
 
@@ -20,8 +41,8 @@ async def test_manager_connect_disconnect():
     class FakeWS:
         sent: list = []
 
-        async def send_json(self, data):
-            self.sent.append(data)
+        async def send_text(self, data):
+            self.sent.append(json.loads(data))
 
     ws = FakeWS()
     await mgr.connect(user_id, ws)
@@ -44,12 +65,13 @@ async def test_manager_send_to_user():
         def __init__(self):
             self.sent = []
 
-        async def send_json(self, data):
-            self.sent.append(data)
+        async def send_text(self, data):
+            self.sent.append(json.loads(data))
 
     ws = FakeWS()
     await mgr.connect(user_id, ws)
     await mgr.send_to_user(user_id, {"type": "test", "data": {}})
+    await mgr.drain()
     assert len(ws.sent) == 1
     assert ws.sent[0]["type"] == "test"
 
@@ -67,12 +89,13 @@ async def test_manager_stale_connection_cleanup():
     user_id = uuid.uuid4()
 
     class StaleWS:
-        async def send_json(self, data):
+        async def send_text(self, data):
             raise ConnectionError("gone")
 
     ws = StaleWS()
     await mgr.connect(user_id, ws)
     await mgr.send_to_user(user_id, {"type": "test"})
+    await mgr.drain()
     # Stale connection should be cleaned up
     assert user_id not in mgr._connections
     assert ws not in mgr._lobby
@@ -87,8 +110,8 @@ async def test_manager_broadcast_to_lobby():
         def __init__(self):
             self.sent = []
 
-        async def send_json(self, data):
-            self.sent.append(data)
+        async def send_text(self, data):
+            self.sent.append(json.loads(data))
 
     ws1 = FakeWS()
     ws2 = FakeWS()
@@ -96,6 +119,7 @@ async def test_manager_broadcast_to_lobby():
     await mgr.connect(uuid.uuid4(), ws2)
 
     await mgr.broadcast_to_lobby({"type": "lobby_update"})
+    await mgr.drain()
     assert len(ws1.sent) == 1
     assert len(ws2.sent) == 1
 
@@ -111,8 +135,8 @@ async def test_manager_send_to_users():
         def __init__(self):
             self.sent = []
 
-        async def send_json(self, data):
-            self.sent.append(data)
+        async def send_text(self, data):
+            self.sent.append(json.loads(data))
 
     ws1 = FakeWS()
     ws2 = FakeWS()
@@ -120,10 +144,483 @@ async def test_manager_send_to_users():
     await mgr.connect(uid2, ws2)
 
     await mgr.send_to_users([uid1, uid2], {"type": "multi"})
+    await mgr.drain()
     assert len(ws1.sent) == 1
     assert len(ws2.sent) == 1
 
 
+async def test_manager_slow_client_does_not_block_broadcast():
+    mgr = ConnectionManager(send_timeout=0.05)
+
+    class FakeWS:
+        sent: list
+
+        def __init__(self):
+            self.sent = []
+
+        async def send_text(self, data):
+            self.sent.append(json.loads(data))
+
+    class SlowWS:
+        async def send_text(self, data):
+            await asyncio.sleep(10)
+
+    fast_uid = uuid.uuid4()
+    slow_uid = uuid.uuid4()
+    fast = FakeWS()
+    slow = SlowWS()
+    await mgr.connect(fast_uid, fast)
+    await mgr.connect(slow_uid, slow)
+
+    # Emitting only enqueues, so it returns without waiting on the slow socket
+    await asyncio.wait_for(mgr.broadcast_to_lobby({"type": "lobby_update"}), timeout=0.01)
+    await asyncio.wait_for(mgr.connect(uuid.uuid4(), FakeWS()), timeout=0.01)
+    await asyncio.wait_for(mgr.drain(), timeout=1)
+
+    assert fast.sent == [{"seq": 1, "type": "lobby_update"}]
+    # The slow client timed out and was evicted from every registry
+    assert slow not in mgr._lobby
+    assert slow_uid not in mgr._connections
+    assert fast_uid in mgr._connections
+    await mgr.shutdown()
+
+
+async def test_manager_broadcast_encodes_once():
+    mgr = ConnectionManager()
+
+    class RawWS:
+        def __init__(self):
+            self.frames = []
+
+        async def send_text(self, data):
+            self.frames.append(data)
+
+    sockets = [RawWS() for _ in range(3)]
+    for ws in sockets:
+        await mgr.connect(uuid.uuid4(), ws)
+
+    await mgr.broadcast_to_lobby({"type": "recruitment_update", "data": {"action": "created"}})
+    await mgr.drain()
+    first = sockets[0].frames[0]
+    # Every recipient got the very same encoded buffer
+    assert all(ws.frames[0] is first for ws in sockets)
+    assert json.loads(first)["data"]["action"] == "created"
+    await mgr.shutdown()
+
+
+def test_encode_event_handles_uuid_and_datetime():
+    uid = uuid.uuid4()
+    when = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+    decoded = json.loads(encode_event({"type": "t", "data": {"id": uid, "at": when}}))
+    assert decoded["data"]["id"] == str(uid)
+    assert datetime.fromisoformat(decoded["data"]["at"]) == when
+
+
+class _BlockedWS:
+    """A socket whose sends never complete until released."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.sent: list = []
+        self.closed_with: int | None = None
+
+    async def send_text(self, data):
+        await self.release.wait()
+        self.sent.append(json.loads(data))
+
+    async def close(self, code=1000, reason=None):
+        self.closed_with = code
+
+
+async def test_manager_queue_overflow_downgrades_to_resync():
+    mgr = ConnectionManager(queue_size=2, overflow_policy="resync")
+    ws = _BlockedWS()
+    await mgr.connect(uuid.uuid4(), ws)
+
+    for i in range(6):
+        await mgr.broadcast_to_lobby({"type": "lobby_update", "data": {"n": i}})
+
+    stats = mgr.stats()
+    assert stats["resyncs"] == 1
+    assert stats["dropped_events"] > 0
+    assert stats["max_queue_depth"] <= 2
+
+    ws.release.set()
+    await mgr.drain()
+    # The backlog collapsed into a single resync event
+    assert ws.sent == [{"type": "resync", "data": {}}]
+    assert ws in mgr._lobby
+    await mgr.shutdown()
+
+
+async def test_manager_queue_overflow_disconnects_slow_consumer():
+    mgr = ConnectionManager(queue_size=1, overflow_policy="disconnect")
+    user_id = uuid.uuid4()
+    ws = _BlockedWS()
+    await mgr.connect(user_id, ws)
+
+    for i in range(4):
+        await mgr.send_to_user(user_id, {"type": "test", "data": {"n": i}})
+    await asyncio.sleep(0.01)
+
+    assert user_id not in mgr._connections
+    assert ws not in mgr._lobby
+    assert ws.closed_with == 1013
+    assert mgr.stats()["evictions"] == 1
+    # The close task was held until it finished
+    assert not mgr._closing
+
+
+async def test_manager_topic_broadcast_only_reaches_subscribers():
+    mgr = ConnectionManager()
+
+    class FakeWS:
+        def __init__(self):
+            self.sent = []
+
+        async def send_text(self, data):
+            self.sent.append(json.loads(data))
+
+    valorant_jp = FakeWS()
+    apex_na = FakeWS()
+    everything = FakeWS()
+    for ws in (valorant_jp, apex_na, everything):
+        await mgr.connect(uuid.uuid4(), ws)
+    await mgr.subscribe(valorant_jp, [("valorant", "jp")])
+    await mgr.subscribe(apex_na, [("apex_legends", "na")])
+
+    await mgr.broadcast_to_lobby({"type": "recruitment_update"}, topic=("valorant", "jp"))
+    await mgr.broadcast_to_lobby({"type": "announcement"})
+    await mgr.drain()
+
+    assert [e["type"] for e in valorant_jp.sent] == ["recruitment_update", "announcement"]
+    assert [e["type"] for e in apex_na.sent] == ["announcement"]
+    assert [e["type"] for e in everything.sent] == ["recruitment_update", "announcement"]
+
+    # Clearing the subscription goes back to receiving every lobby event
+    await mgr.subscribe(apex_na, [])
+    await mgr.disconnect(mgr._owners[valorant_jp], valorant_jp)
+    assert mgr._topics == {}
+    await mgr.shutdown()
+
+
+async def test_manager_events_are_sequenced():
+    mgr = ConnectionManager()
+    uid = uuid.uuid4()
+    ws = RecordingWS()
+    await mgr.connect(uid, ws)
+
+    await mgr.broadcast_to_lobby({"type": "a"})
+    await mgr.send_to_user(uid, {"type": "b"})
+    await mgr.broadcast_to_lobby({"type": "c"}, topic=("valorant", "jp"))
+    await mgr.drain()
+
+    assert [(e["seq"], e["type"]) for e in ws.sent] == [(1, "a"), (2, "b"), (3, "c")]
+    await mgr.shutdown()
+
+
+async def test_manager_reconnect_replays_missed_events():
+    mgr = ConnectionManager()
+    uid = uuid.uuid4()
+    other = uuid.uuid4()
+
+    await mgr.broadcast_to_lobby({"type": "seen"})
+    since = 1
+    await mgr.send_to_user(uid, {"type": "match_created"})
+    await mgr.send_to_user(other, {"type": "not_for_me"})
+    await mgr.broadcast_to_lobby({"type": "valorant"}, topic=("valorant", "jp"))
+    await mgr.broadcast_to_lobby({"type": "apex"}, topic=("apex_legends", "na"))
+    await mgr.broadcast_to_lobby({"type": "hidden"}, exclude_users=[uid])
+
+    ws = RecordingWS()
+    await mgr.connect(
+        uid, ws, topics=[("valorant", "jp")], since=since, epoch=mgr.epoch, hello=True
+    )
+    await mgr.drain()
+
+    assert ws.sent[0] == {"type": "hello", "data": {"epoch": mgr.epoch, "seq": 6}}
+    assert [(e["seq"], e["type"]) for e in ws.sent[1:]] == [(2, "match_created"), (4, "valorant")]
+    await mgr.shutdown()
+
+
+async def test_lobby_coalescer_batches_and_keeps_latest_state():
+    mgr = ConnectionManager()
+    ws = RecordingWS()
+    await mgr.connect(uuid.uuid4(), ws)
+    coalescer = LobbyCoalescer(mgr, window_ms=20, max_batch=100)
+    topic = ("valorant", "jp")
+
+    await coalescer.submit({"action": "created", "recruitment_id": "a"}, topic)
+    await coalescer.submit({"action": "created", "recruitment_id": "b"}, topic)
+    await coalescer.submit({"action": "matched", "recruitment_id": "a"}, topic)
+    assert ws.sent == []
+
+    await asyncio.sleep(0.05)
+    await mgr.drain()
+
+    assert len(ws.sent) == 1
+    assert ws.sent[0]["type"] == "recruitment_batch"
+    assert ws.sent[0]["data"]["updates"] == [
+        {"action": "created", "recruitment_id": "b"},
+        {"action": "matched", "recruitment_id": "a"},
+    ]
+    assert coalescer.stats()["lobby_updates_coalesced"] == 1
+    assert coalescer.stats()["lobby_frames_sent"] == 1
+    await mgr.shutdown()
+
+
+async def test_lobby_coalescer_flushes_at_max_batch():
+    mgr = ConnectionManager()
+    ws = RecordingWS()
+    await mgr.connect(uuid.uuid4(), ws)
+    coalescer = LobbyCoalescer(mgr, window_ms=10_000, max_batch=2)
+
+    await coalescer.submit({"action": "expired", "recruitment_id": "a"}, ("apex_legends", "na"))
+    await coalescer.submit({"action": "expired", "recruitment_id": "b"}, ("valorant", "jp"))
+    await mgr.drain()
+
+    # Different topics go out as separate single-update frames
+    assert [e["type"] for e in ws.sent] == ["recruitment_update", "recruitment_update"]
+    assert coalescer.stats()["lobby_updates_pending"] == 0
+    await mgr.shutdown()
+
+
+async def test_lobby_coalescer_splits_batches_that_would_not_fit_a_notify():
+    class RecordingBackplane(InProcessBackplane):
+        def __init__(self):
+            super().__init__()
+            self.published = []
+
+        async def publish(self, message: str) -> None:
+            self.published.append(message)
+
+    backplane = RecordingBackplane()
+    mgr = ConnectionManager(backplane=backplane)
+    ws = RecordingWS()
+    await mgr.connect(uuid.uuid4(), ws)
+    coalescer = LobbyCoalescer(mgr, window_ms=10_000, max_batch=1000)
+    topic = ("valorant", "jp")
+
+    # Full payloads with quotes and non-ASCII text, which escaping makes larger
+    for i in range(60):
+        memo = f'"{i}" よろしくお願いします' * 8
+        await coalescer.submit(
+            {"action": "created", "recruitment_id": str(i), "recruitment": {"memo": memo}},
+            topic,
+        )
+    await coalescer.flush()
+    await mgr.drain()
+
+    assert len(backplane.published) > 1
+    assert all(len(m.encode()) <= PG_NOTIFY_MAX_PAYLOAD for m in backplane.published)
+    delivered = [u["recruitment_id"] for e in ws.sent for u in e["data"]["updates"]]
+    assert delivered == [str(i) for i in range(60)]
+    await mgr.shutdown()
+
+
+async def test_manager_reconnect_requires_resync_when_buffer_rolled_over():
+    mgr = ConnectionManager(replay_size=2)
+    uid = uuid.uuid4()
+    for i in range(3):
+        await mgr.broadcast_to_lobby({"type": "e", "data": {"n": i}})
+
+    stale = RecordingWS()
+    await mgr.connect(uid, stale, since=0, epoch=mgr.epoch)
+    other_epoch = RecordingWS()
+    await mgr.connect(uid, other_epoch, since=3, epoch="another-worker")
+    fresh = RecordingWS()
+    await mgr.connect(uid, fresh, since=1, epoch=mgr.epoch)
+    await mgr.drain()
+
+    assert stale.sent == [{"type": "resync", "data": {}}]
+    assert other_epoch.sent == [{"type": "resync", "data": {}}]
+    assert [e["data"]["n"] for e in fresh.sent] == [1, 2]
+    await mgr.shutdown()
+
+
+async def test_manager_heartbeat_pings_then_closes_idle_sockets():
+    mgr = ConnectionManager(ping_interval=10, idle_timeout=30, heartbeat_tick=5)
+
+    class ClosableWS(RecordingWS):
+        def __init__(self):
+            super().__init__()
+            self.raw = []
+            self.closed_with = None
+
+        async def send_text(self, data):
+            self.raw.append(data)
+
+        async def close(self, code=1000, reason=None):
+            self.closed_with = code
+
+    quiet, chatty = ClosableWS(), ClosableWS()
+    await mgr.connect(uuid.uuid4(), quiet)
+    await mgr.connect(uuid.uuid4(), chatty)
+    start = mgr._outboxes[chatty].last_seen
+    mgr._outboxes[quiet].last_seen = start
+
+    # Two ticks (10s): both sockets have been silent for the ping interval
+    for tick in (1, 2):
+        await mgr._heartbeat_tick(start + 5 * tick)
+    await mgr.drain()
+    assert quiet.raw == ["ping"] and chatty.raw == ["ping"]
+
+    # chatty answers; quiet stays silent until the idle timeout
+    mgr._outboxes[chatty].last_seen = start + 12
+    for tick in range(3, 7):
+        await mgr._heartbeat_tick(start + 5 * tick)
+
+    assert quiet.closed_with == 1001
+    assert chatty.closed_with is None
+    assert mgr.stats()["connections"] == 1
+    assert mgr.stats()["idle_closes"] == 1
+    await mgr.shutdown()
+
+
+# --- Backplane tests ---
+
+
+async def test_backplane_delivers_across_workers():
+    hub = InProcessHub()
+    worker_a = ConnectionManager(backplane=InProcessBackplane(hub))
+    worker_b = ConnectionManager(backplane=InProcessBackplane(hub))
+    await worker_a.start()
+    await worker_b.start()
+
+    class FakeWS:
+        def __init__(self):
+            self.sent = []
+
+        async def send_text(self, data):
+            self.sent.append(json.loads(data))
+
+    uid = uuid.uuid4()
+    member = FakeWS()
+    lobby_on_a = FakeWS()
+    await worker_b.connect(uid, member)
+    await worker_a.connect(uuid.uuid4(), lobby_on_a)
+
+    # Events emitted in worker A reach sockets connected to worker B, exactly once
+    await worker_a.send_to_user(uid, {"type": "match_created", "data": {}})
+    await worker_a.broadcast_to_lobby({"type": "recruitment_update", "data": {}})
+    await worker_a.drain()
+    await worker_b.drain()
+
+    assert [e["type"] for e in member.sent] == ["match_created", "recruitment_update"]
+    assert [e["type"] for e in lobby_on_a.sent] == ["recruitment_update"]
+
+    await worker_a.shutdown()
+    await worker_b.shutdown()
+    assert hub.members == []
+
+
+async def test_backplane_echo_is_not_delivered_twice():
+    class EchoBackplane(InProcessBackplane):
+        """Hands every message back to its publisher too, like PostgreSQL NOTIFY."""
+
+        async def publish(self, message: str) -> None:
+            await self._deliver(message)
+
+    worker = ConnectionManager(backplane=EchoBackplane())
+    await worker.start()
+    remote_events = []
+    worker.add_remote_listener(lambda body, users: remote_events.append(body))
+
+    uid = uuid.uuid4()
+    ws = RecordingWS()
+    await worker.connect(uid, ws)
+    await worker.send_to_user(uid, {"type": "match_created", "data": {}})
+    await worker.broadcast_to_lobby({"type": "recruitment_update", "data": {}})
+    await worker.drain()
+
+    assert [(e["seq"], e["type"]) for e in ws.sent] == [
+        (1, "match_created"),
+        (2, "recruitment_update"),
+    ]
+    assert remote_events == []
+    await worker.shutdown()
+
+
+async def test_block_exclusions_travel_as_the_owner_not_the_list():
+    class RecordingHubBackplane(InProcessBackplane):
+        def __init__(self, hub):
+            super().__init__(hub)
+            self.published = []
+
+        async def publish(self, message: str) -> None:
+            self.published.append(message)
+            await super().publish(message)
+
+    hub = InProcessHub()
+    backplane = RecordingHubBackplane(hub)
+    worker_a = ConnectionManager(backplane=backplane)
+    worker_b = ConnectionManager(backplane=InProcessBackplane(hub))
+    await worker_a.start()
+    await worker_b.start()
+
+    owner, blocked, other = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    peers = frozenset([blocked, *(uuid.uuid4() for _ in range(300))])
+
+    async def resolve(user_id):
+        return peers if user_id == owner else frozenset()
+
+    worker_b.set_peer_resolver(resolve)
+    blocked_ws, other_ws = RecordingWS(), RecordingWS()
+    await worker_b.connect(blocked, blocked_ws)
+    await worker_b.connect(other, other_ws)
+
+    coalescer = LobbyCoalescer(worker_a, window_ms=0)
+    update = {"action": "created", "recruitment_id": "r1", "recruitment": {}}
+    await coalescer.submit(update, ("valorant", "jp"), peers, exclude_peers_of=owner)
+    await worker_b.drain()
+
+    # 300 peers would not fit a NOTIFY; the owner's id does
+    assert all(len(m.encode()) <= PG_NOTIFY_MAX_PAYLOAD for m in backplane.published)
+    assert blocked_ws.sent == []
+    assert [e["data"]["recruitment_id"] for e in other_ws.sent] == ["r1"]
+
+    # Without a way to look the peers up, the event is withheld rather than leaked
+    unresolved = ConnectionManager(backplane=InProcessBackplane(hub))
+    await unresolved.start()
+    lobby_ws = RecordingWS()
+    await unresolved.connect(other, lobby_ws)
+    await coalescer.submit(update, ("valorant", "jp"), peers, exclude_peers_of=owner)
+    await unresolved.drain()
+    assert lobby_ws.sent == []
+
+    for worker in (worker_a, worker_b, unresolved):
+        await worker.shutdown()
+
+
+async def test_postgres_backplane_keeps_and_reports_delivery_tasks(caplog):
+    release = asyncio.Event()
+    delivered = []
+
+    async def deliver(message: str) -> None:
+        await release.wait()
+        if message == "bad":
+            raise RuntimeError("boom")
+        delivered.append(message)
+
+    backplane = PostgresBackplane("postgresql://unused")
+    # Not started: _on_notify is driven directly, as asyncpg would
+    backplane._deliver = deliver
+    backplane._on_notify(None, 0, "ws_events", "good")
+    backplane._on_notify(None, 0, "ws_events", "bad")
+    assert len(backplane._deliveries) == 2
+
+    release.set()
+    await backplane.stop()
+    assert delivered == ["good"]
+    assert not backplane._deliveries
+    assert "Backplane delivery failed" in caplog.text
+
+
+def test_backplane_asyncpg_dsn():
+    dsn = _asyncpg_dsn("postgresql+asyncpg://gameapp:secret@db:5432/gameapp")
+    assert dsn == "postgresql://gameapp:secret@db:5432/gameapp"
+
+
 # --- WS ticket tests ---
 
 
@@ -150,6 +647,44 @@ async def test_ws_ticket_single_use(auth_client: AsyncClient):
     assert _consume_ticket(ticket) is None
 
 
+def test_ws_ticket_rejects_tampering():
+    uid = uuid.uuid4()
+    ticket = _issue_ticket(uid)
+    payload, _, signature = ticket.rpartition(".")
+    other = payload.replace(uid.hex, uuid.uuid4().hex)
+
+    assert _consume_ticket(f"{other}.{signature}") is None
+    assert _consume_ticket(f"{payload}.{signature[:-2]}xx") is None
+    assert _consume_ticket("") is None
+    assert _consume_ticket(ticket) == uid
+
+
+def test_ws_ticket_with_non_ascii_signature_is_rejected():
+    ticket = _issue_ticket(uuid.uuid4())
+    assert _consume_ticket("a.b.c.é") is None
+    assert _consume_ticket(ticket[:-1] + "é") is None
+    assert _consume_ticket(ticket) is not None
+
+
+def test_ws_ticket_expires(monkeypatch):
+    ticket = _issue_ticket(uuid.uuid4())
+    now = ws_router.time.time()
+    monkeypatch.setattr(ws_router.time, "time", lambda: now + 31)
+    assert _consume_ticket(ticket) is None
+
+
+def test_ws_ticket_replay_set_forgets_expired_nonces(monkeypatch):
+    replay = _ReplaySet()
+    now = ws_router.time.time()
+    assert replay.add("a", now + 1)
+    assert not replay.add("a", now + 1)
+    assert replay.add("b", now + 60)
+
+    monkeypatch.setattr(ws_router.time, "time", lambda: now + 2)
+    assert replay.add("c", now + 62)
+    assert len(replay) == 2
+
+
 # --- WebSocket connection integration test ---
 
 
@@ -176,6 +711,55 @@ def test_ws_connection_with_valid_ticket():
 
     # Connect via WebSocket
     with client.websocket_connect(f"/api/ws?ticket={ticket}") as ws:
+        hello = json.loads(ws.receive_text())
+        assert hello["type"] == "hello"
+        assert hello["data"]["epoch"] == manager.epoch
         ws.send_text("ping")
         data = ws.receive_text()
         assert data == "pong"
+
+
+def test_ws_subscribe_to_topics():
+    client = TestClient(app)
+    resp = client.post("/api/auth/login", json={"nickname": "wssub"})
+    assert resp.status_code == 200
+    ticket = client.post("/api/ws/ticket").json()["ticket"]
+
+    with client.websocket_connect(f"/api/ws?ticket={ticket}") as ws:
+        assert json.loads(ws.receive_text())["type"] == "hello"
+        ws.send_text(
+            json.dumps(
+                {
+                    "type": "subscribe",
+                    "data": {
+                        "topics": [
+                            {"game": "valorant", "region": "jp"},
+                            {"game": "not_a_game", "region": "jp"},
+                        ]
+                    },
+                }
+            )
+        )
+        reply = json.loads(ws.receive_text())
+        assert reply == {
+            "type": "subscribed",
+            "data": {"topics": [{"game": "valorant", "region": "jp"}]},
+        }
+
+
+async def test_topics_follow_the_games_table():
+    # Listed in the games table but not in packages/shared/games.json
+    async with TestSessionLocal() as db:
+        db.add(Game(slug="tekken8", name="TEKKEN 8", category="fighting", is_active=True))
+        db.add(Game(slug="retired_game", name="Retired", category="other", is_active=False))
+        await db.commit()
+    games = await game_catalog.active_slugs()
+
+    assert _parse_topics_param("tekken8:jp,retired_game:jp,valorant:jp", games) == {
+        ("tekken8", "jp"),
+        ("valorant", "jp"),
+    }
+    assert _parse_topics(
+        {"topics": [{"game": "tekken8", "region": "na"}, {"game": "nope", "region": "na"}]},
+        games,
+    ) == {("tekken8", "na")}
@@ -1,3 +1,9 @@
+export class ApiError extends Error {
+  constructor(message: string, public status: number) {
+    super(message)
+  }
+}
+
 export async function api<T>(url: string, options?: RequestInit): Promise<T> {
   const res = await fetch(url, {
     credentials: 'include',
@@ -9,7 +15,7 @@ export async function api<T>(url: string, options?: RequestInit): Promise<T> {
   })
   if (!res.ok) {
     const body = await res.json().catch(() => ({ detail: res.statusText }))
-    throw new Error(body.detail || `HTTP ${res.status}`)
+    throw new ApiError(body.detail || `HTTP ${res.status}`, res.status)
   }
   return res.json()
 }
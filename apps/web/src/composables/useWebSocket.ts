@@ -3,13 +3,21 @@ import { api } from '@/composables/useApi'
 
 type Handler = (data: Record<string, unknown>) => void
 
+export interface LobbyTopic {
+  game: string
+  region: string
+}
+
 export function useWebSocket() {
   const connected = ref(false)
   let ws: WebSocket | null = null
   let reconnectTimer: ReturnType<typeof setTimeout> | null = null
-  let pingTimer: ReturnType<typeof setInterval> | null = null
   let backoff = 1000
   let destroyed = false
+  let topics: LobbyTopic[] = []
+  // Resume position: the server replays events after lastSeq when the epoch matches
+  let epoch: string | null = null
+  let lastSeq: number | null = null
 
   const handlers = new Map<string, Set<Handler>>()
 
@@ -38,18 +46,36 @@ export function useWebSocket() {
     try {
       const { ticket } = await api<{ ticket: string }>('/api/ws/ticket', { method: 'POST' })
       const protocol = location.protocol === 'https:' ? 'wss:' : 'ws:'
-      ws = new WebSocket(`${protocol}//${location.host}/api/ws?ticket=${ticket}`)
+      const params = new URLSearchParams({ ticket })
+      if (epoch !== null && lastSeq !== null) {
+        params.set('epoch', epoch)
+        params.set('since', String(lastSeq))
+      }
+      if (topics.length > 0) {
+        params.set('topics', topics.map(t => `${t.game}:${t.region}`).join(','))
+      }
+      ws = new WebSocket(`${protocol}//${location.host}/api/ws?${params}`)
 
       ws.onopen = () => {
         connected.value = true
         backoff = 1000
-        startPing()
       }
 
       ws.onmessage = (event) => {
+        // Server heartbeat: answer so the connection is not closed as idle
+        if (event.data === 'ping') {
+          ws?.send('pong')
+          return
+        }
         if (event.data === 'pong') return
         try {
           const msg = JSON.parse(event.data)
+          if (msg.type === 'hello') {
+            if (msg.data.epoch !== epoch) lastSeq = msg.data.seq
+            epoch = msg.data.epoch
+            return
+          }
+          if (typeof msg.seq === 'number') lastSeq = msg.seq
           if (msg.type) {
             dispatch(msg.type, msg.data || {})
           }
@@ -58,7 +84,6 @@ export function useWebSocket() {
 
       ws.onclose = () => {
         connected.value = false
-        stopPing()
         scheduleReconnect()
       }
 
@@ -70,6 +95,19 @@ export function useWebSocket() {
     }
   }
 
+  function sendSubscribe() {
+    if (ws?.readyState === WebSocket.OPEN) {
+      ws.send(JSON.stringify({ type: 'subscribe', data: { topics } }))
+    }
+  }
+
+  // Only receive lobby events for these (game, region) pairs; [] means everything.
+  // Carried in the connect URL after a reconnect.
+  function subscribe(next: LobbyTopic[]) {
+    topics = next
+    sendSubscribe()
+  }
+
   function scheduleReconnect() {
     if (destroyed) return
     reconnectTimer = setTimeout(() => {
@@ -78,26 +116,9 @@ export function useWebSocket() {
     }, backoff)
   }
 
-  function startPing() {
-    stopPing()
-    pingTimer = setInterval(() => {
-      if (ws?.readyState === WebSocket.OPEN) {
-        ws.send('ping')
-      }
-    }, 30000)
-  }
-
-  function stopPing() {
-    if (pingTimer) {
-      clearInterval(pingTimer)
-      pingTimer = null
-    }
-  }
-
   function disconnect() {
     destroyed = true
     if (reconnectTimer) clearTimeout(reconnectTimer)
-    stopPing()
     if (ws) {
       ws.onclose = null
       ws.close()
@@ -113,5 +134,5 @@ export function useWebSocket() {
     disconnect()
   })
 
-  return { connected, on, off, disconnect }
+  return { connected, on, off, subscribe, disconnect }
 }
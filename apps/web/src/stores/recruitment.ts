@@ -1,14 +1,54 @@
 import { defineStore } from 'pinia'
 import { ref } from 'vue'
-import type { Recruitment } from '@/types'
+import type { Recruitment, RecruitmentChanges, RecruitmentUpdate } from '@/types'
 import { api } from '@/composables/useApi'
 
+const PAGE_SIZE = 200
+
 export const useRecruitmentStore = defineStore('recruitment', () => {
   const recruitments = ref<Recruitment[]>([])
   const loading = ref(false)
+  // Lobby version the local list reflects; null until the first sync
+  let synced: { epoch: string; version: number } | null = null
 
+  // The list is paginated (keyset on the last recruitment of each page)
   async function fetchRecruitments() {
-    recruitments.value = await api<Recruitment[]>('/api/recruitments')
+    const all: Recruitment[] = []
+    let after = ''
+    for (;;) {
+      const page = await api<Recruitment[]>(`/api/recruitments?limit=${PAGE_SIZE}${after}`)
+      all.push(...page)
+      if (page.length < PAGE_SIZE) break
+      after = `&after=${page[page.length - 1].id}`
+    }
+    recruitments.value = all
+  }
+
+  // Fetch only what changed since the last sync; the server answers with the
+  // whole lobby when it can no longer compute a delta
+  async function syncRecruitments() {
+    const since = synced ? `?since_version=${synced.version}&epoch=${synced.epoch}` : ''
+    const changes = await api<RecruitmentChanges>(`/api/recruitments/changes${since}`)
+    if (changes.full) {
+      recruitments.value = changes.recruitments
+    } else if (changes.recruitments.length || changes.removed.length) {
+      const drop = new Set([...changes.removed, ...changes.recruitments.map(r => r.id)])
+      const rest = recruitments.value.filter(r => !drop.has(r.id))
+      rest.push(...changes.recruitments)
+      rest.sort((a, b) => a.created_at.localeCompare(b.created_at))
+      recruitments.value = rest
+    }
+    synced = { epoch: changes.epoch, version: changes.version }
+  }
+
+  // Apply a recruitment_update event locally instead of refetching the lobby
+  function applyUpdate(update: RecruitmentUpdate) {
+    const rest = recruitments.value.filter(r => r.id !== update.recruitment_id)
+    if (update.action === 'created' && update.recruitment) {
+      rest.push(update.recruitment)
+      rest.sort((a, b) => a.created_at.localeCompare(b.created_at))
+    }
+    recruitments.value = rest
   }
 
   async function createRecruitment(data: {
@@ -36,10 +76,16 @@ export const useRecruitmentStore = defineStore('recruitment', () => {
     return api('/api/recruitments/' + id + '/join', { method: 'POST' })
   }
 
+  // The server picks and locks the longest waiting recruitment for the game/region
+  async function quickJoin(game: string, region: string): Promise<{ detail: string; room_id: string }> {
+    const query = new URLSearchParams({ game, region })
+    return api(`/api/recruitments/quick-join?${query}`, { method: 'POST' })
+  }
+
   async function cancelRecruitment(id: string) {
     await api('/api/recruitments/' + id, { method: 'DELETE' })
-    await fetchRecruitments()
+    applyUpdate({ action: 'cancelled', recruitment_id: id })
   }
 
-  return { recruitments, loading, fetchRecruitments, createRecruitment, joinRecruitment, cancelRecruitment }
+  return { recruitments, loading, fetchRecruitments, syncRecruitments, applyUpdate, createRecruitment, joinRecruitment, quickJoin, cancelRecruitment }
 })
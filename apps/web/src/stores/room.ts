@@ -15,12 +15,29 @@ export const useRoomStore = defineStore('room', () => {
     messages.value = await api<Message[]>('/api/rooms/' + roomId + '/messages')
   }
 
+  // Cheap catch-up: only messages newer than the last one we have
+  async function fetchNewMessages(roomId: string) {
+    const last = messages.value[messages.value.length - 1]
+    if (!last || last.room_id !== roomId) {
+      await fetchMessages(roomId)
+      return
+    }
+    const newer = await api<Message[]>('/api/rooms/' + roomId + '/messages?after=' + last.id)
+    for (const m of newer) appendMessage(m)
+  }
+
+  function appendMessage(msg: Message) {
+    if (!messages.value.some(m => m.id === msg.id)) {
+      messages.value = [...messages.value, msg]
+    }
+  }
+
   async function sendMessage(roomId: string, content: string) {
-    await api('/api/rooms/' + roomId + '/messages', {
+    const msg = await api<Message>('/api/rooms/' + roomId + '/messages', {
       method: 'POST',
       body: JSON.stringify({ content }),
     })
-    await fetchMessages(roomId)
+    appendMessage(msg)
   }
 
   async function closeRoom(roomId: string) {
@@ -44,5 +61,5 @@ export const useRoomStore = defineStore('room', () => {
     pendingFeedbackRoomIds.value = result.map(r => r.room_id)
   }
 
-  return { room, messages, pendingFeedbackRoomIds, fetchRoom, fetchMessages, sendMessage, closeRoom, submitFeedback, fetchPendingFeedback }
+  return { room, messages, pendingFeedbackRoomIds, fetchRoom, fetchMessages, fetchNewMessages, appendMessage, sendMessage, closeRoom, submitFeedback, fetchPendingFeedback }
 })
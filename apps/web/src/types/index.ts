@@ -23,6 +23,20 @@ export interface Recruitment {
   thumbs_up_count: number
 }
 
+export interface RecruitmentUpdate {
+  action: 'created' | 'cancelled' | 'matched' | 'expired'
+  recruitment_id: string
+  recruitment?: Recruitment
+}
+
+export interface RecruitmentChanges {
+  epoch: string
+  version: number
+  full: boolean
+  recruitments: Recruitment[]
+  removed: string[]
+}
+
 export interface Room {
   id: string
   recruitment_id: string